@@ -0,0 +1,76 @@
+"""
+分类的进程内缓存
+
+categories 表几乎不会变化，所以在启动时一次性读入内存，之后：
+- GET /api/categories 直接返回预先序列化好的 JSON (带 ETag 和长时间的 Cache-Control)
+- 发帖/改帖时校验 category_id 不需要再查数据库
+
+缓存内容是不可变的快照，reload() 会整体替换快照 (对引用赋值是原子的，读的一方不需要加锁)。
+每个 worker 各有一份快照，分类有变化 (python -m backend.manage add-category) 时不用重启：
+- 快照超过 CATEGORY_CACHE_CHECK_SECONDS 后，用一次聚合查询 (分类数, 最大 ID) 检查表有没有变化，变了才重新读入
+- 校验 category_id 时没找到的话立即检查一次，新分类马上就能用来发帖
+"""
+import time
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+import orjson
+from sqlalchemy.orm import Session
+
+from . import crud, http_cache, metrics
+from .config import settings
+
+
+class CategorySnapshot(NamedTuple):
+    names: Mapping[int, str]  # 分类 ID -> 分类名 (只读)
+    body: bytes               # GET /api/categories 的响应 body
+    etag: str
+    version: tuple            # 读取时的 (分类数, 最大 ID)
+    checked_at: float         # 上次和数据库核对版本的时间 (time.monotonic)
+
+
+_snapshot: Optional[CategorySnapshot] = None
+
+
+def reload(db: Session) -> CategorySnapshot:
+    """从数据库重新读取全部分类，替换内存中的快照"""
+    global _snapshot
+
+    categories = [(category.id, category.name) for category in crud.get_categories(db)]
+    _snapshot = CategorySnapshot(
+        names=MappingProxyType(dict(categories)),
+        body=orjson.dumps([{"id": id_, "name": name} for id_, name in categories]),
+        etag=http_cache.make_etag("categories", categories),
+        version=(len(categories), max((id_ for id_, _ in categories), default=None)),
+        checked_at=time.monotonic(),
+    )
+    return _snapshot
+
+
+def _refresh(db: Session, snapshot: CategorySnapshot) -> CategorySnapshot:
+    """和数据库核对版本：分类表有变化时重新读入，否则只更新核对时间"""
+    global _snapshot
+
+    if tuple(crud.get_categories_version(db)) != snapshot.version:
+        return reload(db)
+    _snapshot = snapshot._replace(checked_at=time.monotonic())
+    return _snapshot
+
+
+def get(db: Session) -> CategorySnapshot:
+    """返回当前快照；启动时没能加载 (比如数据库暂时不可用) 的话在这里补加载，过期的话先核对版本"""
+    snapshot = _snapshot
+    metrics.record_cache("categories", snapshot is not None)
+    if snapshot is None:
+        return reload(db)
+    if time.monotonic() - snapshot.checked_at >= settings.CATEGORY_CACHE_CHECK_SECONDS:
+        return _refresh(db, snapshot)
+    return snapshot
+
+
+def exists(db: Session, category_id: int) -> bool:
+    """分类是否存在 (用于校验帖子的 category_id)；快照里没有时核对一次数据库，新加的分类也能马上用"""
+    snapshot = get(db)
+    if category_id in snapshot.names:
+        return True
+    return category_id in _refresh(db, snapshot).names
@@ -0,0 +1,165 @@
+"""
+响应压缩中间件 (gzip / brotli)
+
+- 根据请求头 Accept-Encoding 选择压缩算法：优先 brotli，其次 gzip
+- 小于 minimum_size 的响应不压缩（压缩收益太小，反而浪费 CPU）
+- /static 下的图片等文件本身已经是压缩格式，直接跳过
+- 记录压缩前后的字节数，用于统计节省了多少流量
+"""
+import gzip
+import threading
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # 没装 brotli 时只使用 gzip
+    brotli = None
+
+
+class CompressionStats:
+    """压缩统计（线程安全），按压缩算法分别计数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = {}      # encoding -> 压缩过的响应数
+        self.bytes_before = {}   # encoding -> 压缩前字节数
+        self.bytes_after = {}    # encoding -> 压缩后字节数
+
+    def record(self, encoding: str, before: int, after: int):
+        with self._lock:
+            self.responses[encoding] = self.responses.get(encoding, 0) + 1
+            self.bytes_before[encoding] = self.bytes_before.get(encoding, 0) + before
+            self.bytes_after[encoding] = self.bytes_after.get(encoding, 0) + after
+
+    def snapshot(self) -> dict:
+        """返回当前统计的副本：{encoding: {"responses", "bytes_before", "bytes_after", "bytes_saved"}}"""
+        with self._lock:
+            return {
+                encoding: {
+                    "responses": self.responses[encoding],
+                    "bytes_before": self.bytes_before[encoding],
+                    "bytes_after": self.bytes_after[encoding],
+                    "bytes_saved": self.bytes_before[encoding] - self.bytes_after[encoding],
+                }
+                for encoding in self.responses
+            }
+
+
+stats = CompressionStats()
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """解析 Accept-Encoding，返回客户端接受的编码 (忽略 q=0 的项)"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    gzip / brotli 响应压缩中间件
+
+    Args:
+        minimum_size: 小于该字节数的响应不压缩
+        gzip_level: gzip 压缩级别 (1-9)
+        brotli_quality: brotli 压缩质量 (0-11)，实时压缩一般 4-5 就够了
+        excluded_paths: 不压缩的路径前缀
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        excluded_paths: Tuple[str, ...] = ("/static",),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.excluded_paths = tuple(excluded_paths)
+
+    def _choose_encoding(self, scope: Scope) -> Optional[str]:
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """缓存一个响应的所有 body 片段，在最后一片到达时决定是否压缩"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream_send = send
+        self.start_message: Optional[Message] = None
+        self.body_parts = []
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            # 已经压缩过的内容 (带 Content-Encoding 或图片等) 直接原样发送
+            if "content-encoding" in headers or headers.get("content-type", "").startswith("image/"):
+                self.passthrough = True
+                await self.downstream_send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream_send(message)
+            return
+
+        self.body_parts.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+
+        body = b"".join(self.body_parts)
+        headers = MutableHeaders(raw=self.start_message["headers"])
+
+        if len(body) >= self.middleware.minimum_size:
+            compressed = self._compress(body)
+            stats.record(self.encoding, len(body), len(compressed))
+            headers["Content-Encoding"] = self.encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            body = compressed
+
+        await self.downstream_send(self.start_message)
+        await self.downstream_send({"type": "http.response.body", "body": body})
+
+    def _compress(self, body: bytes) -> bytes:
+        if self.encoding == "br":
+            return brotli.compress(body, quality=self.middleware.brotli_quality)
+        return gzip.compress(body, compresslevel=self.middleware.gzip_level)
@@ -9,5 +9,75 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200
 
+    # 响应压缩配置
+    COMPRESSION_MINIMUM_SIZE: int = 1024   # 小于该字节数的响应不压缩
+    GZIP_COMPRESS_LEVEL: int = 6           # 1-9
+    BROTLI_QUALITY: int = 4                # 0-11
+
+    # 分类缓存 (GET /api/categories 的 Cache-Control: max-age，秒)
+    CATEGORIES_CACHE_MAX_AGE: int = 86400
+    CATEGORY_CACHE_CHECK_SECONDS: float = 60   # 每个 worker 多久核对一次分类表有没有变化
+
+    # 请求计时 (超过任一阈值的请求会连同 SQL 一起写入日志)
+    SLOW_REQUEST_MS: float = 500
+    SLOW_REQUEST_QUERIES: int = 20
+    SERVER_TIMING_ENABLED: bool = True
+
+    # 按需采样分析 (PROFILE_TOKEN 为空且 PROFILE_SAMPLE_RATE 为 0 时完全关闭)
+    PROFILE_TOKEN: str = ""                # 请求头 X-Profile 的值
+    PROFILE_SAMPLE_RATE: float = 0.0       # 随机抽样比例 0~1
+    PROFILE_INTERVAL_MS: float = 5
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: int = 1000          # 最多保留的结果文件数 (0 表示不限)
+    PROFILE_MAX_AGE_HOURS: float = 168     # 结果文件保留时间 (0 表示不限)
+
+    # Idempotency-Key：POST 请求的响应保存多久 (秒) / 最多保存多少个
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    IDEMPOTENCY_REDIS_URL: str = ""        # 多个 worker 时必须配置，否则重试落到别的 worker 上会重复执行 (需要安装 redis)
+
+    # 限流 (令牌桶，格式 "次数/second|minute|hour|day")
+    RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_PER_IP: str = "20/minute"
+    LOGIN_RATE_LIMIT_PER_ACCOUNT: str = "5/minute"
+    MESSAGE_RATE_LIMIT_PER_USER: str = "30/minute"
+    MESSAGE_RATE_LIMIT_PER_IP: str = "120/minute"
+    RATE_LIMIT_MAX_KEYS: int = 100000      # 进程内最多保存的桶数
+    RATE_LIMIT_REDIS_URL: str = ""         # 配置后多个 worker 共享限流计数 (需要安装 redis)
+
+    # 相似帖子推荐 (每个 worker 在内存里维护一份 TF-IDF 索引)
+    SIMILAR_POSTS_ENABLED: bool = True
+    SIMILAR_POSTS_TOP_K: int = 20          # 每个帖子缓存的相似帖子个数 (也是接口 limit 的上限)
+    SIMILAR_POSTS_FEATURES: int = 262144   # n-gram 哈希维度 (2 的幂)
+    SIMILAR_POSTS_WARM: int = 2000         # 启动时预先计算最新的多少个帖子
+    SIMILAR_POSTS_SYNC_SECONDS: float = 30 # 每个 worker 多久从数据库同步一次其它 worker 上的帖子变化
+
+    # 热度排序 (sort_by=trending，见 backend/trending.py)
+    TRENDING_HALF_LIFE_HOURS: float = 24   # 收藏 / 私信 / 浏览的热度每隔多久减半
+    TRENDING_MAX_RANKED: int = 1000        # 按热度排名的帖子数 (更靠后的按发布时间排)
+    TRENDING_REFRESH_SECONDS: float = 5    # 排名最多多久重新生成一次
+    TRENDING_FLUSH_SECONDS: float = 60     # 每个 worker 多久把热度增量保存到数据库一次
+
+    # 个性化首页 (GET /api/users/me/feed，见 backend/feed.py)
+    FEED_CANDIDATES: int = 1000            # 最新的多少个在售帖子参与排序
+    FEED_CACHE_USERS: int = 10000          # 每个 worker 最多缓存多少个用户的首页
+    FEED_CACHE_TTL_SECONDS: float = 300    # 候选快照 / 用户偏好最多缓存多久 (其它 worker 上的收藏 / 私信多久后生效)
+
+    # 保存的搜索 / 新帖提醒 (见 backend/saved_searches.py)
+    SAVED_SEARCHES_PER_USER: int = 20      # 每个用户最多保存多少个搜索
+
+    # 生产环境进程 / 线程 / 连接池 (见 gunicorn.conf.py)
+    BIND: str = "0.0.0.0:8000"
+    WORKERS: int = 0                       # 0 表示按 CPU 核数自动计算
+    MAX_WORKERS: int = 8
+    GRACEFUL_TIMEOUT: int = 30             # 关闭时等待正在处理的请求的秒数
+    DB_POOL_SIZE: int = 5                  # 每个 worker 的数据库连接数
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 3600            # 秒，要小于 MySQL 的 wait_timeout
+    THREADPOOL_SIZE: int = 0               # 同步路由的线程数，0 表示等于连接池上限
+
     class Config:
-        env_file = ".env"
\ No newline at end of file
+        env_file = ".env"
+
+
+settings = Settings()
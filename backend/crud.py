@@ -1,8 +1,12 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, desc, func
+from sqlalchemy.orm import Session, Load, joinedload, selectinload
+from sqlalchemy import or_, and_, desc, func, select, literal, case, Integer, String
 from . import models, schemas, security
-from typing import Optional, List
+from .database import on_commit
+from typing import Dict, Optional, List, Sequence
+import base64
+import json
 import os
+from datetime import datetime
 from pathlib import Path
 
 YOUR_SCHOOL_EMAIL_SUFFIX = "@edu.k.u-tokyo.ac.jp"
@@ -28,8 +32,7 @@ def create_user(db: Session, user: schemas.UserCreate):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db.flush()  # INSERT ... RETURNING 拿到 id 和数据库默认值 (由接口统一 commit)
     
     return db_user
 
@@ -41,8 +44,8 @@ def update_user_avatar(db: Session, user_id: int, avatar_url: str) -> models.Use
     """
     更新用户头像，并删除旧头像文件
     """
-    # 1. 根据 user_id 找到这个用户
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    # 1. 根据 user_id 找到这个用户 (当前登录用户已经在 Session 里，不会再查数据库)
+    db_user = db.get(models.User, user_id)
     
     if db_user:
         # 2. 保存旧头像 URL（用于后续删除）
@@ -50,21 +53,20 @@ def update_user_avatar(db: Session, user_id: int, avatar_url: str) -> models.Use
         
         # 3. 更新 avatar_url 字段
         db_user.avatar_url = avatar_url
+        db.flush()
         
-        # 4. 提交更改
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-        
-        # 5. 删除旧头像文件（如果存在且不是默认头像）
-        if old_avatar_url and old_avatar_url.startswith('/static/avatars/'):
-            try:
-                old_file_path = f"backend{old_avatar_url}"
-                if os.path.exists(old_file_path):
-                    os.remove(old_file_path)
-                    print(f"✅ 已删除旧头像: {old_file_path}")
-            except Exception as e:
-                print(f"❌ 删除旧头像失败: {old_file_path}, 错误: {e}")
+        # 4. 事务提交之后再删除旧头像文件（如果存在且不是默认头像）
+        def remove_old_avatar():
+            if old_avatar_url and old_avatar_url.startswith('/static/avatars/'):
+                try:
+                    old_file_path = f"backend{old_avatar_url}"
+                    if os.path.exists(old_file_path):
+                        os.remove(old_file_path)
+                        print(f"✅ 已删除旧头像: {old_file_path}")
+                except Exception as e:
+                    print(f"❌ 删除旧头像失败: {old_file_path}, 错误: {e}")
+
+        on_commit(db, remove_old_avatar)
         
     return db_user
 
@@ -80,8 +82,8 @@ def update_user_profile(db: Session, user_id: int, user_update: schemas.UserUpda
     Returns:
         更新后的用户对象
     """
-    # 1. 查找用户
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    # 1. 查找用户 (当前登录用户已经在 Session 里，不会再查数据库)
+    db_user = db.get(models.User, user_id)
     
     if not db_user:
         return None
@@ -90,18 +92,168 @@ def update_user_profile(db: Session, user_id: int, user_update: schemas.UserUpda
     if user_update.username is not None:
         db_user.username = user_update.username
     
-    # 3. 提交到数据库
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # 3. 写入数据库 (由接口统一 commit)
+    db.flush()
     
     # 4. 返回更新后的用户
     return db_user
 
+# PostSummary (fields=summary) 需要的列：不读 description 等大字段
+POST_SUMMARY_COLUMNS = (
+    models.Post.id, models.Post.title, models.Post.post_type,
+    models.Post.price, models.Post.price_min, models.Post.condition,
+    models.Post.status, models.Post.favorite_count, models.Post.created_at,
+    models.Post.owner_id, models.Post.category_id,
+)
+OWNER_SUMMARY_COLUMNS = (
+    models.User.id, models.User.username,
+    models.User.avatar_url, models.User.success_trades,
+)
+
+def post_loader_options(summary: bool = False, parent: Optional[Load] = None) -> list:
+    """
+    帖子列表的预加载选项：一次性加载卖家、分类和图片，避免 N+1 查询
+    
+    Args:
+        summary: 为 True 时只 SELECT PostSummary 用到的列
+        parent: 从其他实体加载帖子时的关系路径，比如 joinedload(models.Message.post)；
+                为空表示查询的主体就是 Post
+    """
+    parent = parent if parent is not None else Load(models.Post)
+    owner = parent.joinedload(models.Post.owner)
+    category = parent.joinedload(models.Post.category)
+    images = parent.selectinload(models.Post.images)
+    
+    if not summary:
+        return [owner, category, images]
+    
+    return [
+        parent.load_only(*POST_SUMMARY_COLUMNS),
+        owner.load_only(*OWNER_SUMMARY_COLUMNS),
+        category,
+        images.load_only(models.PostImage.id, models.PostImage.image_url),
+    ]
+
 def get_post_by_id(db: Session, post_id: int):
 
     return db.query(models.Post).filter(models.Post.id == post_id).first()
 
+def get_post_detail(db: Session, post_id: int):
+    """获取帖子详情，一次性加载卖家、分类和图片"""
+    return db.query(models.Post).options(
+        *post_loader_options()
+    ).filter(models.Post.id == post_id).first()
+
+def get_available_post_texts(db: Session):
+    """所有在售帖子的 (ID, 标题, 描述)，用于建立相似帖子索引"""
+    return db.query(
+        models.Post.id, models.Post.title, models.Post.description
+    ).filter(
+        models.Post.status == models.Post.StatusEnum.available
+    ).order_by(models.Post.id).all()
+
+def get_max_post_updated_at(db: Session):
+    return db.query(func.max(models.Post.updated_at)).scalar()
+
+def get_post_texts_updated_since(db: Session, since):
+    """updated_at >= since 的帖子的 (ID, 标题, 描述, 状态, updated_at)，用于同步相似帖子索引"""
+    query = db.query(
+        models.Post.id, models.Post.title, models.Post.description,
+        models.Post.status, models.Post.updated_at
+    )
+    if since is not None:
+        # 按数据库里的文本格式比较 (原因见 get_user_favorites)
+        query = query.filter(models.Post.updated_at >= literal(since.isoformat(" "), type_=String))
+    return query.order_by(models.Post.updated_at).all()
+
+def count_available_posts(db: Session) -> int:
+    return db.query(func.count(models.Post.id)).filter(
+        models.Post.status == models.Post.StatusEnum.available
+    ).scalar()
+
+def get_available_post_texts_by_ids(db: Session, post_ids: List[int]):
+    if not post_ids:
+        return []
+    return db.query(
+        models.Post.id, models.Post.title, models.Post.description
+    ).filter(
+        models.Post.id.in_(post_ids),
+        models.Post.status == models.Post.StatusEnum.available
+    ).all()
+
+def get_available_post_ids(db: Session) -> List[int]:
+    return [post_id for post_id, in db.query(models.Post.id).filter(
+        models.Post.status == models.Post.StatusEnum.available
+    )]
+
+def get_available_posts_by_ids(db: Session, post_ids: List[int], summary: bool = False):
+    """按给定的 ID 顺序返回其中仍在售的帖子 (一次查询)"""
+    if not post_ids:
+        return []
+    posts = db.query(models.Post).options(
+        *post_loader_options(summary=summary)
+    ).filter(
+        models.Post.id.in_(post_ids),
+        models.Post.status == models.Post.StatusEnum.available
+    ).all()
+    by_id = {post.id: post for post in posts}
+    return [by_id[post_id] for post_id in post_ids if post_id in by_id]
+
+def _filter_posts(
+    query,
+    post_type: Optional[models.Post.PostTypeEnum] = None,
+    keyword: Optional[str] = None,
+    category_id: Optional[int] = None
+):
+    """帖子列表的筛选条件 (get_posts 和 get_posts_version 共用)"""
+    # 1. 帖子类型筛选
+    if post_type:
+        query = query.filter(models.Post.post_type == post_type)
+    
+    # 2. 关键词搜索（标题或描述）
+    if keyword:
+        search_pattern = f"%{keyword}%"
+        query = query.filter(
+            (models.Post.title.like(search_pattern)) | 
+            (models.Post.description.like(search_pattern))
+        )
+    
+    # 3. 分类筛选
+    if category_id:
+        query = query.filter(models.Post.category_id == category_id)
+    
+    return query
+
+def get_posts_version(
+    db: Session,
+    post_type: Optional[models.Post.PostTypeEnum] = None,
+    keyword: Optional[str] = None,
+    category_id: Optional[int] = None
+):
+    """
+    帖子列表的 "版本号"，用于生成 ETag（只做一次聚合查询，不读取帖子内容）
+    
+    任何帖子被新增、删除、修改、收藏 / 取消收藏或上传新图片，版本号都会改变。
+    收藏数变化不改 updated_at，所以单独算收藏数之和；一个帖子 +1、另一个 -1 时和不变，
+    再加一个按帖子 ID 加权的和区分开。
+    热度排名 (sort_by=trending) 不在数据库里，由调用方另外放进 ETag。
+    最大 updated_at 不能当作列表的 Last-Modified：收藏数和热度排名变化时它不变。
+    
+    Returns:
+        tuple: (帖子数, 最大 updated_at, 最大帖子 ID, 最大图片 ID, 收藏数之和, 收藏数按 ID 加权之和)
+    """
+    max_image_id = select(func.max(models.PostImage.id)).scalar_subquery()
+    
+    query = _filter_posts(db.query(models.Post), post_type, keyword, category_id)
+    return query.with_entities(
+        func.count(models.Post.id),
+        func.max(models.Post.updated_at),
+        func.max(models.Post.id),
+        max_image_id,
+        func.coalesce(func.sum(models.Post.favorite_count), 0),
+        func.coalesce(func.sum(models.Post.favorite_count * models.Post.id), 0)
+    ).one()
+
 def get_posts(
     db: Session, 
     post_type: Optional[models.Post.PostTypeEnum] = None,
@@ -109,7 +261,9 @@ def get_posts(
     category_id: Optional[int] = None,
     sort_by: Optional[str] = None,
     skip: int = 0, 
-    limit: int = 100
+    limit: int = 100,
+    summary: bool = False,
+    ranked_ids: Sequence[int] = ()
 ):
     """
     获取帖子列表，支持多种筛选和排序
@@ -119,31 +273,17 @@ def get_posts(
         post_type: 帖子类型筛选 (sell/buy/free)
         keyword: 关键词搜索（标题或描述）
         category_id: 分类筛选
-        sort_by: 排序方式 (latest/price_asc/price_desc)
+        sort_by: 排序方式 (latest/price_asc/price_desc/popular/trending)
         skip: 跳过的记录数
         limit: 返回的最大记录数
+        summary: 为 True 时只读取帖子卡片 (PostSummary) 需要的列
+        ranked_ids: sort_by=trending 时按热度从高到低的帖子 ID (见 backend/trending.py)
     
     Returns:
         tuple: (帖子列表, 总数)
     """
-    # 建立基础查询
-    query = db.query(models.Post)
-    
-    # 1. 帖子类型筛选
-    if post_type:
-        query = query.filter(models.Post.post_type == post_type)
-    
-    # 2. 关键词搜索（标题或描述）
-    if keyword:
-        search_pattern = f"%{keyword}%"
-        query = query.filter(
-            (models.Post.title.like(search_pattern)) | 
-            (models.Post.description.like(search_pattern))
-        )
-    
-    # 3. 分类筛选
-    if category_id:
-        query = query.filter(models.Post.category_id == category_id)
+    # 建立基础查询 (1~3: 类型、关键词、分类筛选)
+    query = _filter_posts(db.query(models.Post), post_type, keyword, category_id)
     
     # 先计算总数（在排序和分页之前）
     total = query.count()
@@ -155,26 +295,66 @@ def get_posts(
     elif sort_by == "price_desc":
         # 价格从高到低
         query = query.order_by(models.Post.price.desc())
+    elif sort_by == "popular":
+        # 收藏最多的排在前面（走 ix_posts_favorite_count_created_at 索引）
+        query = query.order_by(
+            models.Post.favorite_count.desc(),
+            models.Post.created_at.desc()
+        )
+    elif sort_by == "trending":
+        return _get_trending_posts(query, ranked_ids, skip, limit, summary), total
     else:
         # 默认按最新发布排序
         query = query.order_by(models.Post.created_at.desc())
     
-    # 5. 分页并执行查询
-    posts = query.offset(skip).limit(limit).all()
+    # 5. 分页并执行查询（同时预加载卖家、分类和图片）
+    posts = query.options(*post_loader_options(summary)).offset(skip).limit(limit).all()
     
     # 返回帖子列表和总数
     return posts, total
 
+def _get_trending_posts(query, ranked_ids: Sequence[int], skip: int, limit: int, summary: bool):
+    """
+    sort_by=trending：先按热度排名，排名里没有的帖子 (最近没人收藏 / 私信 / 浏览) 接在后面按发布时间倒序
+    
+    热度排名在内存里维护，这里只需要一次查询找出排名里符合筛选条件的帖子，再取出当前这一页
+    """
+    ranked = []
+    if ranked_ids:
+        matched = {
+            post_id for (post_id,) in
+            query.filter(models.Post.id.in_(ranked_ids)).with_entities(models.Post.id)
+        }
+        ranked = [post_id for post_id in ranked_ids if post_id in matched]
+    
+    page_ids = ranked[skip:skip + limit]
+    posts = []
+    if page_ids:
+        by_id = {
+            post.id: post for post in
+            query.filter(models.Post.id.in_(page_ids)).options(*post_loader_options(summary))
+        }
+        posts = [by_id[post_id] for post_id in page_ids if post_id in by_id]
+    
+    if len(page_ids) < limit:
+        rest = query.order_by(models.Post.created_at.desc())
+        if ranked:
+            rest = rest.filter(models.Post.id.notin_(ranked))
+        posts += rest.options(*post_loader_options(summary)).offset(
+            max(0, skip - len(ranked))
+        ).limit(limit - len(page_ids)).all()
+    return posts
+
 def create_post(db: Session, post: schemas.PostCreate, owner_id: int):
     
     db_post = models.Post(
         **post.dict(), 
-        owner_id=owner_id  # 2. 手动关联当前登录的用户 ID
+        owner_id=owner_id,  # 2. 手动关联当前登录的用户 ID
+        images=[]           # 新帖子还没有图片，序列化时不用再查 post_images
     )
-    # 3. 存入数据库
+    # 3. 存入数据库 (INSERT ... RETURNING 拿到 post_id 和默认值，由接口统一 commit)
     db.add(db_post)
-    db.commit()
-    db.refresh(db_post) # 刷新，以获取新创建的 post_id
+    db.flush()
     
     # 4. 返回新创建的帖子模型
     return db_post
@@ -193,10 +373,10 @@ def update_post(
 
         setattr(db_post, key, value)
         
-    # 3. 提交更改到数据库
-    db.add(db_post) # 标记 db_post 为已更改
-    db.commit()      # 提交事务
-    db.refresh(db_post) # 刷新，获取最新的数据
+    # 3. 写入数据库 (UPDATE ... RETURNING 拿到新的 updated_at，由接口统一 commit)
+    db.flush()
+    if "category_id" in update_data:
+        db.expire(db_post, ["category"])  # 已经加载的旧分类不会自动跟着 category_id 变
     
     return db_post
 
@@ -210,32 +390,44 @@ def delete_post(db: Session, db_post: models.Post):
     
     # 2. 删除数据库记录（会自动删除关联的 images 记录，因为有 cascade）
     db.delete(db_post)
-    db.commit()
-    
-    # 3. 删除物理文件
-    for image_url in image_urls:
-        try:
-            # image_url 格式: /static/images/uuid.jpg
-            # 转换为物理路径: backend/static/images/uuid.jpg
-            file_path = f"backend{image_url}"
-            
-            # 检查文件是否存在
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"✅ 已删除图片文件: {file_path}")
-            else:
-                print(f"⚠️  图片文件不存在: {file_path}")
-        except Exception as e:
-            # 文件删除失败不影响数据库操作，只记录错误
-            print(f"❌ 删除图片文件失败: {file_path}, 错误: {e}")
-    
-    return
+    db.flush()
+    
+    # 3. 事务提交之后再删除物理文件
+    def remove_image_files():
+        for image_url in image_urls:
+            try:
+                # image_url 格式: /static/images/uuid.jpg
+                # 转换为物理路径: backend/static/images/uuid.jpg
+                file_path = f"backend{image_url}"
+                
+                # 检查文件是否存在
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    print(f"✅ 已删除图片文件: {file_path}")
+                else:
+                    print(f"⚠️  图片文件不存在: {file_path}")
+            except Exception as e:
+                # 文件删除失败不影响数据库操作，只记录错误
+                print(f"❌ 删除图片文件失败: {file_path}, 错误: {e}")
+
+    on_commit(db, remove_image_files)
 
 def get_categories(db: Session):
 
     # 查询 models.Category (分类) 表，并返回 .all() (所有) 结果
     return db.query(models.Category).all()
 
+def get_categories_version(db: Session):
+    """分类的 (总数, 最大 ID)，用来判断内存里的分类缓存是否需要重新读入"""
+    return db.query(func.count(models.Category.id), func.max(models.Category.id)).one()
+
+def create_category(db: Session, name: str) -> models.Category:
+    """新增一个分类 (由维护命令调用)"""
+    db_category = models.Category(name=name)
+    db.add(db_category)
+    db.flush()
+    return db_category
+
 def add_post_image(db: Session, post_id: int, image_url: str) -> models.PostImage:
 
     
@@ -245,10 +437,9 @@ def add_post_image(db: Session, post_id: int, image_url: str) -> models.PostImag
         image_url=image_url
     )
     
-    # 2. 存入数据库
+    # 2. 存入数据库 (flush 之后就有 id 了，由接口统一 commit)
     db.add(db_image)
-    db.commit()
-    db.refresh(db_image) # 刷新，以获取新创建的 id
+    db.flush()
     
     # 3. 返回新创建的图片模型
     return db_image
@@ -261,44 +452,300 @@ def get_favorite(db: Session, user_id: int, post_id: int) -> Optional[models.Fav
         models.Favorite.post_id == post_id
     ).first()
 
-def favorite_post(db: Session, user_id: int, post_id: int) -> models.Favorite:
+def _insert_ignore_duplicates(db: Session, table):
+    """
+    根据数据库方言构造 "遇到主键冲突就什么都不做" 的 INSERT 语句
+    (MySQL: INSERT IGNORE / PostgreSQL、SQLite: ON CONFLICT DO NOTHING)
+    """
+    dialect = db.get_bind().dialect.name
+
+    # 按需导入：只加载正在使用的方言 (postgresql 方言单独导入就要几十毫秒)
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        return mysql_insert(table).prefix_with("IGNORE")
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+        return postgresql_insert(table).on_conflict_do_nothing()
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    return sqlite_insert(table).on_conflict_do_nothing()
 
-    # 1. 创建一个 Favorite (收藏) 数据库对象
-    db_favorite = models.Favorite(
-        user_id=user_id,
-        post_id=post_id
+def favorite_post(db: Session, user_id: int, post_id: int) -> bool:
+    """
+    收藏帖子（幂等，一条 INSERT 语句完成）
+    
+    使用 INSERT ... SELECT FROM posts，所以帖子不存在时不会插入任何数据；
+    重复收藏（包括并发的双击）由数据库的主键冲突处理直接忽略，不会抛 IntegrityError。
+    
+    Returns:
+        True 表示新插入了收藏记录；False 表示已经收藏过或帖子不存在
+    """
+    # 1. INSERT INTO favorites (user_id, post_id)
+    #    SELECT :user_id, posts.id FROM posts WHERE posts.id = :post_id
+    #    ON CONFLICT DO NOTHING
+    source = select(
+        literal(user_id, type_=Integer),
+        models.Post.id
+    ).where(models.Post.id == post_id)
+    
+    stmt = _insert_ignore_duplicates(db, models.Favorite.__table__).from_select(
+        ["user_id", "post_id"], source
     )
+    inserted = db.execute(stmt).rowcount == 1
     
-    # 2. 存入数据库
-    db.add(db_favorite)
-    db.commit()
-    db.refresh(db_favorite)
+    # 2. 只有真正插入了才在数据库中原子地 +1
+    #    (UPDATE ... SET favorite_count = favorite_count + 1，不在 Python 里读-改-写)
+    if inserted:
+        db.query(models.Post).filter(models.Post.id == post_id).update(
+            {
+                models.Post.favorite_count: models.Post.favorite_count + 1,
+                # 收藏数变化不算修改帖子：显式写回原值，不触发 onupdate (updated_at / ETag 不变)
+                models.Post.updated_at: models.Post.updated_at,
+            },
+            synchronize_session=False
+        )
     
-    return db_favorite
+    return inserted
 
-def unfavorite_post(db: Session, db_favorite: models.Favorite):
+def unfavorite_post(db: Session, user_id: int, post_id: int) -> bool:
+    """
+    取消收藏（幂等，一条 DELETE 语句完成）
+    
+    Returns:
+        True 表示删除了收藏记录；False 表示本来就没有收藏
+    """
+    deleted = db.query(models.Favorite).filter(
+        models.Favorite.user_id == user_id,
+        models.Favorite.post_id == post_id
+    ).delete(synchronize_session=False) == 1
+    
+    # 只有真正删除了才原子地 -1，并保证计数不会变成负数
+    if deleted:
+        db.query(models.Post).filter(
+            models.Post.id == post_id,
+            models.Post.favorite_count > 0
+        ).update(
+            {
+                models.Post.favorite_count: models.Post.favorite_count - 1,
+                models.Post.updated_at: models.Post.updated_at,  # 同上，不改变 updated_at
+            },
+            synchronize_session=False
+        )
+    
+    return deleted
 
-    db.delete(db_favorite)
-    db.commit()
-    return
+def reconcile_favorite_counts(db: Session) -> int:
+    """
+    根据 favorites 表重新校正所有帖子的 favorite_count（对账任务）
+    
+    只更新计数与实际收藏数不一致的帖子，返回被修正的帖子数量。
+    """
+    # 关联子查询：每个帖子在 favorites 表中的真实收藏数
+    actual_count = (
+        select(func.count())
+        .where(models.Favorite.post_id == models.Post.id)
+        .correlate(models.Post)
+        .scalar_subquery()
+    )
+    
+    updated_count = db.query(models.Post).filter(
+        models.Post.favorite_count != actual_count
+    ).update(
+        {
+            models.Post.favorite_count: actual_count,
+            models.Post.updated_at: models.Post.updated_at,  # 对账不算修改帖子，不改变 updated_at
+        },
+        synchronize_session=False
+    )
+    
+    return updated_count
+
+def get_feed_version(db: Session):
+    """
+    个性化首页候选帖子的 "版本号" (一次聚合查询)：发帖 / 删帖 / 售出 / 下架 / 修改后会改变
+    
+    updated_at 只精确到秒，同一秒内的修改可能看不出来 (由 feed 缓存的过期时间兜底)
+    
+    Returns:
+        tuple: (帖子数, 在售帖子数, 最大 updated_at, 最大帖子 ID)
+    """
+    available = case((models.Post.status == models.Post.StatusEnum.available, 1), else_=0)
+    return db.query(
+        func.count(models.Post.id),
+        func.coalesce(func.sum(available), 0),
+        func.max(models.Post.updated_at),
+        func.max(models.Post.id)
+    ).one()
 
-def get_user_favorites(db: Session, user_id: int) -> List[models.Post]:
+def get_feed_candidates(db: Session, limit: int):
+    """个性化首页的候选帖子：最新的 limit 个在售帖子 (只取排序需要的列)"""
+    return db.query(
+        models.Post.id, models.Post.owner_id, models.Post.category_id,
+        models.Post.post_type, models.Post.price, models.Post.created_at
+    ).filter(
+        models.Post.status == models.Post.StatusEnum.available
+    ).order_by(models.Post.created_at.desc(), models.Post.id.desc()).limit(limit).all()
 
-    # 1. ⬇️ 关键：执行数据库的 "JOIN" (连接) 查询 ⬇️
-    #    我们说“我想要查询 Post (帖子) 表”...
-    query = db.query(models.Post).join(
-        models.Favorite, # ...“把它和 Favorite (收藏) 表连接起来”...
-        models.Favorite.post_id == models.Post.id # ...“连接的条件是 Post.id 等于 Favorite.post_id”
-    )
+def get_user_interactions(db: Session, user_id: int, limit: int = 200):
+    """
+    用户最近收藏过的帖子和发过私信的帖子的 (分类 ID, 价格)，用于计算个性化首页的偏好
     
-    # 2. (在连接后的“大表”中) 筛选出 "Favorite.user_id" 是当前用户的记录
-    query = query.filter(models.Favorite.user_id == user_id)
+    Returns:
+        tuple: (收藏的帖子列表, 私信过的帖子列表)
+    """
+    favorited = db.query(models.Post.category_id, models.Post.price).join(
+        models.Favorite, models.Favorite.post_id == models.Post.id
+    ).filter(
+        models.Favorite.user_id == user_id
+    ).order_by(models.Favorite.created_at.desc()).limit(limit).all()
     
-    # 3. (可选) 按收藏时间倒序排列，让最新收藏的排在最前面
-    query = query.order_by(models.Favorite.created_at.desc())
+    messaged_post_ids = select(models.Message.post_id).where(
+        models.Message.sender_id == user_id
+    ).distinct()
+    messaged = db.query(models.Post.category_id, models.Post.price).filter(
+        models.Post.id.in_(messaged_post_ids)
+    ).order_by(models.Post.id.desc()).limit(limit).all()
     
-    # 4. 返回所有匹配的“帖子 (Post)”对象的列表
-    return query.all()
+    return favorited, messaged
+
+def get_trending_scores(db: Session, since: float):
+    """updated_at 晚于 since 的热度分数 [(帖子 ID, 分数, 更新时间)]"""
+    return db.query(
+        models.TrendingScore.post_id, models.TrendingScore.score, models.TrendingScore.updated_at
+    ).filter(models.TrendingScore.updated_at > since).all()
+
+def add_trending_scores(db: Session, deltas: Dict[int, float], now: float, half_life: float) -> int:
+    """
+    把热度增量累加到数据库 (deltas 是 now 时刻的值)；已有的分数先衰减到 now 再相加
+    
+    各个 worker 都会写同一批帖子，已有的行用 SELECT ... FOR UPDATE 锁住再更新。
+    帖子已经不存在的增量直接丢掉。
+    
+    Returns:
+        int: 写入的帖子数
+    """
+    if not deltas:
+        return 0
+    deltas = dict(deltas)
+    rows = db.query(models.TrendingScore).filter(
+        models.TrendingScore.post_id.in_(deltas)
+    ).with_for_update().all()
+    for row in rows:
+        decayed = row.score * 0.5 ** ((now - row.updated_at) / half_life)
+        row.score = max(0.0, decayed + deltas.pop(row.post_id))
+        row.updated_at = now
+    
+    if deltas:
+        existing_posts = {
+            post_id for (post_id,) in
+            db.query(models.Post.id).filter(models.Post.id.in_(deltas))
+        }
+        new_rows = [
+            {"post_id": post_id, "score": max(0.0, delta), "updated_at": now}
+            for post_id, delta in deltas.items() if post_id in existing_posts
+        ]
+        if new_rows:
+            # 另一个 worker 可能刚插入同一个帖子的行：冲突的那一次增量忽略 (对排序影响很小)
+            db.execute(_insert_ignore_duplicates(db, models.TrendingScore.__table__), new_rows)
+    else:
+        new_rows = []
+    db.flush()
+    return len(rows) + len(new_rows)
+
+def delete_stale_trending_scores(db: Session, before: float) -> int:
+    """删除很久没有更新 (已经衰减到可以忽略) 的热度分数"""
+    return db.query(models.TrendingScore).filter(
+        models.TrendingScore.updated_at < before
+    ).delete(synchronize_session=False)
+
+def _encode_favorites_cursor(created_at, post_id: int) -> str:
+    """收藏列表的游标：上一页最后一条的 (收藏时间, 帖子 ID)，编码成不透明的 base64 字符串"""
+    payload = json.dumps([created_at.isoformat(" ") if created_at else None, post_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def _decode_favorites_cursor(cursor: str):
+    """返回 (收藏时间字符串, 帖子 ID)；游标格式不对时抛出 ValueError"""
+    created_at, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(post_id, int) or (created_at is not None and not isinstance(created_at, str)):
+        raise ValueError("无效的分页游标")
+    if created_at is not None:
+        datetime.fromisoformat(created_at)  # 只是校验格式
+    return created_at, post_id
+
+def get_user_favorites(
+    db: Session,
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    summary: bool = False
+):
+    """
+    获取用户的收藏列表（按收藏时间倒序，游标分页）
+    
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        cursor: 上一页返回的 next_cursor（上一页最后一条的收藏时间和帖子 ID），为空表示从第一页开始
+        limit: 每页最多返回的帖子数（最多 100）
+        summary: 为 True 时只读取帖子卡片 (PostSummary) 需要的列
+    
+    Returns:
+        tuple: (帖子列表, 收藏总数, 下一页游标；没有下一页时为 None)
+    
+    Raises:
+        ValueError: 游标格式不对
+    """
+    limit = max(1, min(limit, 100))
+    
+    # 1. 查询 Post 和收藏时间
+    #    (JOIN favorites，走 ix_favorites_user_id_created_at 索引)
+    query = db.query(models.Post, models.Favorite.created_at).join(
+        models.Favorite,
+        models.Favorite.post_id == models.Post.id
+    ).filter(models.Favorite.user_id == user_id)
+    
+    # 2. 预加载卖家、分类和图片，避免逐个帖子懒加载 (N+1 查询)
+    query = query.options(*post_loader_options(summary))
+    
+    # 3. 从游标位置继续：收藏时间更早的，或同一时间但帖子 ID 更小的
+    #    游标里带着收藏时间，上一页最后一条被取消收藏 / 帖子被删除也能接着翻页。
+    #    收藏时间按数据库里的文本格式 ("YYYY-MM-DD HH:MM:SS") 作为字符串参数比较：
+    #    作为 datetime 绑定的话 SQLite 会带上 ".000000"，同一秒的收藏按字符串比较会出错
+    if cursor:
+        cursor_created_at, cursor_post_id = _decode_favorites_cursor(cursor)
+        if cursor_created_at is None:
+            query = query.filter(
+                models.Favorite.created_at.is_(None),
+                models.Favorite.post_id < cursor_post_id
+            )
+        else:
+            cursor_created_at = literal(cursor_created_at, type_=String)
+            query = query.filter(
+                or_(
+                    models.Favorite.created_at < cursor_created_at,
+                    and_(
+                        models.Favorite.created_at == cursor_created_at,
+                        models.Favorite.post_id < cursor_post_id
+                    )
+                )
+            )
+    
+    # 4. 按收藏时间倒序，多取一条用来判断是否还有下一页
+    rows = query.order_by(
+        models.Favorite.created_at.desc(),
+        models.Favorite.post_id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_post, last_created_at = rows[-1]
+        next_cursor = _encode_favorites_cursor(last_created_at, last_post.id)
+    
+    total = db.query(func.count()).select_from(models.Favorite).filter(
+        models.Favorite.user_id == user_id
+    ).scalar()
+    
+    return [post for post, _ in rows], total, next_cursor
 
 
 def create_message(
@@ -318,10 +765,9 @@ def create_message(
         # 'created_at' 和 'read' 字段会自动使用数据库的默认值
     )
     
-    # 2. 存入数据库
+    # 2. 存入数据库 (由接口统一 commit)
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    db.flush()
     
     return db_message
 
@@ -363,14 +809,20 @@ def get_conversation_messages(
     # 4. 返回所有消息
     return query.all()
 
-def get_user_inbox(db: Session, user_id: int) -> List[schemas.InboxConversation]:
-
+def get_user_inbox(db: Session, user_id: int, summary: bool = False) -> List[dict]:
+    """
+    获取用户的收件箱（按会话分组，每个会话只保留最新一条消息）
+    summary 为 True 时，会话中的帖子只读取 PostSummary 需要的列
+    
+    返回的每一项是 {"post", "other_user", "last_message"} 三个 ORM 对象组成的 dict，
+    字段与 schemas.InboxConversation 对应，由路由层负责序列化
+    """
     # 1. 查询所有与该用户相关的消息
     #    .options(joinedload(...)) 是一个“预加载”优化：
     #    告诉 SQLAlchemy 在一次查询中，同时获取关联的
-    #    post, sender, 和 receiver 对象，避免“N+1查询”
+    #    post (连同卖家、分类、图片), sender, 和 receiver 对象，避免“N+1查询”
     messages_query = db.query(models.Message).options(
-        joinedload(models.Message.post),
+        *post_loader_options(summary, parent=joinedload(models.Message.post)),
         joinedload(models.Message.sender),
         joinedload(models.Message.receiver)
     ).filter(
@@ -385,7 +837,7 @@ def get_user_inbox(db: Session, user_id: int) -> List[schemas.InboxConversation]
     
     # 3. ⬇️ 关键：在 Python 中处理，按“会话”分组 ⬇️
     
-    inbox_list: List[schemas.InboxConversation] = []
+    inbox_list: List[dict] = []
     processed_keys = set() # 用来跟踪已处理的会话 (post_id, other_user_id)
     
     for msg in messages:
@@ -407,13 +859,12 @@ def get_user_inbox(db: Session, user_id: int) -> List[schemas.InboxConversation]
             # 7. 确定 "other_user" 对象
             other_user = msg.sender if msg.sender_id != user_id else msg.receiver
             
-            # 8. 组装成 InboxConversation
-            #    (Pydantic 会自动把 models.Post 转换为 schemas.Post)
-            inbox_item = schemas.InboxConversation(
-                post=msg.post,
-                other_user=other_user,
-                last_message=msg
-            )
+            # 8. 组装成一个会话 (对应 schemas.InboxConversation)
+            inbox_item = {
+                "post": msg.post,
+                "other_user": other_user,
+                "last_message": msg
+            }
             
             # 9. 添加到结果列表
             inbox_list.append(inbox_item)
@@ -439,10 +890,9 @@ def create_report(
         # 'status' 字段会自动使用数据库的默认值 (e.g., 'pending')
     )
     
-    # 2. 存入数据库
+    # 2. 存入数据库 (由接口统一 commit)
     db.add(db_report)
-    db.commit()
-    db.refresh(db_report)
+    db.flush()
     
     return db_report
 
@@ -465,8 +915,6 @@ def mark_conversation_as_read(
         models.Message.is_read == False                 # 未读的
     ).update({"is_read": True}, synchronize_session=False)
     
-    db.commit()
-    
     return updated_count
 
 # =======================================================================
@@ -482,15 +930,17 @@ def create_transaction(
     """
     创建交易记录（卖家标记已售出时调用）
     """
+    # 接口刚检查过卖家和买家，db.get 直接从 Session 里取，不会再查数据库；
+    # 关联对象挂在交易上，序列化响应时也不用再查
+    # (post 只给 id：给对象的话反向的一对一关系 Post.transaction 会先查一次旧值)
     db_transaction = models.Transaction(
         post_id=post_id,
-        seller_id=seller_id,
-        buyer_id=buyer_id
+        seller=db.get(models.User, seller_id),
+        buyer=db.get(models.User, buyer_id)
     )
     
     db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+    db.flush()
     
     return db_transaction
 
@@ -501,7 +951,7 @@ def get_transaction_by_post_id(db: Session, post_id: int) -> Optional[models.Tra
     return db.query(models.Transaction).options(
         joinedload(models.Transaction.seller),
         joinedload(models.Transaction.buyer),
-        joinedload(models.Transaction.post)
+        *post_loader_options(parent=joinedload(models.Transaction.post))
     ).filter(models.Transaction.post_id == post_id).first()
 
 def get_transaction_by_id(db: Session, transaction_id: int) -> Optional[models.Transaction]:
@@ -511,7 +961,7 @@ def get_transaction_by_id(db: Session, transaction_id: int) -> Optional[models.T
     return db.query(models.Transaction).options(
         joinedload(models.Transaction.seller),
         joinedload(models.Transaction.buyer),
-        joinedload(models.Transaction.post)
+        *post_loader_options(parent=joinedload(models.Transaction.post))
     ).filter(models.Transaction.id == transaction_id).first()
 
 def confirm_transaction(
@@ -522,31 +972,58 @@ def confirm_transaction(
     """
     确认交易（买家或卖家确认）
     如果双方都确认，则完成交易并增加双方的 success_trades
+    
+    所有状态变化都用带条件的 UPDATE 在数据库里完成，并放在同一个事务中 (由接口 commit)：
+    - 只有 "还没确认" 时才能确认成功，重复确认会抛出 ValueError
+    - 只有 "双方都已确认且 completed = 0" 时才会完成交易，
+      所以即使买卖双方同时确认，交易也只会被完成一次，success_trades 只加一次
     """
-    # 判断是买家还是卖家
+    # 1. 判断是买家还是卖家，决定要更新哪个确认字段
     if user_id == transaction.seller_id:
-        transaction.seller_confirmed = True
+        confirmed_column = models.Transaction.seller_confirmed
     elif user_id == transaction.buyer_id:
-        transaction.buyer_confirmed = True
+        confirmed_column = models.Transaction.buyer_confirmed
     else:
         raise ValueError("用户不是交易的买家或卖家")
     
-    # 检查是否双方都确认
-    if transaction.seller_confirmed and transaction.buyer_confirmed and not transaction.completed:
-        transaction.completed = True
-        transaction.completed_at = func.now()
-        
-        # 增加双方的成功交易次数
-        seller = db.query(models.User).filter(models.User.id == transaction.seller_id).first()
-        buyer = db.query(models.User).filter(models.User.id == transaction.buyer_id).first()
-        
-        if seller:
-            seller.success_trades += 1
-        if buyer:
-            buyer.success_trades += 1
+    # 2. UPDATE transactions SET xxx_confirmed = 1
+    #    WHERE id = :id AND xxx_confirmed = 0
+    #    (synchronize_session="evaluate"：同时在内存里把 transaction 的确认字段改掉，不用再查)
+    confirmed = db.query(models.Transaction).filter(
+        models.Transaction.id == transaction.id,
+        confirmed_column == False
+    ).update({confirmed_column: True}, synchronize_session="evaluate")
+    
+    if confirmed == 0:
+        raise ValueError("您已经确认过该交易")
+    
+    # 3. UPDATE transactions SET completed = 1, completed_at = NOW()
+    #    WHERE id = :id AND seller_confirmed = 1 AND buyer_confirmed = 1 AND completed = 0
+    #    (只有一个请求能让这条语句影响到 1 行)
+    completed = db.query(models.Transaction).filter(
+        models.Transaction.id == transaction.id,
+        models.Transaction.seller_confirmed == True,
+        models.Transaction.buyer_confirmed == True,
+        models.Transaction.completed == False
+    ).update(
+        {
+            models.Transaction.completed: True,
+            models.Transaction.completed_at: func.now()
+        },
+        synchronize_session=False
+    )
     
-    db.commit()
-    db.refresh(transaction)
+    # 4. 完成交易的那个请求负责在数据库中给双方的成功交易次数 +1
+    #    (已经加载到 Session 里的买家 / 卖家对象也在内存里 +1)
+    if completed == 1:
+        db.query(models.User).filter(
+            models.User.id.in_([transaction.seller_id, transaction.buyer_id])
+        ).update(
+            {models.User.success_trades: models.User.success_trades + 1},
+            synchronize_session="evaluate"
+        )
+        # completed_at 是数据库的 NOW()，只有完成交易时才需要重新读一次
+        db.expire(transaction, ["completed", "completed_at"])
     
     return transaction
 
@@ -557,7 +1034,7 @@ def get_pending_transactions_for_user(db: Session, user_id: int) -> List[models.
     return db.query(models.Transaction).options(
         joinedload(models.Transaction.seller),
         joinedload(models.Transaction.buyer),
-        joinedload(models.Transaction.post)
+        *post_loader_options(parent=joinedload(models.Transaction.post))
     ).filter(
         or_(
             models.Transaction.seller_id == user_id,
@@ -570,27 +1047,109 @@ def get_users_who_contacted_post(db: Session, post_id: int, owner_id: int) -> Li
     """
     获取与帖主联系过的所有用户（用于选择买家）
     返回去重后的用户列表
+    
+    在一条 SQL 中完成：先在 messages 里取出 "对方" 的用户 ID 并 DISTINCT 去重，
+    再 JOIN users（由 ix_messages_post_id_sender_id_receiver_id 覆盖索引支撑）
     """
-    # 查询所有与该帖子相关的消息
-    messages = db.query(models.Message).filter(
+    # 1. 每条消息的 "对方"：帖主发出的取接收者，否则取发送者
+    counterpart_id = case(
+        (models.Message.sender_id == owner_id, models.Message.receiver_id),
+        else_=models.Message.sender_id
+    ).label("user_id")
+    
+    # 2. 该帖子下与帖主有关的消息中，去重后的对方用户 ID
+    contacted = select(counterpart_id).where(
         models.Message.post_id == post_id,
         or_(
             models.Message.sender_id == owner_id,
             models.Message.receiver_id == owner_id
         )
-    ).all()
+    ).distinct().subquery()
     
-    # 提取对方用户ID并去重
-    user_ids = set()
-    for msg in messages:
-        if msg.sender_id != owner_id:
-            user_ids.add(msg.sender_id)
-        if msg.receiver_id != owner_id:
-            user_ids.add(msg.receiver_id)
+    # 3. JOIN users 取出这些用户
+    return db.query(models.User).join(
+        contacted, models.User.id == contacted.c.user_id
+    ).filter(models.User.id != owner_id).all()
+
+# =======================================================================
+# SavedSearch (保存的搜索 / 新帖提醒) 相关函数
+# =======================================================================
+
+def create_saved_search(db: Session, user_id: int, search: schemas.SavedSearchCreate) -> models.SavedSearch:
+    db_search = models.SavedSearch(**search.dict(), user_id=user_id)
+    # 由接口统一 commit
+    db.add(db_search)
+    db.flush()
+    return db_search
+
+def get_saved_searches(db: Session, user_id: int) -> List[models.SavedSearch]:
+    return db.query(models.SavedSearch).filter(
+        models.SavedSearch.user_id == user_id
+    ).order_by(desc(models.SavedSearch.id)).all()
+
+def count_saved_searches(db: Session, user_id: int) -> int:
+    return db.query(func.count(models.SavedSearch.id)).filter(
+        models.SavedSearch.user_id == user_id
+    ).scalar()
+
+def get_saved_search_by_id(db: Session, saved_search_id: int) -> Optional[models.SavedSearch]:
+    return db.get(models.SavedSearch, saved_search_id)
+
+def delete_saved_search(db: Session, db_search: models.SavedSearch):
+    db.delete(db_search)
+    db.flush()
+
+def get_saved_searches_version(db: Session):
+    """保存的搜索的 (总数, 最大 ID)，用来判断内存里的索引是否需要同步"""
+    return db.query(
+        func.count(models.SavedSearch.id), func.max(models.SavedSearch.id)
+    ).one()
+
+def get_saved_search_conditions(db: Session, after_id: int = 0):
+    """ID 大于 after_id 的保存的搜索的条件 (建立匹配索引用，只取需要的列)"""
+    return db.query(
+        models.SavedSearch.id, models.SavedSearch.user_id, models.SavedSearch.keyword,
+        models.SavedSearch.category_id, models.SavedSearch.post_type,
+        models.SavedSearch.min_price, models.SavedSearch.max_price
+    ).filter(models.SavedSearch.id > after_id).order_by(models.SavedSearch.id).all()
+
+def create_notifications(db: Session, post_id: int, saved_search_ids: List[int]) -> int:
+    """
+    给匹配到的保存的搜索的主人发新帖提醒 (一条 INSERT ... SELECT 语句)
     
-    # 查询这些用户
-    if not user_ids:
-        return []
+    从 saved_searches 表里 SELECT，所以匹配之后被删除的搜索不会再发提醒。
     
-    users = db.query(models.User).filter(models.User.id.in_(user_ids)).all()
-    return users
+    Returns:
+        int: 发出的提醒数
+    """
+    if not saved_search_ids:
+        return 0
+    source = select(
+        models.SavedSearch.user_id, literal(post_id), models.SavedSearch.id
+    ).where(models.SavedSearch.id.in_(saved_search_ids))
+    stmt = models.Notification.__table__.insert().from_select(
+        ["user_id", "post_id", "saved_search_id"], source
+    )
+    return db.execute(stmt).rowcount
+
+def get_notifications(db: Session, user_id: int, unread_only: bool = False, limit: int = 50) -> List[models.Notification]:
+    """用户的新帖提醒 (最新的在前，帖子只加载卡片需要的列)"""
+    query = db.query(models.Notification).filter(models.Notification.user_id == user_id)
+    if unread_only:
+        query = query.filter(models.Notification.is_read == False)
+    return query.options(
+        *post_loader_options(summary=True, parent=joinedload(models.Notification.post))
+    ).order_by(desc(models.Notification.id)).limit(max(1, min(limit, 100))).all()
+
+def count_unread_notifications(db: Session, user_id: int) -> int:
+    return db.query(func.count(models.Notification.id)).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == False
+    ).scalar()
+
+def mark_notifications_as_read(db: Session, user_id: int) -> int:
+    """把用户的提醒全部标记为已读，返回被更新的数量"""
+    return db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == False
+    ).update({"is_read": True}, synchronize_session=False)
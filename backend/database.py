@@ -1,12 +1,76 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from .config import settings  
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# 引擎在第一次使用时才创建：导入 backend.main 不会加载数据库驱动，也不会连接数据库
+# (建表由 `python -m backend.manage upgrade-schema` 负责，不在导入时执行)
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def _create_engine() -> Engine:
+    # SQLite (本地开发 / 基准测试) 用 SQLAlchemy 的默认连接池；
+    # 其它数据库按配置设置连接池大小，并在使用前检测断开的连接
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        return create_engine(SQLALCHEMY_DATABASE_URL)
+    return create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+def get_engine() -> Engine:
+    """返回全局引擎 (第一次调用时创建)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine()
+    return _engine
+
+
+def dispose_engine(close: bool = True):
+    """
+    关闭连接池里的连接 (引擎还没创建时什么都不做)
+    close=False：只丢弃连接不关闭，fork 出来的子进程用它放弃从父进程继承的连接
+    """
+    if _engine is not None:
+        _engine.dispose(close=close)
+
+
+# 一个请求 = 一个事务 (unit of work)：crud 里的写操作只 flush，由接口在最后 commit 一次
+# expire_on_commit=False：commit 之后对象不过期，序列化响应时不用把刚写入的行再查一遍
+_session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+
+
+def SessionLocal() -> Session:
+    return _session_factory(bind=get_engine())
+
+
+def on_commit(db: Session, callback: Callable[[], None]):
+    """事务提交成功之后再执行 callback (比如删除旧的图片文件)；事务回滚则丢弃"""
+    db.info.setdefault("on_commit", []).append(callback)
+
+
+@event.listens_for(_session_factory, "after_commit")
+def _run_on_commit(session: Session):
+    for callback in session.info.pop("on_commit", []):
+        callback()
+
+
+@event.listens_for(_session_factory, "after_soft_rollback")
+def _discard_on_commit(session: Session, previous_transaction):
+    session.info.pop("on_commit", None)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
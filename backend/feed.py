@@ -0,0 +1,212 @@
+"""
+个性化首页 (GET /api/users/me/feed)
+
+按用户收藏过 / 发过私信的帖子计算一个偏好向量 (各分类的占比 + 各价格区间的占比)，
+给最新的一批在售帖子 (候选) 打分排序：
+
+    分数 = CATEGORY_SCORE × 分类偏好 + PRICE_SCORE × 价格区间偏好 + RECENCY_SCORE × 新鲜度
+
+没有收藏和私信记录的用户只剩新鲜度，结果和默认的 "最新发布" 一样。
+
+- 候选帖子在内存里保存一份快照 (只有排序需要的几列)，所有用户共用；
+  发帖 / 改帖 / 删帖 / 售出后作废，下一个请求重新读取 (一次查询)
+- 每个用户缓存偏好向量和排好序的候选帖子。候选变化时只用缓存的偏好重新排序 (不查数据库)，
+  用户自己收藏 / 取消收藏 / 发私信后偏好才重新计算
+- 命中缓存时接口只需要一次聚合查询 (帖子表的版本号) 和当前这一页的帖子
+
+缓存在每个 worker 的内存里，最多保存 max_users 个用户 (超出时淘汰最久没访问的)。
+写操作只通知处理它的那个 worker，所以每个请求先用 get_feed_version 检查帖子表有没有变化
+(其它 worker 上的发帖 / 改帖 / 删帖 / 售出)；快照和偏好另外最多保存 ttl 秒，
+其它 worker 上的收藏 / 私信最多 ttl 秒后反映到偏好里。
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import crud, metrics, models
+from .config import settings
+
+PRICE_BOUNDS = (500, 1000, 3000, 10000, 30000)  # 价格区间的分界 (日元)；0 元 (免费) 单独一档
+N_PRICE_BUCKETS = len(PRICE_BOUNDS) + 2
+FAVORITE_WEIGHT = 2.0   # 收藏比发私信更能说明喜好
+MESSAGE_WEIGHT = 1.0
+NEIGHBOR_PRICE_WEIGHT = 0.5  # 相邻的价格区间也算一半
+CATEGORY_SCORE = 1.0
+PRICE_SCORE = 0.5
+RECENCY_SCORE = 0.5
+RECENCY_HALF_LIFE_DAYS = 7
+
+
+def price_bucket(price) -> int:
+    price = float(price or 0)
+    return 0 if price <= 0 else 1 + bisect_right(PRICE_BOUNDS, price)
+
+
+class Candidate(NamedTuple):
+    id: int
+    owner_id: int
+    category_id: int
+    post_type: models.Post.PostTypeEnum
+    price_bucket: int
+    age_days: float  # 比候选里最新的帖子早多少天 (用相对时间，不受数据库时区影响)
+
+
+class Preference(NamedTuple):
+    categories: Dict[int, float]  # 分类 ID -> 占比
+    prices: Tuple[float, ...]     # 各价格区间的占比
+
+
+class _CandidateSnapshot(NamedTuple):
+    version: int
+    db_version: tuple              # 读取时帖子表的版本号 (crud.get_feed_version)
+    loaded_at: float
+    candidates: Tuple[Candidate, ...]
+
+
+class _UserFeed(NamedTuple):
+    preference: Preference
+    computed_at: float             # 偏好的计算时间
+    version: int                   # 排序时用的候选快照版本
+    ranked: Tuple[Candidate, ...]
+
+
+def build_preference(favorited: Iterable, messaged: Iterable) -> Preference:
+    """(分类 ID, 价格) 列表 -> 偏好向量"""
+    categories: Dict[int, float] = {}
+    prices = [0.0] * N_PRICE_BUCKETS
+    for rows, weight in ((favorited, FAVORITE_WEIGHT), (messaged, MESSAGE_WEIGHT)):
+        for category_id, price in rows:
+            categories[category_id] = categories.get(category_id, 0.0) + weight
+            bucket = price_bucket(price)
+            prices[bucket] += weight
+            for neighbor in (bucket - 1, bucket + 1):
+                if 0 <= neighbor < N_PRICE_BUCKETS:
+                    prices[neighbor] += weight * NEIGHBOR_PRICE_WEIGHT
+
+    category_total = sum(categories.values()) or 1.0
+    price_total = max(prices) or 1.0
+    return Preference(
+        categories={category_id: value / category_total for category_id, value in categories.items()},
+        prices=tuple(value / price_total for value in prices),
+    )
+
+
+def rank(candidates: Iterable[Candidate], preference: Preference, user_id: int) -> Tuple[Candidate, ...]:
+    """给候选帖子打分，按分数从高到低排序 (不包括用户自己的帖子)"""
+    categories, prices = preference.categories, preference.prices
+    scored = [
+        (
+            CATEGORY_SCORE * categories.get(candidate.category_id, 0.0)
+            + PRICE_SCORE * prices[candidate.price_bucket]
+            + RECENCY_SCORE * 0.5 ** (candidate.age_days / RECENCY_HALF_LIFE_DAYS),
+            candidate,
+        )
+        for candidate in candidates
+        if candidate.owner_id != user_id
+    ]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return tuple(candidate for _, candidate in scored)
+
+
+class FeedCache:
+    """
+    Args:
+        max_candidates: 候选帖子数 (最新的多少个在售帖子参与排序)
+        max_users: 最多缓存多少个用户的首页
+        ttl: 候选快照和用户偏好最多保存的秒数
+    """
+
+    def __init__(self, max_candidates: int = 1000, max_users: int = 10000, ttl: float = 300):
+        self.max_candidates = max_candidates
+        self.max_users = max_users
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot: Optional[_CandidateSnapshot] = None
+        self._users: "OrderedDict[int, _UserFeed]" = OrderedDict()
+        self._user_changes = 0  # invalidate_user 的次数 (读偏好期间有变化的话结果不缓存)
+
+    def invalidate_posts(self):
+        """帖子有新增 / 修改 / 删除 / 售出：候选快照作废，所有用户下次访问时重新排序"""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    def invalidate_user(self, user_id: int):
+        """用户的收藏 / 私信有变化：下次访问时重新计算偏好"""
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._user_changes += 1
+
+    def _candidates(self, db: Session) -> _CandidateSnapshot:
+        now = time.monotonic()
+        db_version = tuple(crud.get_feed_version(db))
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.db_version == db_version and now - snapshot.loaded_at < self.ttl:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is snapshot:  # 帖子在其它 worker 上有变化 / 过期：作废 (用户需要重新排序)
+                self._version += 1
+                self._snapshot = None
+            version = self._version
+        rows = crud.get_feed_candidates(db, self.max_candidates)
+        newest = max((row.created_at for row in rows if row.created_at is not None), default=None)
+        snapshot = _CandidateSnapshot(version, db_version, now, tuple(
+            Candidate(
+                id=row.id,
+                owner_id=row.owner_id,
+                category_id=row.category_id,
+                post_type=row.post_type,
+                price_bucket=price_bucket(row.price),
+                age_days=(newest - row.created_at).total_seconds() / 86400
+                if newest is not None and row.created_at is not None else 0.0,
+            )
+            for row in rows
+        ))
+        with self._lock:
+            if self._version == version:  # 读取期间又有帖子变化的话不保存，下个请求重新读
+                self._snapshot = snapshot
+        return snapshot
+
+    def get(self, db: Session, user_id: int) -> Tuple[Candidate, ...]:
+        """用户的个性化首页 (排好序的全部候选帖子)"""
+        snapshot = self._candidates(db)
+        with self._lock:
+            user_changes = self._user_changes
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+        hit = (
+            entry is not None
+            and entry.version == snapshot.version
+            and time.monotonic() - entry.computed_at < self.ttl
+        )
+        metrics.record_cache("feed", hit)
+        if hit:
+            return entry.ranked
+
+        now = time.monotonic()
+        if entry is not None and now - entry.computed_at < self.ttl:
+            preference, computed_at = entry.preference, entry.computed_at
+        else:
+            preference, computed_at = build_preference(*crud.get_user_interactions(db, user_id)), now
+        entry = _UserFeed(preference, computed_at, snapshot.version, rank(snapshot.candidates, preference, user_id))
+        with self._lock:
+            if self._user_changes == user_changes or user_id in self._users:
+                self._users[user_id] = entry
+                self._users.move_to_end(user_id)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+        return entry.ranked
+
+
+cache = FeedCache(
+    max_candidates=settings.FEED_CANDIDATES,
+    max_users=settings.FEED_CACHE_USERS,
+    ttl=settings.FEED_CACHE_TTL_SECONDS,
+)
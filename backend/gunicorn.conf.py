@@ -0,0 +1,46 @@
+"""
+生产环境的 gunicorn 配置 (多进程 + uvicorn worker)
+
+启动 (在项目根目录下运行):
+    gunicorn -c backend/gunicorn.conf.py
+
+- worker 数量默认按 CPU 核数自动计算 (2 * CPU + 1，不超过 MAX_WORKERS)，可以用 WORKERS 固定
+- preload_app：主进程先导入一次 backend.main (加载代码只做一次，导入时不连接数据库)，再 fork 出 worker
+- 启动前先运行 python -m backend.manage upgrade-schema 建表
+- post_fork：每个 worker 丢弃从主进程继承来的数据库连接，用自己的连接池
+- 多个 worker 之间不共享内存：Idempotency-Key 和限流要配置 IDEMPOTENCY_REDIS_URL / RATE_LIMIT_REDIS_URL
+  才能跨 worker 生效 (超时后的重试是新连接，可能落到另一个 worker 上)
+- 收到 SIGTERM 后停止接收新请求，等正在处理的请求完成 (最多 GRACEFUL_TIMEOUT 秒) 再退出
+"""
+import os
+
+from backend.config import settings
+
+
+def _cpu_count() -> int:
+    # 容器里优先看进程能用的 CPU (cgroup/affinity)，而不是宿主机的核数
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+wsgi_app = "backend.main:app"
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = settings.BIND
+workers = settings.WORKERS or min(2 * _cpu_count() + 1, settings.MAX_WORKERS)
+
+preload_app = True
+graceful_timeout = settings.GRACEFUL_TIMEOUT
+timeout = settings.GRACEFUL_TIMEOUT * 2
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """fork 之后，worker 不能复用主进程 (preload 时) 打开的连接，否则多个进程会共用同一个 socket"""
+    from backend.database import dispose_engine
+
+    dispose_engine(close=False)
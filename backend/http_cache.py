@@ -0,0 +1,110 @@
+"""
+HTTP 条件请求 (ETag / Last-Modified / 304 Not Modified)
+
+路由先用很便宜的方式算出 "版本号" (比如 updated_at、最大 ID、行数)，
+如果和客户端带来的 If-None-Match / If-Modified-Since 一致，
+就直接返回 304，跳过查询列表和序列化这些昂贵的步骤。
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+from . import metrics, models
+
+
+def make_etag(*parts) -> str:
+    """根据任意可 repr 的值生成弱 ETag，例如 W/"3f2a..." """
+    digest = hashlib.md5(repr(parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _http_date(value: datetime) -> str:
+    # 数据库里的 TIMESTAMP 不带时区，按 UTC 处理
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def is_not_modified(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    判断客户端缓存是否仍然有效
+    有 If-None-Match 时只看 ETag (弱比较)，否则再看 If-Modified-Since
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            hit = True
+        else:
+            candidates = {_strip_weak(tag.strip()) for tag in if_none_match.split(",")}
+            hit = _strip_weak(etag) in candidates
+        metrics.record_cache("http_conditional", hit)
+        return hit
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP 日期只精确到秒
+        hit = last_modified.replace(microsecond=0) <= since
+        metrics.record_cache("http_conditional", hit)
+        return hit
+
+    # 客户端没有带验证头，不算缓存查找
+    return False
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = "no-cache"
+) -> Response:
+    """
+    给响应加上 ETag / Last-Modified / Cache-Control 头
+    默认 no-cache：浏览器可以缓存，但每次使用前都要带 ETag 回来验证
+    """
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = _http_date(last_modified)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def not_modified(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = "no-cache"
+) -> Response:
+    """304 Not Modified 响应 (没有 body，只带验证头)"""
+    return set_validators(
+        Response(status_code=status.HTTP_304_NOT_MODIFIED),
+        etag,
+        last_modified,
+        cache_control,
+    )
+
+
+def post_etag(post: models.Post) -> str:
+    """
+    单个帖子的 ETag：由帖子自身的所有列、卖家展示信息、分类名和图片列表决定
+    (这些数据查询时已经加载好了，这里只是拼一个元组算哈希，不走 Pydantic 序列化)
+    """
+    columns = tuple(getattr(post, column.key) for column in models.Post.__table__.columns)
+    owner = (post.owner.username, post.owner.avatar_url, post.owner.success_trades)
+    images = tuple((image.id, image.image_url) for image in post.images)
+    return make_etag("post", columns, owner, post.category.name, images)
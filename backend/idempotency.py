@@ -0,0 +1,315 @@
+"""
+Idempotency-Key 支持 (POST 请求的安全重试)
+
+校园 Wi-Fi 下手机客户端经常因为超时重发 POST (发私信、发帖、传图)，
+没有去重的话会产生重复的数据库记录和重复的图片文件。
+
+客户端在请求头里带上 Idempotency-Key (比如每次操作生成一个 UUID，重试时沿用)：
+- 第一次请求正常执行，响应 (状态码、响应头、body) 保存 ttl 秒
+- 同一个用户用同一个 key 重试同一个接口时，直接返回保存的响应，不再执行接口，
+  响应头带 Idempotent-Replayed: true
+- 第一次请求还没处理完时收到重试：409
+- 同一个 key 但请求 body 不同 (客户端复用了 key)：422
+- 只保存 2xx 和结果确定的 4xx (400 / 403 / 404 / 422 等)；5xx、异常，
+  以及过一会儿重试结果就可能不同的 408 / 409 / 423 / 425 / 429 (超时、冲突、限流) 不保存，
+  客户端可以用同一个 key 重试
+
+存储：
+- 默认存在进程内存里，只在单个 worker 内有效。gunicorn 多 worker 部署时，超时后的重试是新连接，
+  可能落到另一个 worker 上，照样会把接口执行两次
+- 配置了 IDEMPOTENCY_REDIS_URL 时存在 Redis 里 (SET NX + 过期时间)，所有 worker 共享；
+  多 worker 部署请务必配置
+"""
+import base64
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # 没装 redis 时只能用进程内存储
+    redis = None
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+# 暂时性的 4xx：重试时结果可能不同 (比如限流的令牌桶已经补满)，保存下来会让重试一直失败
+TRANSIENT_STATUSES = frozenset({408, 409, 423, 425, 429})
+
+
+def is_storable(status: int) -> bool:
+    """这个状态码的响应是否保存下来供重试时重放"""
+    return 200 <= status < 300 or (400 <= status < 500 and status not in TRANSIENT_STATUSES)
+
+
+class StoredResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class _Entry:
+    def __init__(self, fingerprint: str, expires_at: float = 0.0, response: Optional[StoredResponse] = None):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.response = response  # None 表示还在处理中
+
+
+class MemoryIdempotencyStore:
+    """
+    进程内的 key -> 响应 存储，最多保存 max_entries 个 (超出时淘汰最早的)
+
+    只在事件循环线程里访问，不需要加锁
+    """
+
+    def __init__(self, ttl: float = 86400, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[_Entry]:
+        """
+        登记一个新请求；key 已经存在 (处理中或已完成) 时返回已有的记录，
+        返回 None 表示这是第一次请求，调用方需要执行接口并调用 complete / release
+        """
+        entry = self._get(key)
+        if entry is not None:
+            return entry
+
+        self._entries[key] = _Entry(fingerprint, time.monotonic() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return None
+
+    async def complete(self, key: str, fingerprint: str, response: StoredResponse):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.response = response
+
+    async def release(self, key: str):
+        """请求失败 (5xx / 暂时性的 4xx / 异常)，删除记录，允许用同一个 key 重试"""
+        self._entries.pop(key, None)
+
+
+class RedisIdempotencyStore:
+    """
+    存在 Redis 里的 key -> 响应，多个 worker / 多台机器共享
+
+    - begin：SET key {指纹} NX EX processing_ttl，只有一个 worker 能登记成功；
+      "处理中" 的记录只保留 processing_ttl 秒，worker 中途崩溃时 key 不会被占用一整天
+    - complete：把响应写进同一个 key，过期时间改成 ttl
+    - Redis 不可用时不做去重 (只写日志)，和限流一样，不能因为 Redis 把接口整个拖垮
+
+    Args:
+        client: redis.asyncio.Redis (用 create_store 按 URL 创建)
+    """
+
+    def __init__(self, client, ttl: float = 86400, processing_ttl: float = 300, prefix: str = "idempotency:"):
+        self.ttl = int(ttl)
+        self.processing_ttl = int(processing_ttl)
+        self.prefix = prefix
+        self._client = client
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[_Entry]:
+        pending = _encode_entry(fingerprint)
+        try:
+            for _ in range(2):  # 刚好在 SET 和 GET 之间过期的话再试一次
+                if await self._client.set(self.prefix + key, pending, nx=True, ex=self.processing_ttl):
+                    return None
+                value = await self._client.get(self.prefix + key)
+                if value is not None:
+                    return _decode_entry(value)
+        except redis.RedisError as e:
+            logger.warning("Idempotency-Key 的 Redis 不可用，不做去重: %s", e)
+        return None
+
+    async def complete(self, key: str, fingerprint: str, response: StoredResponse):
+        try:
+            value = _encode_entry(fingerprint, response)
+            await self._client.set(self.prefix + key, value, ex=self.ttl, xx=True)
+        except redis.RedisError as e:
+            logger.warning("Idempotency-Key 的响应没有保存到 Redis: %s", e)
+
+    async def release(self, key: str):
+        try:
+            await self._client.delete(self.prefix + key)
+        except redis.RedisError as e:
+            logger.warning("Idempotency-Key 没有从 Redis 删除 (processing_ttl 后自动过期): %s", e)
+
+
+def _encode_entry(fingerprint: str, response: Optional[StoredResponse] = None) -> str:
+    """Redis 里保存的值：指纹 + 响应 (处理中时没有响应)"""
+    data = {"fingerprint": fingerprint}
+    if response is not None:
+        # 响应头按 ASGI 规范是 latin-1 的 bytes，body 是任意 bytes
+        data["status"] = response.status
+        data["headers"] = [[name.decode("latin-1"), value.decode("latin-1")] for name, value in response.headers]
+        data["body"] = base64.b64encode(response.body).decode()
+    return json.dumps(data)
+
+
+def _decode_entry(value) -> _Entry:
+    data = json.loads(value)
+    if "status" not in data:
+        return _Entry(data["fingerprint"])
+    return _Entry(data["fingerprint"], response=StoredResponse(
+        data["status"],
+        [(name.encode("latin-1"), header.encode("latin-1")) for name, header in data["headers"]],
+        base64.b64decode(data["body"]),
+    ))
+
+
+def create_store(redis_url: str = "", ttl: float = 86400, max_entries: int = 10000):
+    if not redis_url:
+        return MemoryIdempotencyStore(ttl=ttl, max_entries=max_entries)
+    if redis is None:
+        raise RuntimeError("配置了 IDEMPOTENCY_REDIS_URL，但没有安装 redis (pip install redis)")
+    from redis.asyncio import Redis  # 用到时才导入 (asyncio 客户端导入较慢)
+
+    return RedisIdempotencyStore(Redis.from_url(redis_url), ttl=ttl)
+
+
+def _scoped_key(scope: Scope, headers: Headers, key: str) -> str:
+    """同一个 key 只在 "同一个用户 + 同一个接口" 内有效，不同用户之间不会互相重放"""
+    credentials = hashlib.sha256(headers.get("authorization", "").encode()).hexdigest()
+    return f"{credentials}:{scope['method']}:{scope['path']}:{key}"
+
+
+class IdempotencyMiddleware:
+    """
+    为带 Idempotency-Key 请求头的 POST 请求重放第一次的响应
+
+    Args:
+        ttl: 响应保存的秒数
+        max_entries: 最多保存的响应个数 (只用于进程内存储)
+        methods: 支持 Idempotency-Key 的请求方法
+        redis_url: 配置后存在 Redis 里，多个 worker 共享
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        ttl: float = 86400,
+        max_entries: int = 10000,
+        methods: Tuple[str, ...] = ("POST",),
+        redis_url: str = "",
+    ):
+        self.app = app
+        self.methods = tuple(methods)
+        self.store = create_store(redis_url, ttl=ttl, max_entries=max_entries)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        key = headers.get(HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await JSONResponse({"detail": "无效的 Idempotency-Key"}, status_code=400)(scope, receive, send)
+            return
+
+        # 先读完整个请求 body 计算指纹，之后再原样交给接口
+        messages = await _read_body(receive)
+        fingerprint = _fingerprint(headers, messages)
+        store_key = _scoped_key(scope, headers, key)
+        entry = await self.store.begin(store_key, fingerprint)
+        metrics.record_cache("idempotency", entry is not None)
+
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                response = JSONResponse({"detail": "Idempotency-Key 已用于不同的请求"}, status_code=422)
+            elif entry.response is None:
+                response = JSONResponse({"detail": "相同 Idempotency-Key 的请求正在处理中"}, status_code=409)
+            else:
+                await _replay(entry.response, send)
+                return
+            await response(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        body: List[bytes] = []
+        completed = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start, completed
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+                if not message.get("more_body", False) and is_storable(start["status"]):
+                    await self.store.complete(
+                        store_key,
+                        fingerprint,
+                        StoredResponse(start["status"], list(start.get("headers", [])), b"".join(body)),
+                    )
+                    completed = True
+            await send(message)
+
+        try:
+            await self.app(scope, _replay_receive(messages, receive), send_wrapper)
+        finally:
+            if not completed:
+                await self.store.release(store_key)
+
+
+async def _read_body(receive: Receive) -> List[Message]:
+    """读完请求 body，返回原始的 ASGI 消息列表"""
+    messages = []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request" or not message.get("more_body", False):
+            return messages
+
+
+def _fingerprint(headers: Headers, messages: List[Message]) -> str:
+    """
+    请求 body 的 sha256
+    multipart 上传每次请求的 boundary 是随机生成的，客户端重新构造请求重试时会变，计算前先去掉
+    """
+    body = b"".join(message.get("body", b"") for message in messages)
+    _, _, boundary = headers.get("content-type", "").partition("boundary=")
+    boundary = boundary.split(";")[0].strip().strip('"')
+    if boundary:
+        body = body.replace(boundary.encode("latin-1"), b"")
+    return hashlib.sha256(body).hexdigest()
+
+
+def _replay_receive(messages: List[Message], receive: Receive) -> Receive:
+    """先把已经读出来的消息交给接口，读完之后再转给原来的 receive (等待断开连接等)"""
+    pending = list(messages)
+
+    async def replay() -> Message:
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
+
+
+async def _replay(response: StoredResponse, send: Send):
+    start = {"type": "http.response.start", "status": response.status, "headers": list(response.headers)}
+    MutableHeaders(scope=start).append("Idempotent-Replayed", "true")
+    await send(start)
+    await send({"type": "http.response.body", "body": response.body})
@@ -0,0 +1,162 @@
+"""
+按请求统计 SQL (查询次数 / 数据库耗时 / 总耗时)
+
+- install(engine) 在 SQLAlchemy 引擎上挂 before/after_cursor_execute 事件，
+  每条语句执行完就记到 "当前请求" 的 RequestStats 里
+- RequestTimingMiddleware 为每个请求创建 RequestStats (放在 ContextVar 里，
+  同步路由在线程池中执行时也能拿到同一个对象)，并在响应头里加上 Server-Timing
+- 超过阈值 (耗时或查询次数) 的请求会连同执行过的 SQL 一起写进日志
+- 统计在响应体最后一块发出时结束，之后执行的 BackgroundTasks (发通知等)
+  不算进请求的耗时和 SQL
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# 日志里每个请求最多保留的 SQL 条数，防止 N+1 的请求把内存撑爆
+MAX_RECORDED_STATEMENTS = 50
+
+
+class RequestStats:
+    """一个请求内的 SQL 统计"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0  # 秒
+        self.statements: List[Tuple[str, float]] = []  # (SQL, 耗时秒)
+        self.finished: Optional[float] = None
+
+    def finish(self):
+        """响应已经发完：停止计时，之后的 SQL 也不再记录"""
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    def record(self, statement: str, duration: float):
+        if self.finished is not None:
+            return
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements.append((statement, duration))
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """当前请求的统计 (不在请求中时返回 None，比如维护命令)"""
+    return _current.get()
+
+
+@contextmanager
+def track() -> Iterator[RequestStats]:
+    """在请求之外统计一段代码执行的 SQL (基准测试用)"""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+
+def install(engine: Engine):
+    """在引擎上注册计时事件 (重复调用不会重复注册)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def server_timing(stats: RequestStats) -> str:
+    """生成 Server-Timing 头，例如: db;dur=3.2;desc="4 queries", total;dur=10.5"""
+    return (
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries", '
+        f"total;dur={stats.elapsed * 1000:.1f}"
+    )
+
+
+class RequestTimingMiddleware:
+    """
+    记录每个请求的 SQL 次数、数据库耗时和总耗时
+
+    Args:
+        slow_request_ms: 总耗时超过该毫秒数的请求写入日志
+        max_queries: 查询次数超过该值的请求写入日志 (通常意味着 N+1 查询)
+        server_timing: 是否在响应中加 Server-Timing 头
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        slow_request_ms: float = 500,
+        max_queries: int = 20,
+        server_timing: bool = True,
+    ):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.max_queries = max_queries
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(stats))
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # 完整的响应已经发出，后面的 BackgroundTasks 不算请求耗时
+                stats.finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            stats.finish()  # 没有发出响应 (异常) 时到这里为止
+            self._log_if_slow(scope, stats)
+
+    def _log_if_slow(self, scope: Scope, stats: RequestStats):
+        elapsed_ms = stats.elapsed * 1000
+        if elapsed_ms < self.slow_request_ms and stats.query_count <= self.max_queries:
+            return
+
+        lines = [
+            f"慢请求 {scope['method']} {scope['path']}: "
+            f"总耗时 {elapsed_ms:.1f}ms, SQL {stats.query_count} 条 / {stats.db_time * 1000:.1f}ms"
+        ]
+        for statement, duration in stats.statements:
+            lines.append(f"  [{duration * 1000:.1f}ms] {' '.join(statement.split())}")
+        if stats.query_count > len(stats.statements):
+            lines.append(f"  ... 另外 {stats.query_count - len(stats.statements)} 条未记录")
+        logger.warning("\n".join(lines))
@@ -5,19 +5,26 @@ from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from typing import Annotated, List, Optional
-from fastapi import Response
+from fastapi import Request, Response, BackgroundTasks
+from fastapi.responses import ORJSONResponse
+import anyio.to_thread
+import threading
+import time
 import shutil  
 import uuid    
 from pathlib import Path 
-from . import crud, models, schemas, security
-from .database import SessionLocal, engine, get_db
+from . import crud, models, schemas, security, serializers, http_cache, category_cache, instrumentation, metrics, rate_limit, trending, feed, saved_searches
+from .database import SessionLocal, get_db, get_engine, dispose_engine
+from .config import settings
+from .compression import CompressionMiddleware
+from .idempotency import IdempotencyMiddleware
+from .instrumentation import RequestTimingMiddleware
+from .metrics import MetricsMiddleware
+from .profiling import ProfilingMiddleware
 
 
-
-
-
-
-models.Base.metadata.create_all(bind=engine)
+# 导入本模块不访问数据库 (引擎在第一次使用时才创建)；
+# 建表 / 升级表结构请在部署时运行: python -m backend.manage upgrade-schema
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
@@ -32,14 +39,233 @@ origins = [
     "http://campus-trade-frontend-1762266094.s3-website-ap-northeast-1.amazonaws.com", 
 ]
 
+# 带 Idempotency-Key 的 POST 重试直接重放第一次的响应 (放在最内层：
+# 保存的是未压缩的响应，重放时照常经过 CORS 和压缩)
+app.add_middleware(
+    IdempotencyMiddleware,
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+    redis_url=settings.IDEMPOTENCY_REDIS_URL,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,       # 允许访问的源
     allow_credentials=True,    # 允许携带 cookie
     allow_methods=["*"],         # 允许所有 HTTP 方法 (GET, POST, etc.)
     allow_headers=["*"],         # 允许所有 HTTP 请求头
+    expose_headers=["Idempotent-Replayed"],
+)
+
+# 压缩 JSON 响应 (/static 下的图片不压缩)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_COMPRESS_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+    excluded_paths=("/static",),
+)
+
+# 按需采样分析 (没有配置时不挂载，不影响正常请求)
+if settings.PROFILE_TOKEN or settings.PROFILE_SAMPLE_RATE > 0:
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=settings.PROFILE_DIR,
+        token=settings.PROFILE_TOKEN,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        interval_ms=settings.PROFILE_INTERVAL_MS,
+        max_files=settings.PROFILE_MAX_FILES,
+        max_age_hours=settings.PROFILE_MAX_AGE_HOURS,
+    )
+
+# 统计每个请求的 SQL 次数和耗时 (Server-Timing 头 + 慢请求日志)
+# 后添加的在外层，请求依次经过：Metrics -> RequestTiming -> Profiling (配置了才有) -> 压缩 -> CORS -> Idempotency，
+# 所以这里的总耗时包含采样分析、压缩等内层中间件
+app.add_middleware(
+    RequestTimingMiddleware,
+    slow_request_ms=settings.SLOW_REQUEST_MS,
+    max_queries=settings.SLOW_REQUEST_QUERIES,
+    server_timing=settings.SERVER_TIMING_ENABLED,
 )
 
+# 路由级别的请求数 / 耗时统计，通过 GET /metrics 给 Prometheus 抓取
+app.add_middleware(MetricsMiddleware, excluded_paths=("/metrics",))
+
+
+@app.on_event("startup")
+async def configure_threadpool():
+    """
+    同步路由在 AnyIO 线程池里执行，每个线程都会占用一个数据库连接；
+    线程数超过连接池上限只会让多出来的线程排队等连接，所以默认让两者相等
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = settings.THREADPOOL_SIZE or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+
+
+@app.on_event("startup")
+def install_instrumentation():
+    instrumentation.install(get_engine())
+
+
+# =======================================================
+# 热度分数 (backend/trending.py)：启动时从数据库加载，之后每个 worker 定期保存增量并读回合并后的分数
+# =======================================================
+trending_flush_stop = threading.Event()
+
+
+def flush_trending_scores():
+    db = SessionLocal()
+    try:
+        trending.flush(db)
+    except Exception as e:
+        print(f"⚠️ 保存热度分数失败: {e}")
+    finally:
+        db.close()
+
+
+def trending_flush_loop():
+    while not trending_flush_stop.wait(settings.TRENDING_FLUSH_SECONDS):
+        flush_trending_scores()
+
+
+@app.on_event("startup")
+def start_trending_scores():
+    flush_trending_scores()
+    threading.Thread(target=trending_flush_loop, name="trending-flush", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_trending_scores():
+    """关闭前保存最后一批增量 (要在关闭数据库连接之前)"""
+    trending_flush_stop.set()
+    flush_trending_scores()
+
+
+@app.on_event("shutdown")
+def close_database_connections():
+    dispose_engine()
+
+
+@app.on_event("startup")
+def preload_categories():
+    """启动时把分类读进内存 (失败的话第一次用到时再加载)"""
+    db = SessionLocal()
+    try:
+        category_cache.reload(db)
+    except Exception as e:
+        print(f"⚠️ 预加载分类失败: {e}")
+    finally:
+        db.close()
+
+
+# =======================================================
+# 相似帖子索引 (backend/similar_posts.py)
+# numpy / scipy 导入较慢，similar_posts 在用到时才导入，不影响 import backend.main 的耗时
+# =======================================================
+similar_posts_stop = threading.Event()
+
+
+def build_similar_posts_index():
+    from . import similar_posts
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = similar_posts.rebuild(db, warm=settings.SIMILAR_POSTS_WARM)
+        print(f"✅ 相似帖子索引: {count} 个在售帖子，用时 {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"⚠️ 建立相似帖子索引失败: {e}")
+    finally:
+        db.close()
+
+
+def sync_similar_posts_index():
+    """同步其它 worker 上的发帖 / 改帖 / 删帖 (建索引失败的话这里会重新建)"""
+    from . import similar_posts
+
+    db = SessionLocal()
+    try:
+        similar_posts.sync(db)
+    except Exception as e:
+        print(f"⚠️ 同步相似帖子索引失败: {e}")
+    finally:
+        db.close()
+
+
+def similar_posts_index_loop():
+    build_similar_posts_index()
+    while not similar_posts_stop.wait(settings.SIMILAR_POSTS_SYNC_SECONDS):
+        sync_similar_posts_index()
+
+
+@app.on_event("startup")
+def start_similar_posts_index():
+    """在后台线程里建索引，不拖慢启动 (建好之前相似帖子接口返回空列表)，之后定期同步"""
+    if settings.SIMILAR_POSTS_ENABLED:
+        threading.Thread(target=similar_posts_index_loop, name="similar-posts-index", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_similar_posts_index():
+    similar_posts_stop.set()
+
+
+def refresh_similar_posts(post_id: int, title: str = "", description: str = "", available: bool = False):
+    """
+    帖子新增 / 修改后 (available=True) 或删除 / 售出 / 下架后更新索引
+    作为 BackgroundTasks 在响应发出之后执行 (事务已经提交)
+    """
+    if not settings.SIMILAR_POSTS_ENABLED:
+        return
+    from . import similar_posts
+
+    if available:
+        similar_posts.index.add(post_id, title, description)
+    else:
+        similar_posts.index.remove(post_id)
+
+
+# =======================================================
+# 新帖提醒 (backend/saved_searches.py)：发帖后用内存里的倒排索引匹配保存的搜索
+# =======================================================
+@app.on_event("startup")
+def preload_saved_searches():
+    """启动时建立匹配索引 (失败的话第一次发帖时再加载)"""
+    db = SessionLocal()
+    try:
+        saved_searches.index.sync(db)
+    except Exception as e:
+        print(f"⚠️ 加载保存的搜索失败: {e}")
+    finally:
+        db.close()
+
+
+def deliver_saved_search_alerts(
+    post_id: int, owner_id: int, title: str, description: str, category_id: int, post_type, price
+):
+    """
+    新帖子匹配保存的搜索，给匹配到的用户发提醒
+    作为 BackgroundTasks 在响应发出之后执行 (帖子已经提交，发帖接口不用等匹配)
+    """
+    db = SessionLocal()
+    try:
+        saved_searches.index.sync(db)
+        matched = saved_searches.index.match(owner_id, title, description, category_id, post_type, price)
+        if matched:
+            crud.create_notifications(db, post_id, matched)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ 发送新帖提醒失败: {e}")
+    finally:
+        db.close()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Prometheus 指标 (请求数、耗时直方图、线程池、连接池、缓存命中率、压缩统计)"""
+    return Response(await metrics.render(get_engine()), media_type=metrics.CONTENT_TYPE)
+
 
 credentials_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -75,6 +301,43 @@ def get_current_user(
     # 5. 返回完整的 User 对象
     return user
 
+# =======================================================
+# 限流：在校验密码 (bcrypt) / 写数据库之前把滥用的请求挡掉
+# =======================================================
+rate_limit_store = rate_limit.create_store(settings.RATE_LIMIT_REDIS_URL, settings.RATE_LIMIT_MAX_KEYS)
+login_ip_limiter = rate_limit.RateLimiter("login:ip", settings.LOGIN_RATE_LIMIT_PER_IP, rate_limit_store)
+login_account_limiter = rate_limit.RateLimiter("login:account", settings.LOGIN_RATE_LIMIT_PER_ACCOUNT, rate_limit_store)
+message_ip_limiter = rate_limit.RateLimiter("message:ip", settings.MESSAGE_RATE_LIMIT_PER_IP, rate_limit_store)
+message_user_limiter = rate_limit.RateLimiter("message:user", settings.MESSAGE_RATE_LIMIT_PER_USER, rate_limit_store)
+
+
+def enforce_rate_limit(limiter: rate_limit.RateLimiter, key: str):
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    retry_after = limiter.hit(key)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="请求过于频繁，请稍后再试",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def limit_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    """登录限流：按 IP (暴力破解 / 撞库) 和按账号 (针对单个账号猜密码)"""
+    enforce_rate_limit(login_ip_limiter, client_ip(request))
+    enforce_rate_limit(login_account_limiter, form_data.username.lower())
+
+
+def limit_messages(request: Request, token: Annotated[str, Depends(oauth2_scheme)]):
+    """发消息限流：按 IP 和按用户 (直接从 Token 里取，不查数据库)"""
+    enforce_rate_limit(message_ip_limiter, client_ip(request))
+    enforce_rate_limit(message_user_limiter, security.decode_access_token(token) or client_ip(request))
+
 # =======================================================
 # 🚀 第一个 API 接口：用户注册
 # =======================================================
@@ -103,6 +366,7 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     try:
         # 9. 一切正常，让“厨师”创建用户
         new_user = crud.create_user(db=db, user=user)
+        db.commit()
         return new_user
     except ValueError as e:
         # 10. 捕获“厨师”抛出的“学校邮箱错误”
@@ -114,6 +378,7 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 @app.post("/api/token", 
           response_model=schemas.Token, # ⬅️ 响应模型是我们在 schema 里定义的 Token
+          dependencies=[Depends(limit_login)], # ⬅️ 先限流，再校验密码
           tags=["Auth"]) # ⬅️ 分组为 "Auth" (认证)
 def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), # ⬅️ 关键
@@ -194,6 +459,7 @@ def update_user_info(
             detail="用户未找到"
         )
     
+    db.commit()
     return updated_user
 
 # =======================================================
@@ -243,6 +509,7 @@ def upload_user_avatar(
         user_id=current_user.id, # ⬅️ 使用当前登录用户的 ID
         avatar_url=url_path        # ⬅️ 使用新的 URL
     )
+    db.commit()  # 提交后才会删除旧头像文件
     
     # 6. 返回更新后的用户信息
     return updated_user
@@ -258,14 +525,28 @@ def create_new_post(
     post: schemas.PostCreate, # 1. 从请求体中获取帖子数据
     # 2. ⬇️ 关键：使用“门卫”依赖项 ⬇️
     current_user: Annotated[models.User, Depends(get_current_user)],
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     创建一个新帖子（商品/求购/免费）。
     这个接口受保护，必须提供有效的 Access Token。
     """
+    if not category_cache.exists(db, post.category_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="分类不存在")
+
     # 3. 调用“厨师”函数，并传入当前登录用户的 ID
     new_post = crud.create_post(db=db, post=post, owner_id=current_user.id)
+    db.commit()
+    feed.cache.invalidate_posts()
+    background_tasks.add_task(
+        refresh_similar_posts, new_post.id, new_post.title, new_post.description,
+        available=new_post.status == models.Post.StatusEnum.available
+    )
+    background_tasks.add_task(
+        deliver_saved_search_alerts, new_post.id, current_user.id, post.title, post.description,
+        post.category_id, post.post_type, post.price
+    )
     return new_post
 
 # =======================================================
@@ -273,21 +554,44 @@ def create_new_post(
 # =======================================================
 @app.get("/api/posts", 
          response_model=schemas.PostsResponse,
+         response_class=ORJSONResponse,
          tags=["Posts"])
 def read_posts(
+    request: Request,
     post_type: Optional[models.Post.PostTypeEnum] = None,
     keyword: Optional[str] = None,
     category_id: Optional[int] = None,
     sort_by: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     获取帖子列表，支持筛选、搜索、排序和分页
     
     返回格式: {"posts": [...], "total": 总数}
+    传 fields=summary 时帖子为精简的 PostSummary（用于列表卡片）
+    支持 ETag / If-None-Match：列表没有变化时直接返回 304
+    (不支持 If-Modified-Since：收藏数和热度排名的变化没有对应的修改时间)
     """
+    summary = fields == "summary"
+    # 热度排名在内存里 (排名快照变化时版本号会变，一起放进 ETag)
+    ranked_ids = trending.tracker.ranking() if sort_by == "trending" else ()
+    ranking_version = trending.tracker.version if sort_by == "trending" else None
+    
+    # 先用一次聚合查询算出列表的“版本号”，客户端缓存仍然有效就直接返回 304
+    # (卖家改昵称/头像不会改变版本号，最多显示旧昵称直到列表有其他变化)
+    version = crud.get_posts_version(
+        db=db,
+        post_type=post_type,
+        keyword=keyword,
+        category_id=category_id
+    )
+    etag = http_cache.make_etag("posts", str(request.query_params), *version, ranking_version)
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified(etag)
+    
     # 调用 crud 函数获取帖子列表和总数
     posts, total = crud.get_posts(
         db=db, 
@@ -296,11 +600,16 @@ def read_posts(
         category_id=category_id,
         sort_by=sort_by,
         skip=skip,
-        limit=limit
+        limit=limit,
+        summary=summary,
+        ranked_ids=ranked_ids
     )
     
-    # 返回新的响应格式
-    return {"posts": posts, "total": total}
+    # 返回新的响应格式 (快速序列化，跳过 Pydantic 逐字段校验)
+    return http_cache.set_validators(
+        serializers.posts_response(posts, total, summary=summary),
+        etag
+    )
 
 # =======================================================
 # ⬇️ 4. 接口 6：获取单个帖子详情 (新功能) ⬇️
@@ -310,13 +619,16 @@ def read_posts(
          tags=["Posts"])
 def read_post(
     post_id: int, # 从 URL 路径中获取 post_id
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
     根据 ID 获取单个帖子的详细信息。
     这个接口是公开的，不需要登录。
+    支持 ETag / If-None-Match：帖子没有变化时直接返回 304
     """
-    db_post = crud.get_post_by_id(db=db, post_id=post_id)
+    db_post = crud.get_post_detail(db=db, post_id=post_id)
     
     # 关键：处理“未找到”的情况
     if db_post is None:
@@ -324,9 +636,52 @@ def read_post(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="帖子未找到"
         )
+    trending.tracker.record(db_post.id, trending.VIEW_WEIGHT)
+    
+    # 客户端缓存仍然有效：跳过序列化，直接返回 304
+    # (只认 ETag：收藏数变化不改 updated_at，不能按 If-Modified-Since 判断)
+    etag = http_cache.post_etag(db_post)
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified(etag, db_post.updated_at)
+    
+    http_cache.set_validators(response, etag, db_post.updated_at)
     return db_post
 
 
+# =======================================================
+# 相似帖子 (帖子详情页的 "相似商品")
+# =======================================================
+@app.get("/api/posts/{post_id}/similar",
+         response_model=List[schemas.PostSummary],
+         response_class=ORJSONResponse,
+         tags=["Posts"])
+def read_similar_posts(
+    post_id: int,
+    limit: int = 6,
+    db: Session = Depends(get_db)
+):
+    """
+    和指定帖子标题 / 描述最相似的在售帖子 (按相似度从高到低，最多 SIMILAR_POSTS_TOP_K 个)
+    相似帖子预先算好缓存在内存里，命中时只需要一次查询取出帖子；
+    没有缓存的 (比如已售出的帖子) 按帖子文本现算
+    """
+    if not settings.SIMILAR_POSTS_ENABLED:
+        return serializers.post_summaries_response([])
+    from . import similar_posts
+
+    neighbor_ids = similar_posts.index.neighbors(post_id)
+    metrics.record_cache("similar_posts", neighbor_ids is not None)
+    if neighbor_ids is None:
+        db_post = crud.get_post_by_id(db=db, post_id=post_id)
+        if db_post is None:
+            raise HTTPException(status_code=404, detail="帖子未找到")
+        neighbor_ids = similar_posts.index.compute_neighbors(db_post.id, db_post.title, db_post.description)
+
+    limit = max(1, min(limit, settings.SIMILAR_POSTS_TOP_K))
+    posts = crud.get_available_posts_by_ids(db, neighbor_ids, summary=True)
+    return serializers.post_summaries_response(posts[:limit])
+
+
 # =======================================================
 # ⬇️ 2. 接口 7：更新帖子 (新功能) ⬇️
 # =======================================================
@@ -337,6 +692,7 @@ def update_existing_post(
     post_id: int, 
     post_update: schemas.PostUpdate, # 1. 接收更新数据
     current_user: Annotated[models.User, Depends(get_current_user)], # 2. 必须登录
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -360,8 +716,20 @@ def update_existing_post(
             detail="没有权限修改此帖子"
         )
         
+    if post_update.category_id is not None and not category_cache.exists(db, post_update.category_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="分类不存在")
+
     # 6. (授权通过) 调用“厨师”函数来更新
     updated_post = crud.update_post(db=db, db_post=db_post, post_update=post_update)
+    db.commit()
+    updated_fields = post_update.model_dump(exclude_unset=True).keys()
+    if {"category_id", "price", "post_type", "status"} & updated_fields:
+        feed.cache.invalidate_posts()
+    if {"title", "description", "status"} & updated_fields:
+        background_tasks.add_task(
+            refresh_similar_posts, updated_post.id, updated_post.title, updated_post.description,
+            available=updated_post.status == models.Post.StatusEnum.available
+        )
     return updated_post
 
 # =======================================================
@@ -373,6 +741,7 @@ def update_existing_post(
 def delete_existing_post(
     post_id: int,
     current_user: Annotated[models.User, Depends(get_current_user)],
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -396,6 +765,10 @@ def delete_existing_post(
         
     # 6. (授权通过) 调用“厨师”函数来删除
     crud.delete_post(db=db, db_post=db_post)
+    db.commit()  # 提交后才会删除图片文件
+    trending.tracker.remove(post_id)
+    feed.cache.invalidate_posts()
+    background_tasks.add_task(refresh_similar_posts, post_id)
     
     # 7. 返回 204 No Content (表示成功，但没有内容返回)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -406,14 +779,25 @@ def delete_existing_post(
 @app.get("/api/categories",
          response_model=List[schemas.Category], # 1. 响应是一个列表，列表里是 Category
          tags=["Categories"]) # 2. 归类到 "Categories"
-def read_categories(db: Session = Depends(get_db)):
+def read_categories(
+    request: Request,
+    db: Session = Depends(get_db)
+):
     """
     获取所有分类的列表（用于发布页面的下拉菜单）。
     这个接口是公开的，不需要登录。
+    直接返回内存中的分类缓存 (启动时加载)，带长时间的 Cache-Control 和 ETag
     """
-    # 3. 调用“厨师”函数
-    categories = crud.get_categories(db=db)
-    return categories
+    snapshot = category_cache.get(db)
+    cache_control = f"public, max-age={settings.CATEGORIES_CACHE_MAX_AGE}"
+    if http_cache.is_not_modified(request, snapshot.etag):
+        return http_cache.not_modified(snapshot.etag, cache_control=cache_control)
+
+    return http_cache.set_validators(
+        Response(snapshot.body, media_type="application/json"),
+        snapshot.etag,
+        cache_control=cache_control,
+    )
 
 
 @app.post("/api/posts/{post_id}/images",
@@ -480,27 +864,80 @@ def upload_image_for_post(
 
     # 8. (文件保存成功) 调用“厨师”函数，将 URL 存入数据库
     new_image_record = crud.add_post_image(db=db, post_id=post_id, image_url=url_path)
+    db.commit()
     
     # 9. 返回新创建的图片记录 (符合 schemas.PostImage 格式)
     return new_image_record
 
 
+# =======================================================
+# 个性化首页：按收藏 / 私信过的分类和价格区间排序 (见 backend/feed.py)
+# =======================================================
+@app.get("/api/users/me/feed",
+         response_model=schemas.PostsResponse,
+         response_class=ORJSONResponse,
+         tags=["Posts"])
+def read_my_feed(
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    post_type: Optional[models.Post.PostTypeEnum] = None,
+    category_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 10,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    当前用户的个性化首页 (最新的 FEED_CANDIDATES 个在售帖子，不包括自己的帖子)
+    
+    返回格式同 GET /api/posts: {"posts": [...], "total": 总数}
+    排好序的结果按用户缓存，命中时只需要查询当前这一页的帖子
+    """
+    ranked = feed.cache.get(db, current_user.id)
+    if post_type is not None or category_id is not None:
+        ranked = [
+            candidate for candidate in ranked
+            if (post_type is None or candidate.post_type == post_type)
+            and (category_id is None or candidate.category_id == category_id)
+        ]
+    
+    page_ids = [candidate.id for candidate in ranked[skip:skip + limit]]
+    posts = crud.get_available_posts_by_ids(db, page_ids, summary=fields == "summary")
+    return serializers.posts_response(posts, len(ranked), summary=fields == "summary")
+
 # =======================================================
 # ⬇️ 2. 接口 12：获取“我的收藏”列表 (新功能) ⬇️
 # =======================================================
 @app.get("/api/users/me/favorites",
-         response_model=List[schemas.Post], 
+         response_model=schemas.FavoritesResponse, 
+         response_class=ORJSONResponse,
          tags=["Favorites"]) 
 def read_my_favorites(
     current_user: Annotated[models.User, Depends(get_current_user)],
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db) 
 ):
     """
-    获取当前登录用户收藏的所有帖子列表。
+    获取当前登录用户收藏的帖子列表（按收藏时间倒序，游标分页）。
+    
+    返回格式: {"posts": [...], "total": 总数, "next_cursor": 下一页游标}
+    传 fields=summary 时帖子为精简的 PostSummary（用于列表卡片）
     """
+    summary = fields == "summary"
+    
     # 4. 调用“厨师”函数，传入当前用户 ID
-    favorite_posts = crud.get_user_favorites(db=db, user_id=current_user.id)
-    return favorite_posts
+    try:
+        favorite_posts, total, next_cursor = crud.get_user_favorites(
+            db=db, user_id=current_user.id, cursor=cursor, limit=limit, summary=summary
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+    
+    return serializers.favorites_response(favorite_posts, total, next_cursor, summary=summary)
 
 # =======================================================
 # ⬇️ 3. 接口 13：收藏一个帖子 (新功能) ⬇️
@@ -515,27 +952,22 @@ def add_post_to_favorites(
 ):
     """
     收藏一个帖子。
+    幂等：重复收藏（比如双击）不会报错，已收藏时返回 200。
     """
-    # 2. 检查帖子是否存在
-    db_post = crud.get_post_by_id(db=db, post_id=post_id)
-    if db_post is None:
+    # 2. 一条 INSERT 语句完成收藏（重复收藏由数据库直接忽略）
+    inserted = crud.favorite_post(db=db, user_id=current_user.id, post_id=post_id)
+    db.commit()
+    if inserted:
+        trending.tracker.record(post_id, trending.FAVORITE_WEIGHT)
+        feed.cache.invalidate_user(current_user.id)
+        # 3. 返回 201 Created (表示成功，不返回具体内容)
+        return Response(status_code=status.HTTP_201_CREATED)
+    
+    # 4. 没有插入：要么已经收藏过，要么帖子不存在（少见路径，才多查一次）
+    if crud.get_post_by_id(db=db, post_id=post_id) is None:
         raise HTTPException(status_code=404, detail="帖子未找到")
-        
-    # 3. 检查是否“已经”收藏过了
-    db_favorite = crud.get_favorite(
-        db=db, user_id=current_user.id, post_id=post_id
-    )
-    if db_favorite:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail="你已经收藏过此帖子"
-        )
-        
-    # 4. (检查通过) 调用“厨师”函数
-    crud.favorite_post(db=db, user_id=current_user.id, post_id=post_id)
     
-    # 5. 返回 201 Created (表示成功，不返回具体内容)
-    return Response(status_code=status.HTTP_201_CREATED)
+    return Response(status_code=status.HTTP_200_OK)
 
 # =======================================================
 # ⬇️ 新增：检查是否已收藏某个帖子 ⬇️
@@ -569,21 +1001,16 @@ def remove_post_from_favorites(
 ):
     """
     取消收藏一个帖子。
+    幂等：本来就没有收藏时同样返回 204。
     """
-    # 2. 检查“收藏记录”是否存在
-    db_favorite = crud.get_favorite(
-        db=db, user_id=current_user.id, post_id=post_id
-    )
-    if db_favorite is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, 
-            detail="收藏记录未找到"
-        )
-        
-    # 3. (记录存在) 调用“厨师”函数删除
-    crud.unfavorite_post(db=db, db_favorite=db_favorite)
+    # 2. 一条 DELETE 语句完成取消收藏
+    removed = crud.unfavorite_post(db=db, user_id=current_user.id, post_id=post_id)
+    db.commit()
+    if removed:
+        trending.tracker.record(post_id, -trending.FAVORITE_WEIGHT)  # 扣回收藏时加的热度
+        feed.cache.invalidate_user(current_user.id)
     
-    # 4. 返回 204 No Content (表示成功，不返回具体内容)
+    # 3. 返回 204 No Content (表示成功，不返回具体内容)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # =======================================================
@@ -592,6 +1019,7 @@ def remove_post_from_favorites(
 @app.post("/api/messages",
           response_model=schemas.Message, # 1. 响应会是完整的 Message
           status_code=status.HTTP_201_CREATED,
+          dependencies=[Depends(limit_messages)], # 先限流，再查用户、写数据库
           tags=["Messages"])
 def send_new_message(
     message_data: schemas.MessageCreate, # 2. 接收符合 MessageCreate 格式的 JSON
@@ -621,6 +1049,9 @@ def send_new_message(
         sender_id=current_user.id, # ⬅️ 发送者是“我”
         receiver_id=message_data.receiver_id # ⬅️ 接收者是数据中指定的
     )
+    db.commit()
+    trending.tracker.record(message_data.post_id, trending.MESSAGE_WEIGHT)
+    feed.cache.invalidate_user(current_user.id)
     
     # 7. 返回新创建的消息 (包含 sender 和 receiver 的完整信息)
     return new_message
@@ -630,6 +1061,7 @@ def send_new_message(
 # =======================================================
 @app.get("/api/conversations",
          response_model=List[schemas.Message], # 1. 响应是一个“消息”列表
+         response_class=ORJSONResponse,
          tags=["Messages"])
 def get_conversation_details(
     post_id: int, # 2. (查询参数) 必须指定关于哪个帖子
@@ -650,31 +1082,34 @@ def get_conversation_details(
         user_b_id=other_user_id  # ⬅️ B 是“对方”
     )
     
-    return messages
+    return serializers.messages_response(messages)
 
 # =======================================================
 # ⬇️ 2. 接口 17：获取“我的收件箱” (新功能) ⬇️
 # =======================================================
 @app.get("/api/users/me/inbox",
          response_model=List[schemas.InboxConversation], # 1. 响应是“会话”列表
+         response_class=ORJSONResponse,
          tags=["Messages"]) # 归类到 "Messages"
 def read_my_inbox(
     current_user: Annotated[models.User, Depends(get_current_user)],
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     获取当前登录用户的“收件箱”列表。
     
     返回一个“会话”列表，每个会话包含：
-    - 相关的帖子 (post)
+    - 相关的帖子 (post)，传 fields=summary 时为精简的 PostSummary
     - 对方的用户 (other_user)
     - 最后一条消息 (last_message)
     """
+    summary = fields == "summary"
     
     # 3. 调用我们刚写的、最复杂的“厨师”函数
-    inbox_conversations = crud.get_user_inbox(db=db, user_id=current_user.id)
+    inbox_conversations = crud.get_user_inbox(db=db, user_id=current_user.id, summary=summary)
     
-    return inbox_conversations
+    return serializers.inbox_response(inbox_conversations, summary=summary)
 
 
 # =======================================================
@@ -716,6 +1151,7 @@ def create_new_report(
         reporter_id=current_user.id, # ⬅️ 举报人是“我”
         report_data=report_data      # ⬅️ 举报数据来自 Body
     )
+    db.commit()
     
     # 8. 返回新创建的举报记录
     return new_report
@@ -743,6 +1179,7 @@ def mark_conversation_read(
         current_user_id=current_user.id,
         other_user_id=other_user_id
     )
+    db.commit()
     
     return {"updated_count": updated_count}
 
@@ -756,6 +1193,7 @@ def mark_conversation_read(
 def create_new_transaction(
     transaction_data: schemas.TransactionCreate,
     current_user: Annotated[models.User, Depends(get_current_user)],
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -801,9 +1239,11 @@ def create_new_transaction(
         buyer_id=transaction_data.buyer_id
     )
     
-    # 同时将帖子状态更新为已售出
+    # 同时将帖子状态更新为已售出 (和交易记录在同一个事务里提交)
     db_post.status = models.Post.StatusEnum.sold
     db.commit()
+    feed.cache.invalidate_posts()
+    background_tasks.add_task(refresh_similar_posts, db_post.id)
     
     return new_transaction
 
@@ -834,25 +1274,14 @@ def confirm_transaction_endpoint(
             detail="您不是该交易的参与者"
         )
     
-    # 检查是否已经确认过
-    if current_user.id == db_transaction.seller_id and db_transaction.seller_confirmed:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="您已经确认过该交易"
-        )
-    if current_user.id == db_transaction.buyer_id and db_transaction.buyer_confirmed:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="您已经确认过该交易"
-        )
-    
     try:
-        # 确认交易
+        # 确认交易（重复确认时 crud 会抛出 "您已经确认过该交易"）
         updated_transaction = crud.confirm_transaction(
             db=db,
             transaction=db_transaction,
             user_id=current_user.id
         )
+        db.commit()
         return updated_transaction
     except ValueError as e:
         raise HTTPException(
@@ -909,4 +1338,120 @@ def get_contacted_users_for_post(
         owner_id=current_user.id
     )
     
-    return users
\ No newline at end of file
+    return users
+
+# =======================================================
+# 接口 24：保存搜索 (有符合条件的新帖子时提醒)
+# =======================================================
+@app.post("/api/saved-searches",
+          response_model=schemas.SavedSearch,
+          status_code=status.HTTP_201_CREATED,
+          tags=["Saved Searches"])
+def create_new_saved_search(
+    search: schemas.SavedSearchCreate,
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """
+    保存一组筛选条件 (含义同 GET /api/posts，至少要有一个)
+    之后发布的符合条件的帖子会出现在 GET /api/users/me/notifications
+    """
+    search.keyword = (search.keyword or "").strip() or None
+    if (
+        search.keyword is None and search.category_id is None and search.post_type is None
+        and search.min_price is None and search.max_price is None
+    ):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="至少需要一个搜索条件")
+    if search.keyword is not None and len(search.keyword) > 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="关键词不能超过 100 个字")
+    if search.min_price is not None and search.max_price is not None and search.min_price > search.max_price:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="最低价格不能高于最高价格")
+    if search.category_id is not None and not category_cache.exists(db, search.category_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="分类不存在")
+    if crud.count_saved_searches(db, user_id=current_user.id) >= settings.SAVED_SEARCHES_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"最多只能保存 {settings.SAVED_SEARCHES_PER_USER} 个搜索"
+        )
+
+    # 不用更新匹配索引：下次发帖匹配前会从数据库同步
+    new_search = crud.create_saved_search(db=db, user_id=current_user.id, search=search)
+    db.commit()
+    return new_search
+
+# =======================================================
+# 接口 25：获取我保存的搜索
+# =======================================================
+@app.get("/api/saved-searches",
+         response_model=List[schemas.SavedSearch],
+         tags=["Saved Searches"])
+def read_my_saved_searches(
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """当前用户保存的搜索 (最新的在前)"""
+    return crud.get_saved_searches(db=db, user_id=current_user.id)
+
+# =======================================================
+# 接口 26：删除保存的搜索
+# =======================================================
+@app.delete("/api/saved-searches/{saved_search_id}",
+            status_code=status.HTTP_204_NO_CONTENT,
+            tags=["Saved Searches"])
+def delete_my_saved_search(
+    saved_search_id: int,
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """删除保存的搜索 (已经发出的提醒保留)"""
+    db_search = crud.get_saved_search_by_id(db, saved_search_id=saved_search_id)
+    if db_search is None:
+        raise HTTPException(status_code=404, detail="保存的搜索未找到")
+    if db_search.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="只能删除自己保存的搜索"
+        )
+
+    crud.delete_saved_search(db, db_search)
+    db.commit()
+    saved_searches.index.remove(saved_search_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# =======================================================
+# 接口 27：获取我的新帖提醒
+# =======================================================
+@app.get("/api/users/me/notifications",
+         response_model=schemas.NotificationsResponse,
+         response_class=ORJSONResponse,
+         tags=["Saved Searches"])
+def read_my_notifications(
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    unread_only: bool = False,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """
+    新帖提醒 (最新的在前，最多 100 条)
+    
+    返回格式: {"notifications": [...], "unread_count": 未读数}
+    """
+    notifications = crud.get_notifications(
+        db=db, user_id=current_user.id, unread_only=unread_only, limit=limit
+    )
+    unread_count = crud.count_unread_notifications(db, user_id=current_user.id)
+    return serializers.notifications_response(notifications, unread_count)
+
+# =======================================================
+# 接口 28：把新帖提醒全部标记为已读
+# =======================================================
+@app.patch("/api/users/me/notifications/mark-read",
+           tags=["Saved Searches"])
+def mark_my_notifications_read(
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """把当前用户的新帖提醒全部标记为已读"""
+    updated_count = crud.mark_notifications_as_read(db, user_id=current_user.id)
+    db.commit()
+    return {"updated_count": updated_count}
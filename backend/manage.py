@@ -0,0 +1,96 @@
+"""
+后端维护命令 (在项目根目录下运行)
+
+用法:
+    python -m backend.manage upgrade-schema
+    python -m backend.manage reconcile-favorites
+    python -m backend.manage add-category <分类名>
+"""
+import argparse
+from inspect import signature as inspect_signature
+
+from sqlalchemy import inspect, text
+
+from . import crud, models
+from .database import SessionLocal, get_engine
+
+
+# create_all 不会修改已有的表，这里列出后来新增的列，供旧数据库补齐
+ADDED_COLUMNS = {
+    "posts": {
+        "favorite_count": "INTEGER NOT NULL DEFAULT 0",
+    },
+}
+
+
+def upgrade_schema():
+    """创建缺少的表，并为旧数据库补上新增的列和索引 (部署时、启动服务前运行)"""
+    engine = get_engine()
+    models.Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+
+    for table_name, columns in ADDED_COLUMNS.items():
+        existing = {col["name"] for col in inspector.get_columns(table_name)}
+        for column_name, ddl in columns.items():
+            if column_name not in existing:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"
+                    ))
+                print(f"✅ 已为 {table_name} 表添加 {column_name} 列")
+
+    for table in models.Base.metadata.sorted_tables:
+        existing = {idx["name"] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                print(f"✅ 已创建索引: {index.name}")
+
+
+def reconcile_favorites():
+    """根据 favorites 表重新计算所有帖子的收藏数"""
+    upgrade_schema()
+
+    db = SessionLocal()
+    try:
+        fixed = crud.reconcile_favorite_counts(db)
+        db.commit()
+        print(f"✅ 收藏数对账完成，修正了 {fixed} 个帖子")
+    finally:
+        db.close()
+
+
+def add_category(name: str):
+    """新增分类 (运行中的服务不用重启：发帖时马上能用，分类列表在 CATEGORY_CACHE_CHECK_SECONDS 内更新)"""
+    db = SessionLocal()
+    try:
+        category = crud.create_category(db, name)
+        db.commit()
+        print(f"✅ 已添加分类: {category.id} {category.name}")
+    finally:
+        db.close()
+
+
+COMMANDS = {
+    "upgrade-schema": upgrade_schema,
+    "reconcile-favorites": reconcile_favorites,
+    "add-category": add_category,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校园二手交易平台后端维护命令")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("args", nargs="*", help="命令参数 (例如 add-category 的分类名)")
+    args = parser.parse_args()
+
+    command = COMMANDS[args.command]
+    try:
+        inspect_signature(command).bind(*args.args)
+    except TypeError:
+        parser.error(f"{args.command} 的参数不正确")
+    command(*args.args)
+
+
+if __name__ == "__main__":
+    main()
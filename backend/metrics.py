@@ -0,0 +1,202 @@
+"""
+Prometheus 格式的运行指标 (GET /metrics)
+
+- MetricsMiddleware 统计每个路由的请求数、耗时直方图和正在处理的请求数
+- 线程池 (同步路由在 AnyIO 线程池里执行) 和数据库连接池的占用在抓取时读取
+- 各种缓存通过 record_cache() 上报命中 / 未命中
+
+指标保存在进程内存中，多 worker 部署时每个 worker 各自统计，需要 Prometheus 分别抓取。
+没有依赖 prometheus_client，这里只实现了用到的 counter / gauge / histogram 文本格式。
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+import anyio.to_thread
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import compression
+
+# 请求耗时直方图的桶 (秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # 最后一个是 +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """进程内的指标存储 (线程安全)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], int] = {}   # (method, route, status) -> 次数
+        self.latency: Dict[Tuple[str, str], _Histogram] = {}  # (method, route) -> 直方图
+        self.in_progress = 0
+        self.cache: Dict[Tuple[str, str], int] = {}           # (cache, "hit"/"miss") -> 次数
+
+    def request_started(self):
+        with self._lock:
+            self.in_progress += 1
+
+    def request_finished(self, method: str, route: str, status: int, duration: float):
+        with self._lock:
+            self.in_progress -= 1
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get((method, route))
+            if histogram is None:
+                histogram = self.latency[(method, route)] = _Histogram()
+            histogram.observe(duration)
+
+    def record_cache(self, cache: str, hit: bool):
+        key = (cache, "hit" if hit else "miss")
+        with self._lock:
+            self.cache[key] = self.cache.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        """复制当前数据，输出时不用一直持有锁"""
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "latency": {key: (list(h.buckets), h.count, h.sum) for key, h in self.latency.items()},
+                "in_progress": self.in_progress,
+                "cache": dict(self.cache),
+            }
+
+
+registry = MetricsRegistry()
+
+
+def record_cache(cache: str, hit: bool):
+    """上报一次缓存查找，例如 record_cache("categories", hit=True)"""
+    registry.record_cache(cache, hit)
+
+
+class MetricsMiddleware:
+    """统计每个路由的请求数和耗时 (路由取路径模板，例如 /api/posts/{post_id})"""
+
+    def __init__(self, app: ASGIApp, excluded_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = tuple(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500  # 没发出响应就抛异常时按 500 计
+        finished = None  # 响应体最后一块发出的时间，之后的 BackgroundTasks 不算进耗时
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, finished
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = time.perf_counter()
+
+        registry.request_started()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 路由匹配后 FastAPI 会把 route 写进 scope；没匹配上的统一记为 "unmatched"，避免标签爆炸
+            route = getattr(scope.get("route"), "path", "unmatched")
+            duration = (finished or time.perf_counter()) - started
+            registry.request_finished(scope["method"], route, status_code, duration)
+
+
+# =======================================================================
+# 文本格式输出
+# =======================================================================
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _metric(lines: List[str], name: str, kind: str, help_text: str, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{_labels(**labels)} {value}")
+
+
+def _pool_samples(engine: Engine):
+    pool = engine.pool
+    # SQLite 等使用的连接池不一定有这些方法
+    for stat in ("size", "checkedout", "overflow", "checkedin"):
+        method = getattr(pool, stat, None)
+        if callable(method):
+            yield "", {"state": stat}, method()
+
+
+async def render(engine: Engine) -> str:
+    """生成 Prometheus 文本格式 (需要在事件循环中调用，才能读取线程池状态)"""
+    snapshot = registry.snapshot()
+    requests, latency, cache = snapshot["requests"], snapshot["latency"], snapshot["cache"]
+    in_progress = snapshot["in_progress"]
+
+    lines: List[str] = []
+
+    _metric(lines, "http_requests_total", "counter", "Total HTTP requests", [
+        ("", {"method": method, "route": route, "status": status}, count)
+        for (method, route, status), count in sorted(requests.items())
+    ])
+
+    histogram_samples = []
+    for (method, route), (buckets, count, total) in sorted(latency.items()):
+        cumulative = 0
+        for bound, bucket in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+            cumulative += bucket
+            histogram_samples.append(("_bucket", {"method": method, "route": route, "le": bound}, cumulative))
+        histogram_samples.append(("_sum", {"method": method, "route": route}, total))
+        histogram_samples.append(("_count", {"method": method, "route": route}, count))
+    _metric(lines, "http_request_duration_seconds", "histogram", "HTTP request latency", histogram_samples)
+
+    _metric(lines, "http_requests_in_progress", "gauge", "HTTP requests currently being processed", [
+        ("", {}, in_progress)
+    ])
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    _metric(lines, "threadpool_threads", "gauge", "AnyIO worker thread pool usage", [
+        ("", {"state": "busy"}, limiter.borrowed_tokens),
+        ("", {"state": "limit"}, limiter.total_tokens),
+    ])
+
+    _metric(lines, "db_pool_connections", "gauge", "SQLAlchemy connection pool usage", list(_pool_samples(engine)))
+
+    _metric(lines, "cache_requests_total", "counter", "Cache lookups by result", [
+        ("", {"cache": name, "result": result}, count)
+        for (name, result), count in sorted(cache.items())
+    ])
+
+    compressed = compression.stats.snapshot()
+    _metric(lines, "http_compressed_responses_total", "counter", "Compressed HTTP responses", [
+        ("", {"encoding": encoding}, values["responses"]) for encoding, values in sorted(compressed.items())
+    ])
+    _metric(lines, "http_compression_bytes_total", "counter", "Response bytes before/after compression", [
+        ("", {"encoding": encoding, "stage": stage}, values[f"bytes_{stage}"])
+        for encoding, values in sorted(compressed.items())
+        for stage in ("before", "after")
+    ])
+
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,7 @@
 import enum
 from sqlalchemy import (
     Column, Integer, String, TIMESTAMP, TEXT, 
-    DECIMAL, Enum, BOOLEAN, ForeignKey
+    DECIMAL, Enum, BOOLEAN, ForeignKey, Index, Double
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -11,6 +11,9 @@ Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
+    # flush 时直接取回数据库生成的默认值 (支持的数据库用 INSERT/UPDATE ... RETURNING)，
+    # 写接口返回对象时不用再 SELECT 一次
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
@@ -87,6 +90,11 @@ class Category(Base):
 # --- 3. Post (帖子/商品) 模型 ---
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # 支持 sort_by=popular：按收藏数倒序，收藏数相同按发布时间倒序
+        Index("ix_posts_favorite_count_created_at", "favorite_count", "created_at"),
+    )
+    __mapper_args__ = {"eager_defaults": True}  # 见 User
 
     # 为 ENUM 类型创建 Python Enum (推荐做法)
     class PostTypeEnum(str, enum.Enum):
@@ -116,6 +124,9 @@ class Post(Base):
     
     condition = Column(Enum(ConditionEnum, name="condition_enum"), nullable=True)
     status = Column(Enum(StatusEnum, name="status_enum"), nullable=False, server_default="available")
+
+    # 收藏数（冗余计数，由 crud.favorite_post / unfavorite_post 在数据库中原子维护）
+    favorite_count = Column(Integer, nullable=False, server_default="0")
     
     # 关系 (外键)
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -123,7 +134,7 @@ class Post(Base):
 
     # 时间戳
     created_at = Column(TIMESTAMP, server_default=func.now())
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), index=True)  # 相似帖子索引按它增量同步
 
     # --- 关系 (Relationships) ---
     # 帖子属于一个用户
@@ -132,7 +143,12 @@ class Post(Base):
     category = relationship("Category", back_populates="posts")
     
     # 帖子有多张图片
-    images = relationship("PostImage", back_populates="post", cascade="all, delete-orphan")
+    images = relationship(
+        "PostImage",
+        back_populates="post",
+        cascade="all, delete-orphan",
+        order_by="PostImage.id"  # 按上传顺序，第一张作为封面
+    )
     # 帖子被多人收藏
     favorited_by = relationship("Favorite", back_populates="post", cascade="all, delete-orphan")
     messages = relationship("Message", back_populates="post")
@@ -155,6 +171,10 @@ class PostImage(Base):
 # --- 5. Favorite (收藏) 模型 ---
 class Favorite(Base):
     __tablename__ = "favorites"
+    __table_args__ = (
+        # "我的收藏" 按收藏时间倒序做游标分页
+        Index("ix_favorites_user_id_created_at", "user_id", "created_at"),
+    )
 
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
@@ -168,6 +188,11 @@ class Favorite(Base):
 # --- 6. Message (私信) 模型 ---
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # 覆盖索引：按帖子查找与帖主有过私信的用户时不用回表
+        Index("ix_messages_post_id_sender_id_receiver_id", "post_id", "sender_id", "receiver_id"),
+    )
+    __mapper_args__ = {"eager_defaults": True}  # 见 User
 
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -185,6 +210,7 @@ class Message(Base):
 # --- 7. Report (举报) 模型 ---
 class Report(Base):
     __tablename__ = "reports"
+    __mapper_args__ = {"eager_defaults": True}  # 见 User
 
     # 为 ENUM 类型创建 Python Enum
     class ReportStatusEnum(str, enum.Enum):
@@ -208,6 +234,7 @@ class Report(Base):
 # --- 8. Transaction (交易确认) 模型 ---
 class Transaction(Base):
     __tablename__ = "transactions"
+    __mapper_args__ = {"eager_defaults": True}  # 见 User
 
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, unique=True, index=True)
@@ -222,4 +249,53 @@ class Transaction(Base):
     # --- 关系 ---
     post = relationship("Post", back_populates="transaction")
     seller = relationship("User", back_populates="transactions_as_seller", foreign_keys=[seller_id])
-    buyer = relationship("User", back_populates="transactions_as_buyer", foreign_keys=[buyer_id])
\ No newline at end of file
+    buyer = relationship("User", back_populates="transactions_as_buyer", foreign_keys=[buyer_id])
+
+
+# --- 9. TrendingScore (帖子热度) 模型 ---
+class TrendingScore(Base):
+    """
+    sort_by=trending 用的热度分数 (收藏、私信、浏览按时间衰减后的加权和)
+    由 backend/trending.py 在内存里增量维护，各个 worker 定期把增量累加到这里
+    """
+    __tablename__ = "post_trending_scores"
+
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Double, nullable=False)          # updated_at 时刻的分数
+    updated_at = Column(Double, nullable=False, index=True)  # Unix 时间戳 (秒)，衰减按它计算
+
+
+# --- 10. SavedSearch (保存的搜索 / 新帖提醒) 模型 ---
+class SavedSearch(Base):
+    """条件和 GET /api/posts 的筛选一致；有符合条件的新帖子时给用户发提醒 (见 backend/saved_searches.py)"""
+    __tablename__ = "saved_searches"
+    __mapper_args__ = {"eager_defaults": True}  # 见 User
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    keyword = Column(String(100), nullable=True)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=True)
+    post_type = Column(Enum(Post.PostTypeEnum, name="post_type_enum"), nullable=True)
+    min_price = Column(DECIMAL(10, 2), nullable=True)
+    max_price = Column(DECIMAL(10, 2), nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+# --- 11. Notification (新帖提醒) 模型 ---
+class Notification(Base):
+    __tablename__ = "notifications"
+    __table_args__ = (
+        # 按用户倒序列出提醒 / 统计未读数
+        Index("ix_notifications_user_id_is_read_id", "user_id", "is_read", "id"),
+    )
+    __mapper_args__ = {"eager_defaults": True}  # 见 User
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
+    saved_search_id = Column(Integer, ForeignKey("saved_searches.id", ondelete="SET NULL"), nullable=True, index=True)
+    is_read = Column(BOOLEAN, nullable=False, server_default="0")
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+    # --- 关系 ---
+    post = relationship("Post")
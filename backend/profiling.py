@@ -0,0 +1,209 @@
+"""
+按需采样分析 (生产环境排查慢接口用)
+
+两种触发方式 (都没配置时不会挂载中间件，零开销)：
+- 请求头 X-Profile: <PROFILE_TOKEN> —— 只有知道令牌的管理员能触发
+- PROFILE_SAMPLE_RATE —— 按比例随机抽取请求
+
+被选中的请求执行期间，后台线程每隔 PROFILE_INTERVAL_MS 读取一次线程调用栈，
+只保留属于这个请求的栈：
+- 事件循环线程：栈里有这个请求的中间件帧 (说明这个请求的协程正在运行)
+- 线程池线程：栈里有该路由的 endpoint / 依赖函数 (同步路由在线程池里执行)
+
+结果按路由保存为 "折叠栈" 格式 (每行 "帧;帧;帧 次数")，
+可以直接用 flamegraph.pl、speedscope、inferno 等工具画火焰图。
+"""
+import hmac
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional, Set
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_HEADER = "x-profile"
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    # 第三方库只保留 site-packages 之后的部分，让火焰图更好读
+    marker = "site-packages/"
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _dependency_codes(dependant) -> Set:
+    """路由的 endpoint 以及所有依赖函数的 code 对象 (用来识别线程池里属于这个路由的栈)"""
+    codes = set()
+    call = getattr(dependant, "call", None)
+    code = getattr(call, "__code__", None)
+    if code is not None:
+        codes.add(code)
+    for sub_dependant in getattr(dependant, "dependencies", ()):
+        codes |= _dependency_codes(sub_dependant)
+    return codes
+
+
+class ProfileSession:
+    """一次请求的采样过程"""
+
+    def __init__(self, scope: Scope, request_frame, interval: float):
+        self.scope = scope
+        self.request_frame = request_frame       # 中间件 __call__ 的帧
+        self.loop_thread_id = threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._codes: Optional[Set] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _route_codes(self) -> Set:
+        # 路由匹配之后 scope 里才有 route
+        if self._codes is None:
+            route = self.scope.get("route")
+            if route is None:
+                return set()
+            self._codes = _dependency_codes(getattr(route, "dependant", None))
+        return self._codes
+
+    def _run(self):
+        own_thread_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own_thread_id)
+
+    def _sample(self, own_thread_id: int):
+        codes = self._route_codes()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread_id:
+                continue
+            stack = []
+            belongs = False
+            while frame is not None:
+                stack.append(frame.f_code)
+                if thread_id == self.loop_thread_id:
+                    belongs = belongs or frame is self.request_frame
+                else:
+                    belongs = belongs or frame.f_code in codes
+                frame = frame.f_back
+            if belongs:
+                self.stacks[";".join(_frame_label(code) for code in reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _route_slug(scope: Scope) -> str:
+    path = getattr(scope.get("route"), "path", "unmatched")
+    slug = path.strip("/").replace("/", "_").replace("{", "").replace("}", "")
+    return slug or "root"
+
+
+class ProfilingMiddleware:
+    """
+    对选中的请求做采样分析，结果写到 output_dir/<路由>/<时间>-<方法>-<随机ID>.folded
+
+    Args:
+        output_dir: 保存结果的目录
+        token: 请求头 X-Profile 需要匹配的令牌 (为空则不能通过请求头触发)
+        sample_rate: 随机抽样的比例 (0~1)
+        interval_ms: 采样间隔 (毫秒)
+        max_files: 最多保留多少个结果文件 (所有路由合计，0 表示不限)
+        max_age_hours: 结果文件最多保留多少小时 (0 表示不限)
+
+    每次写入结果后清理超出数量或过期的旧文件 (按修改时间)，
+    开着随机抽样长期运行也不会把磁盘写满。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        output_dir: str = "profiles",
+        token: str = "",
+        sample_rate: float = 0.0,
+        interval_ms: float = 5,
+        max_files: int = 1000,
+        max_age_hours: float = 24 * 7,
+    ):
+        self.app = app
+        self.output_dir = Path(output_dir)
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.max_files = max_files
+        self.max_age = max_age_hours * 3600
+
+    def _requested_by_admin(self, scope: Scope) -> bool:
+        if not self.token:
+            return False
+        value = Headers(scope=scope).get(PROFILE_HEADER)
+        return value is not None and hmac.compare_digest(value, self.token)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        by_admin = self._requested_by_admin(scope)
+        if not by_admin and not (self.sample_rate and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(scope, sys._getframe(), self.interval)
+        file_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{uuid.uuid4().hex[:8]}"
+
+        async def send_wrapper(message: Message):
+            # 通过请求头触发时，告诉管理员结果文件名
+            if message["type"] == "http.response.start" and by_admin:
+                MutableHeaders(scope=message).append("X-Profile-File", f"{_route_slug(scope)}/{file_name}.folded")
+            await send(message)
+
+        session.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session.stop()
+            await anyio.to_thread.run_sync(self._save, scope, session, file_name)
+
+    def _save(self, scope: Scope, session: ProfileSession, file_name: str):
+        directory = self.output_dir / _route_slug(scope)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{file_name}.folded"
+        path.write_text(session.folded(), encoding="utf-8")
+        self._prune()
+
+    def _prune(self):
+        """删除过期的和超出数量的旧结果文件 (多个 worker 可能同时清理，文件已经不在了就跳过)"""
+        if not self.max_files and not self.max_age:
+            return
+        files = []
+        for path in self.output_dir.glob("*/*.folded"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort(reverse=True)  # 新的在前
+
+        expired = []
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            while files and files[-1][0] < cutoff:
+                expired.append(files.pop())
+        if self.max_files:
+            expired.extend(files[self.max_files:])
+
+        for _, path in expired:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,131 @@
+"""
+令牌桶限流
+
+- 每个 key (比如 "login:ip:1.2.3.4") 一个桶，容量 capacity，每秒补充 capacity / period 个令牌，
+  每个请求消耗一个；桶空了就拒绝，并告诉客户端多少秒后可以重试
+- 默认存在进程内存里 (最多 max_keys 个桶，超出时淘汰最久没用的)；
+  配置了 RATE_LIMIT_REDIS_URL 时存在 Redis 里，多个 worker 共享同一个桶
+- 限流规则写成 "次数/时间单位"，比如 "10/minute"、"100/hour"
+
+客户端 IP 取 ASGI scope 里的 client；部署在 Nginx 后面时由 gunicorn/uvicorn 根据
+forwarded_allow_ips 解析 X-Forwarded-For，不要在这里直接相信请求头。
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # 没装 redis 时只能用进程内存储
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """"10/minute" -> (10, 60)"""
+    count, _, period = rate.partition("/")
+    try:
+        return int(count), PERIODS[period.strip()]
+    except (ValueError, KeyError):
+        raise ValueError(f"无效的限流规则: {rate!r} (格式: 次数/second|minute|hour|day)")
+
+
+class MemoryBucketStore:
+    """进程内的令牌桶 (线程安全：同步路由的依赖在线程池里执行)"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (令牌数, 更新时间)
+
+    def take(self, key: str, capacity: int, period: int) -> float:
+        """取一个令牌；成功返回 0，失败返回需要等待的秒数"""
+        now = time.monotonic()
+        refill = capacity / period
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / refill
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+# KEYS[1] = 桶的 key；ARGV = 容量, 每秒补充的令牌数, 过期秒数
+# 用 Redis 服务器的时间，避免各个 worker 的时钟不一致
+_REDIS_TAKE = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * refill)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    """
+    存在 Redis 里的令牌桶，多个 worker / 多台机器共享 (一次 EVALSHA 往返)
+    Redis 不可用时放行请求 (只写日志)，不能因为限流把登录和发消息整个拖垮
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if redis is None:
+            raise RuntimeError("配置了 RATE_LIMIT_REDIS_URL，但没有安装 redis (pip install redis)")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TAKE)
+
+    def take(self, key: str, capacity: int, period: int) -> float:
+        try:
+            return float(self._script(keys=[self.prefix + key], args=[capacity, capacity / period, period]))
+        except redis.RedisError as e:
+            logger.warning("限流 Redis 不可用，放行请求: %s", e)
+            return 0.0
+
+
+class RateLimiter:
+    """
+    一条限流规则
+
+    Args:
+        name: 规则名，作为 key 的前缀 (不同规则的桶互不影响)
+        rate: "次数/时间单位"，同时也是桶的容量 (允许的突发请求数)
+        store: MemoryBucketStore 或 RedisBucketStore
+    """
+
+    def __init__(self, name: str, rate: str, store):
+        self.name = name
+        self.capacity, self.period = parse_rate(rate)
+        self.store = store
+
+    def hit(self, key: str) -> Optional[int]:
+        """记一次请求；没超限返回 None，超限返回建议的 Retry-After 秒数"""
+        wait = self.store.take(f"{self.name}:{key}", self.capacity, self.period)
+        return math.ceil(wait) if wait > 0 else None
+
+
+def create_store(redis_url: str = "", max_keys: int = 100000):
+    return RedisBucketStore(redis_url) if redis_url else MemoryBucketStore(max_keys)
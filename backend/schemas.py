@@ -1,6 +1,6 @@
 import enum
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime
 from . import models 
 
@@ -85,6 +85,7 @@ class Post(PostBase):
     """用于“读取”的完整帖子模型 (包含关系)"""
     id: int
     status: models.Post.StatusEnum
+    favorite_count: int = 0
     created_at: datetime
     updated_at: datetime
     
@@ -96,9 +97,42 @@ class Post(PostBase):
     class Config:
         from_attributes = True
 
+class UserSummary(BaseModel):
+    """帖子卡片上展示的卖家信息 (不含邮箱)"""
+    id: int
+    username: str
+    avatar_url: Optional[str] = None
+    success_trades: int
+
+    class Config:
+        from_attributes = True
+
+class PostSummary(BaseModel):
+    """
+    用于列表卡片 (PostCard) 的精简帖子模型 (列表接口传 fields=summary 时返回)
+    不含 description，卖家不含邮箱，images 只包含第一张图
+    """
+    id: int
+    title: str
+    post_type: models.Post.PostTypeEnum
+    price: float
+    price_min: Optional[float] = None
+    condition: Optional[models.Post.ConditionEnum] = None
+    status: models.Post.StatusEnum
+    favorite_count: int = 0
+    category_id: int
+    created_at: datetime
+
+    owner: UserSummary
+    category: Category
+    images: List[PostImage] = []
+
+    class Config:
+        from_attributes = True
+
 class PostsResponse(BaseModel):
     """用于返回帖子列表和总数的响应模型"""
-    posts: List[Post]
+    posts: List[Union[Post, PostSummary]]
     total: int
 
 # =======================================================================
@@ -109,6 +143,12 @@ class FavoriteCreate(BaseModel):
     """用于“创建”收藏 (用户ID将从Token获取)"""
     post_id: int
 
+class FavoritesResponse(BaseModel):
+    """用于返回收藏列表（游标分页）的响应模型"""
+    posts: List[Union[Post, PostSummary]]
+    total: int
+    next_cursor: Optional[str] = None  # 没有下一页时为 null
+
 class Favorite(BaseModel):
     """用于“读取”收藏记录"""
     user_id: int
@@ -153,7 +193,7 @@ class Message(BaseModel):
 
 class InboxConversation(BaseModel):
 
-    post: Post          # 1. 这是关于哪个帖子的会话 (帖子详情)
+    post: Union[Post, PostSummary]  # 1. 这是关于哪个帖子的会话 (帖子详情)
     other_user: User    # 2. 这是和谁的会话 (对方的用户信息)
     last_message: Message # 3. 这条会话的“最后一条消息” (用于预览)
 
@@ -216,6 +256,42 @@ class Transaction(BaseModel):
     class Config:
         from_attributes = True
 
+# =======================================================================
+# 保存的搜索 (新帖提醒) Schemas
+# =======================================================================
+
+class SavedSearchCreate(BaseModel):
+    """用于"创建"保存的搜索，条件同 GET /api/posts 的筛选 (至少要有一个)"""
+    keyword: Optional[str] = None
+    category_id: Optional[int] = None
+    post_type: Optional[models.Post.PostTypeEnum] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+class SavedSearch(SavedSearchCreate):
+    """用于"读取"保存的搜索"""
+    id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class Notification(BaseModel):
+    """新帖提醒：有符合保存的搜索条件的新帖子"""
+    id: int
+    saved_search_id: Optional[int]
+    is_read: bool
+    created_at: datetime
+    post: PostSummary
+
+    class Config:
+        from_attributes = True
+
+class NotificationsResponse(BaseModel):
+    """提醒列表的响应格式"""
+    notifications: List[Notification]
+    unread_count: int
+
 # =======================================================================
 # 6. 用于解决循环嵌套的更新 (Advanced)
 # =======================================================================
@@ -0,0 +1,187 @@
+"""
+快速序列化 (绕过 Pydantic 的逐字段校验)
+
+列表接口返回的都是刚从数据库读出来的可信数据，不需要再用 schemas 校验一遍。
+这里直接把 ORM 对象转换成 dict，再交给 ORJSONResponse 输出。
+输出的字段和格式与 schemas 中对应的模型保持一致，前端无需任何改动。
+"""
+from typing import List, Optional
+
+from fastapi.responses import ORJSONResponse
+
+from . import models
+
+
+def _enum_value(value):
+    """数据库返回的 Enum 成员 -> 字符串 (None 原样返回)"""
+    return value.value if value is not None else None
+
+
+def _float(value) -> Optional[float]:
+    """DECIMAL -> float，与 schemas 中声明的 float 类型一致"""
+    return float(value) if value is not None else None
+
+
+def serialize_user(user: models.User) -> dict:
+    """对应 schemas.User"""
+    return {
+        "id": user.id,
+        "email": user.email,
+        "username": user.username,
+        "avatar_url": user.avatar_url,
+        "success_trades": user.success_trades,
+        "created_at": user.created_at,
+    }
+
+
+def serialize_user_summary(user: models.User) -> dict:
+    """对应 schemas.UserSummary"""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "avatar_url": user.avatar_url,
+        "success_trades": user.success_trades,
+    }
+
+
+def serialize_category(category: models.Category) -> dict:
+    """对应 schemas.Category"""
+    return {"id": category.id, "name": category.name}
+
+
+def serialize_post_image(image: models.PostImage) -> dict:
+    """对应 schemas.PostImage"""
+    return {"id": image.id, "image_url": image.image_url}
+
+
+def serialize_post(post: models.Post) -> dict:
+    """对应 schemas.Post"""
+    return {
+        "title": post.title,
+        "description": post.description,
+        "price": _float(post.price),
+        "category_id": post.category_id,
+        "post_type": _enum_value(post.post_type),
+        "price_min": _float(post.price_min),
+        "condition": _enum_value(post.condition),
+        "id": post.id,
+        "status": _enum_value(post.status),
+        "favorite_count": post.favorite_count,
+        "created_at": post.created_at,
+        "updated_at": post.updated_at,
+        "owner": serialize_user(post.owner),
+        "category": serialize_category(post.category),
+        "images": [serialize_post_image(image) for image in post.images],
+    }
+
+
+def serialize_post_summary(post: models.Post) -> dict:
+    """对应 schemas.PostSummary (images 只保留第一张)"""
+    return {
+        "id": post.id,
+        "title": post.title,
+        "post_type": _enum_value(post.post_type),
+        "price": _float(post.price),
+        "price_min": _float(post.price_min),
+        "condition": _enum_value(post.condition),
+        "status": _enum_value(post.status),
+        "favorite_count": post.favorite_count,
+        "category_id": post.category_id,
+        "created_at": post.created_at,
+        "owner": serialize_user_summary(post.owner),
+        "category": serialize_category(post.category),
+        "images": [serialize_post_image(image) for image in post.images[:1]],
+    }
+
+
+def serialize_message(message: models.Message) -> dict:
+    """对应 schemas.Message"""
+    return {
+        "id": message.id,
+        "content": message.content,
+        "post_id": message.post_id,
+        "sender_id": message.sender_id,
+        "receiver_id": message.receiver_id,
+        "is_read": message.is_read,
+        "created_at": message.created_at,
+        "sender": serialize_user(message.sender),
+        "receiver": serialize_user(message.receiver),
+    }
+
+
+def serialize_inbox_conversation(conversation: dict, summary: bool = False) -> dict:
+    """对应 schemas.InboxConversation"""
+    serialize = serialize_post_summary if summary else serialize_post
+    return {
+        "post": serialize(conversation["post"]),
+        "other_user": serialize_user(conversation["other_user"]),
+        "last_message": serialize_message(conversation["last_message"]),
+    }
+
+
+def serialize_notification(notification: models.Notification) -> dict:
+    """对应 schemas.Notification"""
+    return {
+        "id": notification.id,
+        "saved_search_id": notification.saved_search_id,
+        "is_read": notification.is_read,
+        "created_at": notification.created_at,
+        "post": serialize_post_summary(notification.post),
+    }
+
+
+# =======================================================================
+# 直接生成响应 (路由里 return 这些函数的结果即可)
+# =======================================================================
+
+def posts_response(
+    posts: List[models.Post],
+    total: int,
+    summary: bool = False
+) -> ORJSONResponse:
+    """对应 schemas.PostsResponse (summary=True 时帖子为 PostSummary)"""
+    serialize = serialize_post_summary if summary else serialize_post
+    return ORJSONResponse({
+        "posts": [serialize(post) for post in posts],
+        "total": total,
+    })
+
+
+def post_summaries_response(posts: List[models.Post]) -> ORJSONResponse:
+    """对应 List[schemas.PostSummary]"""
+    return ORJSONResponse([serialize_post_summary(post) for post in posts])
+
+
+def favorites_response(
+    posts: List[models.Post],
+    total: int,
+    next_cursor: Optional[str],
+    summary: bool = False
+) -> ORJSONResponse:
+    """对应 schemas.FavoritesResponse (summary=True 时帖子为 PostSummary)"""
+    serialize = serialize_post_summary if summary else serialize_post
+    return ORJSONResponse({
+        "posts": [serialize(post) for post in posts],
+        "total": total,
+        "next_cursor": next_cursor,
+    })
+
+
+def messages_response(messages: List[models.Message]) -> ORJSONResponse:
+    """对应 List[schemas.Message]"""
+    return ORJSONResponse([serialize_message(message) for message in messages])
+
+
+def inbox_response(conversations: List[dict], summary: bool = False) -> ORJSONResponse:
+    """对应 List[schemas.InboxConversation] (summary=True 时 post 为 PostSummary)"""
+    return ORJSONResponse([
+        serialize_inbox_conversation(conversation, summary) for conversation in conversations
+    ])
+
+
+def notifications_response(notifications: List[models.Notification], unread_count: int) -> ORJSONResponse:
+    """对应 schemas.NotificationsResponse"""
+    return ORJSONResponse({
+        "notifications": [serialize_notification(notification) for notification in notifications],
+        "unread_count": unread_count,
+    })
@@ -0,0 +1,418 @@
+"""
+相似帖子推荐 (帖子详情页的 "相似商品")
+
+- 标题 + 描述切成字符 n-gram (2~3 个字符)：中文不需要分词，英文和型号也能匹配
+- n-gram 哈希到固定维度 (feature hashing)，新帖子不会改变词表，可以随时增量加入
+- 每个帖子是一行 L2 归一化的 TF-IDF 稀疏向量，存在 SciPy 的 CSC 矩阵里；
+  一个帖子和所有帖子的相似度 = 只取它包含的那几列做一次稀疏矩阵 × 向量
+- 每个帖子的 top-k 相似帖子算好后放在 dict 里，接口只是一次字典查找
+- 发帖 / 改帖后增量更新：算出新帖子的 top-k，并把它插入到和它最相似的那些帖子的 top-k 里；
+  新的行先放在一个小的待合并矩阵里，攒够 merge_threshold 行再合并进主矩阵 (避免每次复制整个矩阵)
+
+只有在售的帖子才会被推荐。IDF 在 rebuild() 时计算，之后加入的帖子沿用当时的 IDF；
+新加入的帖子比 rebuild 时的帖子还多时，sync() 会重新 rebuild 刷新 IDF。
+n-gram 用 Python 的 hash() 映射，只在本进程内有效：每个 worker 各自在内存里维护一份索引。
+处理写请求的 worker 立即更新自己的索引 (main.refresh_similar_posts)，其它 worker 由后台线程
+定期调用 sync()，按 updated_at 读取期间变化的帖子，并去掉已经删除的帖子。
+"""
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy.orm import Session
+
+from . import crud, models
+from .config import settings
+
+NGRAM_SIZES = (2, 3)
+TITLE_WEIGHT = 2            # 标题里的 n-gram 计两次
+MAX_DESCRIPTION_LENGTH = 300  # 描述只取开头一段，够判断是什么东西了
+MAX_DF = 0.2                # 出现在超过 20% 帖子里的 n-gram 不参与计算 (相当于停用词)
+MIN_DOCS_FOR_MAX_DF = 100   # 帖子太少时不做这个过滤
+REVERSE_CANDIDATES = 4      # 新帖子会尝试插入到和它最相似的 top_k * 4 个帖子的列表里
+WARM_BATCH_SIZE = 64
+
+
+def _normalize(text: str) -> str:
+    # 全角转半角、统一小写、合并空白
+    return " ".join(unicodedata.normalize("NFKC", text or "").lower().split())
+
+
+def char_ngrams(text: str) -> List[str]:
+    return [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+
+
+class SimilarPostsIndex:
+    """
+    Args:
+        n_features: 哈希维度 (2 的幂)
+        top_k: 每个帖子缓存的相似帖子个数
+        merge_threshold: 待合并的行数达到该值时合并进主矩阵
+    """
+
+    def __init__(self, n_features: int = 2 ** 18, top_k: int = 20, merge_threshold: int = 1000):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features 必须是 2 的幂")
+        self.n_features = n_features
+        self.top_k = top_k
+        self.merge_threshold = merge_threshold
+
+        self._lock = threading.RLock()
+        self._idf = np.ones(n_features, dtype=np.float32)
+        self._main = sp.csc_matrix((0, n_features), dtype=np.float32)
+        self._main_posts = np.zeros(0, dtype=np.int64)
+        self._pending_rows: List[sp.csr_matrix] = []
+        self._pending_posts: List[int] = []
+        self._pending_matrix: Optional[sp.csc_matrix] = None  # _pending_rows 合成的矩阵 (缓存)
+        self._row_of: Dict[int, int] = {}  # 帖子 ID -> 行号 (主矩阵在前，待合并的行在后)
+        self._texts: Dict[int, int] = {}   # 帖子 ID -> 标题和描述的哈希 (sync 时跳过没有变化的帖子)
+        self.rebuilt_docs = 0              # 上次 rebuild 时的帖子数
+        self.added_since_rebuild = 0       # 之后 add 的次数 (用来判断 IDF 是否该刷新了)
+        self._dead: Set[int] = set()       # 已删除 / 已下架帖子的行号 (合并时才真正去掉)
+        self._neighbors: Dict[int, List[Tuple[int, float]]] = {}  # 帖子 ID -> [(相似帖子 ID, 相似度)]
+        self._referrers: Dict[int, Set[int]] = {}  # 帖子 ID -> 相似帖子列表里有它的帖子
+        self._changes: Optional[list] = None  # 重建期间发生的增量更新 (换上新索引后重放)
+
+    # -------------------------------------------------------------------
+    # 向量化
+    # -------------------------------------------------------------------
+
+    def _term_counts(self, title: str, description: str) -> Tuple[np.ndarray, np.ndarray]:
+        counts: Dict[int, int] = {}
+        mask = self.n_features - 1
+        for weight, text in ((TITLE_WEIGHT, title), (1, (description or "")[:MAX_DESCRIPTION_LENGTH])):
+            for gram in char_ngrams(_normalize(text)):
+                feature = hash(gram) & mask
+                counts[feature] = counts.get(feature, 0) + weight
+        features = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        return features, tf
+
+    def _weigh(self, features: np.ndarray, tf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """次线性 TF × IDF，再 L2 归一化；去掉权重为 0 的 n-gram"""
+        data = (1 + np.log(tf)) * self._idf[features]
+        keep = data > 0
+        features, data = features[keep], data[keep]
+        norm = np.linalg.norm(data)
+        if norm > 0:
+            data /= norm
+        return features, data
+
+    def vectorize(self, title: str, description: str) -> Tuple[np.ndarray, np.ndarray]:
+        """帖子文本 -> 稀疏向量 (列号, 权重)"""
+        return self._weigh(*self._term_counts(title, description))
+
+    def _row(self, features: np.ndarray, data: np.ndarray) -> sp.csr_matrix:
+        order = np.argsort(features)
+        return sp.csr_matrix(
+            (data[order], features[order], [0, len(features)]), shape=(1, self.n_features)
+        )
+
+    # -------------------------------------------------------------------
+    # 建索引
+    # -------------------------------------------------------------------
+
+    def rebuild(self, load_posts: Callable[[], Iterable[Tuple[int, str, str]]]):
+        """
+        重新建立整个索引 (会清空已缓存的相似帖子)
+
+        Args:
+            load_posts: 返回全部 (帖子 ID, 标题, 描述) 的函数；读取和计算期间照常用旧索引响应，
+                        期间的 add / remove 在换上新索引后重放，不会丢失
+        """
+        with self._lock:
+            self._changes = []
+        try:
+            post_ids, counts, texts = [], [], {}
+            for post_id, title, description in load_posts():
+                post_ids.append(post_id)
+                counts.append(self._term_counts(title, description))
+                texts[post_id] = hash((title, description))
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+
+        df = np.zeros(self.n_features, dtype=np.int32)
+        for features, _ in counts:
+            df[features] += 1
+        n_docs = len(post_ids)
+        idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+        if n_docs >= MIN_DOCS_FOR_MAX_DF:
+            idf[df > MAX_DF * n_docs] = 0
+
+        with self._lock:
+            self._idf = idf
+            indptr, indices, data = [0], [], []
+            for features, tf in counts:
+                features, weights = self._weigh(features, tf)
+                order = np.argsort(features)
+                indices.append(features[order])
+                data.append(weights[order])
+                indptr.append(indptr[-1] + len(features))
+            self._main = sp.csr_matrix(
+                (
+                    np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+                    np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+                    indptr,
+                ),
+                shape=(n_docs, self.n_features),
+            ).tocsc()
+            self._main_posts = np.array(post_ids, dtype=np.int64)
+            self._pending_rows, self._pending_posts, self._pending_matrix = [], [], None
+            self._row_of = {post_id: row for row, post_id in enumerate(post_ids)}
+            self._texts = texts
+            self.rebuilt_docs, self.added_since_rebuild = n_docs, 0
+            self._dead = set()
+            self._neighbors = {}
+            self._referrers = {}
+
+            changes, self._changes = self._changes, None
+            for method, args in changes:
+                method(*args)
+
+    def warm(self, post_ids: Iterable[int]):
+        """预先计算一批帖子 (比如最新发布的) 的相似帖子，按批做稀疏矩阵乘法"""
+        with self._lock:
+            main = self._main.tocsr()
+        transposed = main.T.tocsr()
+        post_ids = [post_id for post_id in post_ids if self._row_of.get(post_id, main.shape[0]) < main.shape[0]]
+
+        for start in range(0, len(post_ids), WARM_BATCH_SIZE):
+            batch = post_ids[start:start + WARM_BATCH_SIZE]
+            with self._lock:
+                rows = [self._row_of[post_id] for post_id in batch if post_id in self._row_of]
+                if len(rows) != len(batch) or main.shape[0] != self._main.shape[0]:
+                    return  # 期间合并过矩阵 (行号变了)，剩下的等接口按需计算
+                scores = (main[rows] @ transposed).toarray()
+                for post_id, row, row_scores in zip(batch, rows, scores):
+                    row_scores = self._pad(row_scores)
+                    self._set_neighbors(post_id, self._top_k(row_scores, exclude_row=row))
+
+    # -------------------------------------------------------------------
+    # 增量更新
+    # -------------------------------------------------------------------
+
+    def add(self, post_id: int, title: str, description: str):
+        """新帖子 (或修改过的帖子) 加入索引，并更新相关帖子的 top-k"""
+        features, tf = self._term_counts(title, description)
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((self.add, (post_id, title, description)))
+            self._remove_row(post_id)
+            self._texts[post_id] = hash((title, description))
+            self.added_since_rebuild += 1
+            features, data = self._weigh(features, tf)
+
+            row = self._main.shape[0] + len(self._pending_rows)
+            self._pending_rows.append(self._row(features, data))
+            self._pending_posts.append(post_id)
+            self._pending_matrix = None
+            self._row_of[post_id] = row
+
+            scores = self._scores(features, data)
+            self._set_neighbors(post_id, self._top_k(scores, exclude_row=row))
+            self._insert_into_neighbors(post_id, row, scores)
+
+            if len(self._pending_rows) >= self.merge_threshold:
+                self._merge()
+
+    def remove(self, post_id: int):
+        """帖子被删除 / 售出 / 下架后不再推荐"""
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((self.remove, (post_id,)))
+            self._remove_row(post_id)
+            self._texts.pop(post_id, None)
+            self._drop_neighbors(post_id)
+
+    def has_text(self, post_id: int, title: str, description: str) -> bool:
+        """帖子已经以这个标题和描述在索引里"""
+        return self._texts.get(post_id) == hash((title, description))
+
+    def post_ids(self) -> Set[int]:
+        with self._lock:
+            return set(self._row_of)
+
+    def _remove_row(self, post_id: int):
+        """去掉帖子的行；列表里有它的帖子的缓存作废 (下次访问时重新计算)"""
+        row = self._row_of.pop(post_id, None)
+        if row is not None:
+            self._dead.add(row)
+        for referrer in self._referrers.pop(post_id, ()):
+            self._drop_neighbors(referrer)
+
+    def _set_neighbors(self, post_id: int, neighbors: List[Tuple[int, float]]):
+        self._drop_neighbors(post_id)
+        self._neighbors[post_id] = neighbors
+        for neighbor_id, _ in neighbors:
+            self._referrers.setdefault(neighbor_id, set()).add(post_id)
+
+    def _drop_neighbors(self, post_id: int):
+        for neighbor_id, _ in self._neighbors.pop(post_id, ()):
+            referrers = self._referrers.get(neighbor_id)
+            if referrers is not None:
+                referrers.discard(post_id)
+                if not referrers:
+                    del self._referrers[neighbor_id]
+
+    def _insert_into_neighbors(self, post_id: int, row: int, scores: np.ndarray):
+        """把新帖子插入到和它最相似的那些帖子已缓存的 top-k 里 (近似：只看前 top_k * 4 个)"""
+        post_ids = self._row_posts()
+        for other_row in self._best_rows(scores, self.top_k * REVERSE_CANDIDATES, exclude_row=row):
+            other_id = int(post_ids[other_row])
+            neighbors = self._neighbors.get(other_id)
+            if neighbors is None:
+                continue  # 还没算过，第一次访问时会算出来
+            score = float(scores[other_row])
+            if len(neighbors) >= self.top_k and score <= neighbors[-1][1]:
+                continue
+            merged = [item for item in neighbors if item[0] != post_id] + [(post_id, score)]
+            merged.sort(key=lambda item: item[1], reverse=True)
+            self._set_neighbors(other_id, merged[:self.top_k])
+
+    def _merge(self):
+        """把待合并的行并入主矩阵，同时真正删掉已删除的行"""
+        matrix = sp.vstack([self._main.tocsr(), self._pending_csr()]).tocsr()
+        post_ids = self._row_posts()
+        keep = np.ones(matrix.shape[0], dtype=bool)
+        keep[list(self._dead)] = False
+
+        self._main = matrix[keep].tocsc()
+        self._main_posts = post_ids[keep]
+        self._pending_rows, self._pending_posts, self._pending_matrix = [], [], None
+        self._row_of = {int(post_id): row for row, post_id in enumerate(self._main_posts)}
+        self._dead = set()
+
+    # -------------------------------------------------------------------
+    # 查询
+    # -------------------------------------------------------------------
+
+    def neighbors(self, post_id: int) -> Optional[List[int]]:
+        """已缓存的相似帖子 ID (按相似度从高到低)；还没算过返回 None"""
+        neighbors = self._neighbors.get(post_id)
+        return None if neighbors is None else [neighbor_id for neighbor_id, _ in neighbors]
+
+    def compute_neighbors(self, post_id: int, title: str, description: str) -> List[int]:
+        """按帖子文本现算相似帖子；帖子在索引里 (在售) 的话顺便缓存起来"""
+        features, data = self.vectorize(title, description)
+        with self._lock:
+            row = self._row_of.get(post_id)
+            neighbors = self._top_k(self._scores(features, data), exclude_row=row)
+            if row is not None:
+                self._set_neighbors(post_id, neighbors)
+        return [neighbor_id for neighbor_id, _ in neighbors]
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _pending_csr(self) -> sp.csr_matrix:
+        if not self._pending_rows:
+            return sp.csr_matrix((0, self.n_features), dtype=np.float32)
+        return sp.vstack(self._pending_rows).tocsr()
+
+    def _row_posts(self) -> np.ndarray:
+        return np.concatenate([self._main_posts, np.array(self._pending_posts, dtype=np.int64)])
+
+    def _pad(self, main_scores: np.ndarray) -> np.ndarray:
+        """主矩阵的分数后面补上待合并行的位置 (warm 只和主矩阵比较)"""
+        return np.concatenate([main_scores, np.zeros(len(self._pending_rows), dtype=main_scores.dtype)])
+
+    def _scores(self, features: np.ndarray, data: np.ndarray) -> np.ndarray:
+        """给定向量和索引里每一行的余弦相似度 (只取向量里出现的列)"""
+        scores = self._main[:, features] @ data
+        if self._pending_rows:
+            if self._pending_matrix is None:
+                self._pending_matrix = self._pending_csr().tocsc()
+            scores = np.concatenate([scores, self._pending_matrix[:, features] @ data])
+        return scores
+
+    def _best_rows(self, scores: np.ndarray, k: int, exclude_row: Optional[int]) -> List[int]:
+        scores = scores.copy()
+        if exclude_row is not None:
+            scores[exclude_row] = 0
+        if self._dead:
+            scores[list(self._dead)] = 0
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        rows = np.argpartition(-scores, k - 1)[:k]
+        rows = rows[np.argsort(-scores[rows])]
+        return [int(row) for row in rows if scores[row] > 0]
+
+    def _top_k(self, scores: np.ndarray, exclude_row: Optional[int]) -> List[Tuple[int, float]]:
+        post_ids = self._row_posts()
+        return [
+            (int(post_ids[row]), float(scores[row]))
+            for row in self._best_rows(scores, self.top_k, exclude_row)
+        ]
+
+
+# 本进程的索引 (numpy / scipy 导入要 0.3 秒左右，main 里用到时才导入本模块，不拖慢冷启动)
+index = SimilarPostsIndex(n_features=settings.SIMILAR_POSTS_FEATURES, top_k=settings.SIMILAR_POSTS_TOP_K)
+
+
+_built = False
+_synced_until = None  # sync() 读到的最大 updated_at (下次从这里接着读)
+
+
+def rebuild(db: Session, warm: int = 0) -> int:
+    """从数据库重建索引，并预先计算最新的 warm 个帖子的相似帖子；返回在售帖子数"""
+    global _built, _synced_until
+    post_ids: List[int] = []
+    # 先记下当前的 updated_at，读取期间修改的帖子下次 sync 时还会读到
+    synced_until = crud.get_max_post_updated_at(db)
+
+    def load_posts():
+        posts = crud.get_available_post_texts(db)
+        post_ids.extend(post.id for post in posts)
+        return posts
+
+    index.rebuild(load_posts)
+    _built, _synced_until = True, synced_until
+    if warm:
+        index.warm(post_ids[:-warm - 1:-1])
+    return len(post_ids)
+
+
+def sync(db: Session) -> int:
+    """
+    和数据库同步 (其它 worker 上的发帖 / 改帖 / 售出 / 删帖)，返回更新的帖子数
+    
+    - updated_at >= 上次读到的最大值的帖子重新读一遍 (updated_at 只精确到秒，
+      同一秒的帖子可能读到两次，标题和描述没变的直接跳过)
+    - 在售帖子数和索引对不上时 (帖子被删除等)，读一次全部在售帖子 ID，去掉多的、补上少的
+    - 之后加入的帖子比 rebuild 时还多，说明 IDF 已经明显过时，整个重建
+    """
+    global _synced_until
+    if not _built or index.added_since_rebuild > max(index.rebuilt_docs, 1000):
+        return rebuild(db)
+
+    changed = 0
+    indexed = index.post_ids()  # 只复制一次，下面增删帖子时同步更新这个集合
+    rows = crud.get_post_texts_updated_since(db, _synced_until)
+    for row in rows:
+        if row.status != models.Post.StatusEnum.available:
+            if row.id in indexed:
+                index.remove(row.id)
+                indexed.discard(row.id)
+                changed += 1
+        elif not index.has_text(row.id, row.title, row.description):
+            index.add(row.id, row.title, row.description)
+            indexed.add(row.id)
+            changed += 1
+    if rows:
+        _synced_until = max(row.updated_at for row in rows)
+
+    if crud.count_available_posts(db) != len(index):
+        # 只在对不上时重新复制一次 (同步期间请求线程可能也改了索引)
+        available, indexed = set(crud.get_available_post_ids(db)), index.post_ids()
+        for post_id in indexed - available:
+            index.remove(post_id)
+            changed += 1
+        for post in crud.get_available_post_texts_by_ids(db, list(available - indexed)):
+            index.add(post.id, post.title, post.description)
+            changed += 1
+    return changed
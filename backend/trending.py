@@ -0,0 +1,151 @@
+"""
+帖子热度 (GET /api/posts?sort_by=trending)
+
+热度 = Σ 事件权重 × 0.5 ^ (距今时间 / 半衰期)，事件包括收藏 (取消收藏会扣回)、私信和浏览详情页。
+
+- 用 "前向衰减" 记分：每个事件记为 权重 × 2 ^ ((事件时间 - 基准时间) / 半衰期)。
+  所有帖子都按同一个基准时间换算，时间流逝不改变分数的相对大小，
+  所以记录一个事件只是给一个 dict 值做加法，不需要重新计算其它帖子，也不需要聚合 favorites / messages 表
+- 排名 (分数最高的 max_ranked 个帖子) 是用 heapq.nlargest 生成的不可变快照，
+  分数有变化时最多每 refresh_seconds 秒重新生成一次；列表接口只读快照
+- 每个 worker 只看得到自己处理的事件：定期调用 flush() 把本 worker 攒下的增量累加到
+  post_trending_scores 表，再读回所有 worker 合并后的分数 —— 各 worker 的排名在一两个周期内趋于一致，
+  重启也不会丢
+"""
+import heapq
+import threading
+import time
+from operator import itemgetter
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .config import settings
+
+FAVORITE_WEIGHT = 3.0
+MESSAGE_WEIGHT = 1.0
+VIEW_WEIGHT = 0.1
+REBASE_HALF_LIVES = 256  # 基准时间过去这么多个半衰期后换一个基准 (2^256 离 float 上限还很远)
+STALE_HALF_LIVES = 20    # 20 个半衰期没有更新的分数 (不到原来的百万分之一) 不再加载，并从数据库删除
+
+
+class TrendingScores:
+    """
+    Args:
+        half_life: 半衰期 (秒)
+        max_ranked: 排名快照里最多保留的帖子数 (更靠后的帖子按发布时间排)
+        refresh_seconds: 排名快照最多多久重新生成一次
+    """
+
+    def __init__(self, half_life: float = 86400, max_ranked: int = 1000, refresh_seconds: float = 5):
+        self.half_life = half_life
+        self.max_ranked = max_ranked
+        self.refresh_seconds = refresh_seconds
+
+        self._lock = threading.Lock()
+        self._epoch = time.time()
+        self._scores: Dict[int, float] = {}  # 帖子 ID -> 按 _epoch 换算的分数 (数据库里的 + 本 worker 还没保存的)
+        self._deltas: Dict[int, float] = {}  # 本 worker 还没保存到数据库的增量 (同样按 _epoch 换算)
+        self._dirty = False
+        self._ranking: Tuple[int, ...] = ()
+        self._ranked_at = float("-inf")
+        self.version = 0  # 排名快照的版本号，每次重新生成加一 (列表的 ETag 用)
+
+    def _growth(self, now: float) -> float:
+        """now 时刻的事件换算到基准时间的倍数 (必要时换基准时间，需要持有锁)"""
+        half_lives = (now - self._epoch) / self.half_life
+        if half_lives > REBASE_HALF_LIVES:
+            factor = 0.5 ** half_lives
+            self._scores = {post_id: score * factor for post_id, score in self._scores.items()}
+            self._deltas = {post_id: delta * factor for post_id, delta in self._deltas.items()}
+            self._epoch = now
+            half_lives = 0.0
+        return 2.0 ** half_lives
+
+    def record(self, post_id: int, weight: float, now: float = None):
+        """记录一个事件 (权重为负表示撤销，比如取消收藏)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            value = weight * self._growth(now)
+            self._scores[post_id] = max(0.0, self._scores.get(post_id, 0.0) + value)
+            self._deltas[post_id] = self._deltas.get(post_id, 0.0) + value
+            self._dirty = True
+
+    def remove(self, post_id: int):
+        """帖子被删除 (数据库里的分数随帖子级联删除)"""
+        with self._lock:
+            self._scores.pop(post_id, None)
+            self._deltas.pop(post_id, None)
+            self._dirty = True
+
+    def ranking(self) -> Tuple[int, ...]:
+        """热度从高到低的帖子 ID (最多 max_ranked 个，只包含分数大于 0 的)"""
+        now = time.monotonic()
+        if self._dirty and now - self._ranked_at >= self.refresh_seconds:
+            with self._lock:
+                if not self._dirty:
+                    return self._ranking
+                items = list(self._scores.items())
+                self._dirty = False
+                self._ranked_at = now
+            top = heapq.nlargest(self.max_ranked, items, key=itemgetter(1))
+            self._ranking = tuple(post_id for post_id, score in top if score > 0)
+            self.version += 1
+        return self._ranking
+
+    # -------------------------------------------------------------------
+    # 和数据库同步
+    # -------------------------------------------------------------------
+
+    def take_deltas(self, now: float) -> Dict[int, float]:
+        """取出还没保存的增量 (换算成 now 时刻的值)"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            factor = 0.5 ** ((now - self._epoch) / self.half_life)
+        return {post_id: delta * factor for post_id, delta in deltas.items() if delta}
+
+    def restore_deltas(self, deltas: Dict[int, float], now: float):
+        """保存失败时把取出的增量放回去，下次再保存"""
+        with self._lock:
+            growth = self._growth(now)
+            for post_id, delta in deltas.items():
+                self._deltas[post_id] = self._deltas.get(post_id, 0.0) + delta * growth
+
+    def load(self, rows: Iterable[Tuple[int, float, float]]):
+        """用数据库里的 (帖子 ID, 分数, 更新时间) 替换内存里的分数，再加上这期间新记录的增量"""
+        with self._lock:
+            scores = {
+                post_id: score * 2.0 ** ((updated_at - self._epoch) / self.half_life)
+                for post_id, score, updated_at in rows
+            }
+            for post_id, delta in self._deltas.items():
+                scores[post_id] = max(0.0, scores.get(post_id, 0.0) + delta)
+            self._scores = scores
+            self._dirty = True
+
+
+tracker = TrendingScores(
+    half_life=settings.TRENDING_HALF_LIFE_HOURS * 3600,
+    max_ranked=settings.TRENDING_MAX_RANKED,
+    refresh_seconds=settings.TRENDING_REFRESH_SECONDS,
+)
+
+
+def flush(db: Session) -> int:
+    """
+    把本 worker 的增量累加到数据库，再读回所有 worker 合并后的分数
+    (启动时、每 TRENDING_FLUSH_SECONDS 秒、关闭时调用)；返回保存的帖子数
+    """
+    now = time.time()
+    deltas = tracker.take_deltas(now)
+    try:
+        saved = crud.add_trending_scores(db, deltas, now, tracker.half_life)
+        crud.delete_stale_trending_scores(db, before=now - STALE_HALF_LIVES * tracker.half_life)
+        db.commit()
+    except Exception:
+        db.rollback()
+        tracker.restore_deltas(deltas, now)
+        raise
+    tracker.load(crud.get_trending_scores(db, since=now - STALE_HALF_LIVES * tracker.half_life))
+    return saved
@@ -0,0 +1,30 @@
+"""
+基准测试的机器速度校准 (hot_paths 和 startup 共用)
+
+生成基线时把一个固定负载的耗时一起存进基线文件，比较时按 "当前耗时 / 基线耗时" 缩放基线，
+换到慢一些的机器上也不会误报回归。
+"""
+import json
+import time
+
+CALIBRATION_KEY = "_calibration_ms"
+
+
+def calibrate() -> float:
+    """
+    固定的纯 Python 负载 (解析 + 排序 + 字典操作) 的耗时，取 5 次里最快的一次
+    和基线里保存的值相比，可以估计出当前机器比生成基线时快/慢多少
+    """
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        rows = [{"id": i, "title": f"帖子 {i}", "price": str(i * 7 % 1000)} for i in range(50_000)]
+        rows.sort(key=lambda row: float(row["price"]))
+        json.dumps(rows[:5000], ensure_ascii=False)
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+
+def speed_factor(baseline: dict, calibration_ms: float) -> float:
+    """基线延迟的缩放比例 (只放宽不收紧，机器更快时仍按原基线比较)"""
+    return max(1.0, calibration_ms / baseline.get(CALIBRATION_KEY, calibration_ms))
@@ -0,0 +1,311 @@
+"""
+合成数据生成器：在本地复现接近生产规模的数据量
+
+按比较真实的分布生成 User / Post / PostImage / Favorite / Message / Transaction：
+- 卖家发帖数服从幂律分布 (少数人发了大量帖子)
+- 帖子热度服从幂律分布 (收藏和私信集中在少数热门帖子上)
+- 每个会话的消息数服从帕累托分布 (大部分只聊一两句，少数会话聊很多)
+- 帖子的 favorite_count、status 和用户的 success_trades 与生成的收藏/交易保持一致
+
+所有行先在内存里算好 ID 和外键，再用 Core 的 executemany 分批插入，
+不经过 ORM，百万行级别的数据几分钟内可以生成完。
+数据追加到 DATABASE_URL 指向的数据库 (SQLite 或 MySQL)，ID 从各表现有的最大 ID 之后开始。
+所有生成的用户密码都是 DEFAULT_PASSWORD，可以直接登录做压测。
+
+用法 (在项目根目录下运行):
+    DATABASE_URL=sqlite:///./synthetic.db python -m benchmarks.dataset
+    python -m benchmarks.dataset --users 100000 --posts 1000000 --favorites 3000000 --messages 2000000
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+# 没有 .env 时默认写到项目根目录下的 synthetic.db
+os.environ.setdefault("DATABASE_URL", "sqlite:///./synthetic.db")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import func, select
+
+from backend import crud, models, security
+from backend.database import get_engine
+
+DEFAULT_PASSWORD = "password123"
+DEFAULT_CATEGORIES = ["教科书", "电子产品", "生活用品", "家具", "服装", "运动器材", "票券", "其他"]
+
+ITEMS = ["微积分教材", "线性代数教材", "英语词典", "iPad", "显示器", "机械键盘", "台灯", "电饭煲",
+         "自行车", "书桌", "椅子", "羽绒服", "运动鞋", "网球拍", "演唱会门票", "吉他"]
+MESSAGES = ["你好，请问还在吗？", "可以便宜一点吗？", "还在的", "什么时候方便看货？", "明天下午可以吗",
+            "好的，图书馆门口见", "已经卖掉了，不好意思", "成色怎么样？", "有没有划痕？", "谢谢！"]
+
+POST_TYPES = [models.Post.PostTypeEnum.sell, models.Post.PostTypeEnum.buy, models.Post.PostTypeEnum.free]
+POST_TYPE_WEIGHTS = [80, 12, 8]
+CONDITIONS = list(models.Post.ConditionEnum)
+
+
+class ZipfSampler:
+    """按幂律分布 (第 k 名的权重 ∝ 1/k^alpha) 抽取 ID；名次和 ID 的对应关系是随机打乱的"""
+
+    def __init__(self, rng: random.Random, ids: List[int], alpha: float):
+        self.rng = rng
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.cum_weights = list(itertools.accumulate(1 / (rank ** alpha) for rank in range(1, len(ids) + 1)))
+        self.total = self.cum_weights[-1]
+
+    def sample(self) -> int:
+        index = bisect.bisect_left(self.cum_weights, self.rng.random() * self.total)
+        return self.ids[min(index, len(self.ids) - 1)]
+
+    def sample_many(self, k: int) -> List[int]:
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights, k=k)
+
+
+def next_id(conn, table) -> int:
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def insert_rows(conn, table, rows: Iterable[dict], batch_size: int) -> int:
+    """分批 executemany 插入，每批提交一次"""
+    started = time.perf_counter()
+    count = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        conn.execute(table.insert(), batch)
+        conn.commit()
+        count += len(batch)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {table.name}: {count} 行, {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} 行/秒)")
+    return count
+
+
+def random_time_between(rng: random.Random, start: datetime, end: datetime) -> datetime:
+    seconds = max((end - start).total_seconds(), 0)
+    return start + timedelta(seconds=rng.random() * seconds)
+
+
+def prepare_connection(conn):
+    """批量导入期间关掉逐行的约束检查 / 刷盘，只影响当前连接"""
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        conn.exec_driver_sql("PRAGMA journal_mode = MEMORY")
+    elif conn.dialect.name == "mysql":
+        conn.exec_driver_sql("SET unique_checks = 0, foreign_key_checks = 0")
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=args.days)
+    tables = models.Base.metadata.tables
+
+    models.Base.metadata.create_all(bind=get_engine())
+
+    with get_engine().connect() as conn:
+        prepare_connection(conn)
+
+        # ---------- 分类 ----------
+        category_ids = list(conn.execute(select(models.Category.id)).scalars())
+        if not category_ids:
+            conn.execute(tables["categories"].insert(), [{"name": name} for name in DEFAULT_CATEGORIES])
+            conn.commit()
+            category_ids = list(conn.execute(select(models.Category.id)).scalars())
+
+        first_user = next_id(conn, tables["users"])
+        first_post = next_id(conn, tables["posts"])
+        first_image = next_id(conn, tables["post_images"])
+        first_message = next_id(conn, tables["messages"])
+        first_transaction = next_id(conn, tables["transactions"])
+
+        user_ids = range(first_user, first_user + args.users)
+        post_ids = range(first_post, first_post + args.posts)
+
+        # ---------- 先在内存里规划好所有关系 ----------
+        sellers = ZipfSampler(rng, user_ids, args.seller_alpha)
+        post_owner = sellers.sample_many(args.posts)
+        post_created = sorted(random_time_between(rng, start, now) for _ in post_ids)
+        popularity = ZipfSampler(rng, post_ids, args.popularity_alpha)
+
+        def owner_of(post_id: int) -> int:
+            return post_owner[post_id - first_post]
+
+        def created_of(post_id: int) -> datetime:
+            return post_created[post_id - first_post]
+
+        # 收藏：(user_id, post_id) 不能重复，自己的帖子不收藏
+        favorite_count = [0] * args.posts
+        favorite_keys = set()
+        stride = first_post + args.posts
+        attempts = 0
+        while len(favorite_keys) < args.favorites and attempts < args.favorites * 3:
+            attempts += 1
+            post_id = popularity.sample()
+            user_id = rng.choice(user_ids)
+            key = user_id * stride + post_id
+            if user_id == owner_of(post_id) or key in favorite_keys:
+                continue
+            favorite_keys.add(key)
+            favorite_count[post_id - first_post] += 1
+
+        # 会话：买家就热门帖子和卖家私聊，消息数服从帕累托分布
+        conversations = []  # (post_id, buyer_id, 消息数)
+        planned_messages = 0
+        while planned_messages < args.messages:
+            post_id = popularity.sample()
+            buyer_id = rng.choice(user_ids)
+            if buyer_id == owner_of(post_id):
+                continue
+            n = min(int(rng.paretovariate(1.2)), args.max_messages_per_conversation, args.messages - planned_messages)
+            conversations.append((post_id, buyer_id, n))
+            planned_messages += n
+
+        # 交易：从会话里挑帖子 (每个帖子最多一笔)，大部分已完成
+        transactions = []  # (post_id, buyer_id, seller_confirmed, buyer_confirmed)
+        seen_posts = set()
+        success_trades: Dict[int, int] = {}
+        status = {}
+        for post_id, buyer_id, _ in rng.sample(conversations, len(conversations)):
+            if len(transactions) >= args.transactions:
+                break
+            if post_id in seen_posts:
+                continue
+            seen_posts.add(post_id)
+            completed = rng.random() < 0.7
+            seller_confirmed = completed or rng.random() < 0.5
+            transactions.append((post_id, buyer_id, seller_confirmed, completed))
+            if completed:
+                status[post_id] = models.Post.StatusEnum.sold
+                for user_id in (owner_of(post_id), buyer_id):
+                    success_trades[user_id] = success_trades.get(user_id, 0) + 1
+        for post_id in rng.sample(post_ids, min(len(post_ids), args.posts // 50)):
+            status.setdefault(post_id, models.Post.StatusEnum.hidden)
+
+        # ---------- 批量插入 ----------
+        hashed_password = security.get_password_hash(DEFAULT_PASSWORD)
+        insert_rows(conn, tables["users"], (
+            {
+                "id": user_id,
+                "email": f"synthetic{user_id}{crud.YOUR_SCHOOL_EMAIL_SUFFIX}",
+                "username": f"用户{user_id}",
+                "hashed_password": hashed_password,
+                "success_trades": success_trades.get(user_id, 0),
+                "created_at": random_time_between(rng, start - timedelta(days=180), start),
+            }
+            for user_id in user_ids
+        ), args.batch_size)
+
+        def post_row(post_id: int) -> dict:
+            post_type = rng.choices(POST_TYPES, POST_TYPE_WEIGHTS)[0]
+            price = 0 if post_type == models.Post.PostTypeEnum.free else round(rng.lognormvariate(7.5, 1.0))
+            created_at = created_of(post_id)
+            return {
+                "id": post_id,
+                "title": f"{rng.choice(ITEMS)} {post_id}",
+                "description": "九成新，自提优先，有意私信。" * rng.randint(1, 8),
+                "post_type": post_type,
+                "price": price,
+                "price_min": round(price * 0.7) if post_type == models.Post.PostTypeEnum.buy else None,
+                "condition": rng.choice(CONDITIONS) if post_type != models.Post.PostTypeEnum.buy else None,
+                "status": status.get(post_id, models.Post.StatusEnum.available),
+                "favorite_count": favorite_count[post_id - first_post],
+                "owner_id": owner_of(post_id),
+                "category_id": rng.choice(category_ids),
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+
+        insert_rows(conn, tables["posts"], (post_row(post_id) for post_id in post_ids), args.batch_size)
+
+        def image_rows():
+            image_id = first_image
+            for post_id in post_ids:
+                for j in range(min(int(rng.expovariate(1 / args.images_per_post) + 0.5), 9)):
+                    yield {"id": image_id, "post_id": post_id, "image_url": f"/static/images/synthetic_{post_id}_{j}.jpg"}
+                    image_id += 1
+
+        insert_rows(conn, tables["post_images"], image_rows(), args.batch_size)
+
+        insert_rows(conn, tables["favorites"], (
+            {
+                "user_id": key // stride,
+                "post_id": key % stride,
+                "created_at": random_time_between(rng, created_of(key % stride), now),
+            }
+            for key in favorite_keys
+        ), args.batch_size)
+
+        def message_rows():
+            message_id = first_message
+            for post_id, buyer_id, n in conversations:
+                seller_id = owner_of(post_id)
+                sent_at = random_time_between(rng, created_of(post_id), now)
+                for i in range(n):
+                    sender, receiver = (buyer_id, seller_id) if i % 2 == 0 else (seller_id, buyer_id)
+                    yield {
+                        "id": message_id,
+                        "sender_id": sender,
+                        "receiver_id": receiver,
+                        "post_id": post_id,
+                        "content": rng.choice(MESSAGES),
+                        "is_read": i < n - 1 or rng.random() < 0.5,
+                        "created_at": sent_at,
+                    }
+                    message_id += 1
+                    sent_at += timedelta(minutes=rng.expovariate(1 / 30))
+
+        insert_rows(conn, tables["messages"], message_rows(), args.batch_size)
+
+        insert_rows(conn, tables["transactions"], (
+            {
+                "id": transaction_id,
+                "post_id": post_id,
+                "seller_id": owner_of(post_id),
+                "buyer_id": buyer_id,
+                "seller_confirmed": seller_confirmed,
+                "buyer_confirmed": completed,
+                "completed": completed,
+                "completed_at": random_time_between(rng, created_of(post_id), now) if completed else None,
+            }
+            for transaction_id, (post_id, buyer_id, seller_confirmed, completed)
+            in enumerate(transactions, start=first_transaction)
+        ), args.batch_size)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="生成合成数据 (追加到 DATABASE_URL 指向的数据库)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts", type=int, default=50_000)
+    parser.add_argument("--images-per-post", type=float, default=2.0, help="每个帖子的平均图片数")
+    parser.add_argument("--favorites", type=int, default=150_000)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=365, help="帖子发布时间分布在最近多少天内")
+    parser.add_argument("--seller-alpha", type=float, default=0.8, help="卖家发帖数的幂律指数")
+    parser.add_argument("--popularity-alpha", type=float, default=0.9, help="帖子热度的幂律指数")
+    parser.add_argument("--max-messages-per-conversation", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.users < 2 or args.posts < 1:
+        parser.error("至少需要 2 个用户和 1 个帖子")
+
+    started = time.perf_counter()
+    generate(args)
+    print(f"🎉 完成，总耗时 {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
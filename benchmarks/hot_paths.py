@@ -0,0 +1,291 @@
+"""
+crud 热点路径的微基准测试
+
+在一个用 benchmarks.dataset 生成的临时 SQLite 数据库上，反复调用：
+- crud.get_posts (类型 / 关键词 / 分类筛选 × 排序方式的所有组合)
+- crud.get_user_inbox / get_conversation_messages / get_user_favorites
+- crud.confirm_transaction (第一方确认、第二方确认并完成交易)
+- main.get_current_user (每个受保护接口都会调用)
+
+每个用例报告 p50 / p95 / p99 延迟和 SQL 条数，并和保存的基线比较：
+- SQL 条数比基线多 (比如引入了 N+1) —— 失败
+- p50 比基线慢超过 --tolerance (默认 30%) —— 失败
+有失败时退出码为 1，可以直接放进 CI。
+
+延迟和机器有关，换了机器需要重新生成基线；SQL 条数与机器无关。
+
+用法 (在项目根目录下运行):
+    python -m benchmarks.hot_paths                   # 和基线比较
+    python -m benchmarks.hot_paths --save-baseline   # 用本次结果覆盖基线
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 一定要在导入 backend 之前指向临时数据库，绝不能碰 .env 里配置的真实数据库
+_tmpdir = tempfile.TemporaryDirectory(prefix="hot_paths_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir.name}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import func, select
+
+from backend import crud, instrumentation, models, security
+from backend.database import SessionLocal, get_engine
+from backend.main import get_current_user
+from benchmarks import dataset
+from benchmarks.calibration import CALIBRATION_KEY, calibrate, speed_factor
+
+BASELINE_PATH = Path(__file__).with_name("hot_paths_baseline.json")
+
+# 种子数据规模 (改了的话需要重新生成基线)
+DATASET_ARGS = [
+    "--users", "2000", "--posts", "20000", "--favorites", "60000",
+    "--messages", "40000", "--transactions", "2000", "--seed", "7",
+]
+
+
+class Case:
+    """
+    一个基准用例
+    setup(db) 在计时之外执行，返回值作为参数传给 run(db, arg)
+    """
+
+    def __init__(self, name: str, run: Callable, setup: Optional[Callable] = None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(case: Case, iterations: int, warmup: int) -> dict:
+    """每次调用都用新的 Session (和请求里的 get_db 一样)，只对 run 计时"""
+    durations = []
+    queries = 0
+    for i in range(warmup + iterations):
+        db = SessionLocal()
+        try:
+            arg = case.setup(db) if case.setup else None
+            with instrumentation.track() as stats:
+                started = time.perf_counter()
+                case.run(db, arg)
+                elapsed = time.perf_counter() - started
+        finally:
+            db.close()
+        if i >= warmup:
+            durations.append(elapsed * 1000)
+            queries = max(queries, stats.query_count)
+
+    durations.sort()
+    return {
+        "p50_ms": round(percentile(durations, 50), 3),
+        "p95_ms": round(percentile(durations, 95), 3),
+        "p99_ms": round(percentile(durations, 99), 3),
+        "mean_ms": round(statistics.fmean(durations), 3),
+        "queries": queries,
+    }
+
+
+def build_cases(db) -> List[Case]:
+    """根据种子数据挑出 "最重" 的用户和会话，组装所有用例"""
+    category_id = db.scalar(select(models.Category.id).order_by(models.Category.id))
+
+    # 收件箱消息最多的用户、消息最多的会话、收藏最多的用户
+    busiest_receiver = db.execute(
+        select(models.Message.receiver_id).group_by(models.Message.receiver_id)
+        .order_by(func.count().desc()).limit(1)
+    ).scalar()
+    post_id, sender_id, receiver_id = db.execute(
+        select(models.Message.post_id, models.Message.sender_id, models.Message.receiver_id)
+        .group_by(models.Message.post_id, models.Message.sender_id, models.Message.receiver_id)
+        .order_by(func.count().desc()).limit(1)
+    ).one()
+    top_favoriter = db.execute(
+        select(models.Favorite.user_id).group_by(models.Favorite.user_id)
+        .order_by(func.count().desc()).limit(1)
+    ).scalar()
+    second_page_cursor = crud.get_user_favorites(db, top_favoriter)[2]
+    user_email = db.scalar(select(models.User.email).where(models.User.id == busiest_receiver))
+    token = security.create_access_token(data={"sub": user_email})
+
+    cases = []
+
+    # get_posts：筛选条件 × 排序方式的所有组合
+    post_types = [None, models.Post.PostTypeEnum.sell]
+    keywords = [None, "教材"]
+    categories = [None, category_id]
+    sorts = ["latest", "price_asc", "price_desc", "popular"]
+    for post_type, keyword, category, sort_by in itertools.product(post_types, keywords, categories, sorts):
+        label = ",".join(
+            part for part in (
+                post_type and f"type={post_type.value}",
+                keyword and "keyword",
+                category and "category",
+                f"sort={sort_by}",
+            ) if part
+        )
+        cases.append(Case(
+            f"get_posts[{label}]",
+            lambda db, _, t=post_type, k=keyword, c=category, s=sort_by: crud.get_posts(
+                db, post_type=t, keyword=k, category_id=c, sort_by=s, limit=20
+            ),
+        ))
+
+    cases += [
+        Case("get_user_inbox", lambda db, _: crud.get_user_inbox(db, busiest_receiver)),
+        Case("get_user_inbox[summary]", lambda db, _: crud.get_user_inbox(db, busiest_receiver, summary=True)),
+        Case(
+            "get_conversation_messages",
+            lambda db, _: crud.get_conversation_messages(db, post_id, sender_id, receiver_id),
+        ),
+        Case("get_user_favorites[page1]", lambda db, _: crud.get_user_favorites(db, top_favoriter)),
+        Case(
+            "get_user_favorites[page2]",
+            lambda db, _: crud.get_user_favorites(db, top_favoriter, cursor=second_page_cursor),
+        ),
+        Case("get_current_user", lambda db, _: get_current_user(token, db)),
+        Case(
+            "confirm_transaction[first]",
+            lambda db, tx: commit(db, crud.confirm_transaction(db, tx, tx.seller_id)),
+            setup=lambda db: new_pending_transaction(db),
+        ),
+        Case(
+            "confirm_transaction[complete]",
+            lambda db, tx: commit(db, crud.confirm_transaction(db, tx, tx.buyer_id)),
+            setup=lambda db: seller_confirmed_transaction(db),
+        ),
+    ]
+    return cases
+
+
+def commit(db, result):
+    """写操作和接口里一样，在最后 commit 一次 (计入耗时和 SQL 条数)"""
+    db.commit()
+    return result
+
+
+_available_posts = None
+
+
+def new_pending_transaction(db) -> models.Transaction:
+    """取一个还没有交易的帖子，建一笔双方都未确认的交易"""
+    global _available_posts
+    if _available_posts is None:
+        _available_posts = iter(db.execute(
+            select(models.Post.id, models.Post.owner_id)
+            .outerjoin(models.Transaction, models.Transaction.post_id == models.Post.id)
+            .where(models.Transaction.id.is_(None))
+        ).all())
+    post_id, owner_id = next(_available_posts)
+    buyer_id = db.scalar(select(models.User.id).where(models.User.id != owner_id).limit(1))
+    return commit(db, crud.create_transaction(db, post_id=post_id, seller_id=owner_id, buyer_id=buyer_id))
+
+
+def seller_confirmed_transaction(db) -> models.Transaction:
+    """卖家已经确认、等买家确认的交易"""
+    transaction = new_pending_transaction(db)
+    return commit(db, crud.confirm_transaction(db, transaction, transaction.seller_id))
+
+
+# =======================================================================
+# 基线比较
+# =======================================================================
+
+def too_slow(result: dict, expected: dict, tolerance: float) -> bool:
+    # 加 0.1ms 的绝对余量，避免亚毫秒级的用例因为抖动误报
+    return result["p50_ms"] > expected["p50_ms"] * (1 + tolerance) + 0.1
+
+
+def regressions(name: str, result: dict, expected: dict, tolerance: float) -> List[str]:
+    """返回这个用例的所有回归描述 (空列表表示通过)"""
+    failures = []
+    if result["queries"] > expected["queries"]:
+        failures.append(f"{name}: SQL {expected['queries']} -> {result['queries']} 条")
+    if too_slow(result, expected, tolerance):
+        failures.append(f"{name}: p50 {expected['p50_ms']:.3f} -> {result['p50_ms']:.3f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="crud 热点路径微基准测试")
+    parser.add_argument("--iterations", type=int, default=50, help="每个用例计时的次数")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.3, help="允许 p50 比基线慢的比例")
+    parser.add_argument("--retries", type=int, default=2, help="延迟超出基线时重测的次数 (取最好的一次)")
+    parser.add_argument("--filter", default="", help="只运行名字包含该字符串的用例")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线文件")
+    args = parser.parse_args()
+
+    calibration_ms = calibrate()
+
+    print("⏳ 生成种子数据 ...")
+    dataset.generate(dataset.build_parser().parse_args(DATASET_ARGS))
+    instrumentation.install(get_engine())
+
+    db = SessionLocal()
+    try:
+        cases = [case for case in build_cases(db) if args.filter in case.name]
+    finally:
+        db.close()
+
+    results = {}
+    print(f"\n{'用例':<56}{'p50':>9}{'p95':>9}{'p99':>9}{'SQL':>5}  (ms)")
+    for case in cases:
+        results[case.name] = result = measure(case, args.iterations, args.warmup)
+        print(f"{case.name:<56}{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}"
+              f"{result['p99_ms']:>9.3f}{result['queries']:>5}")
+
+    if args.save_baseline:
+        baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8")) if BASELINE_PATH.exists() else {}
+        baseline.update(results)
+        baseline[CALIBRATION_KEY] = calibration_ms
+        BASELINE_PATH.write_text(
+            json.dumps(baseline, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+        )
+        print(f"\n✅ 基线已写入 {BASELINE_PATH}")
+        return
+
+    if not BASELINE_PATH.exists():
+        print("\nℹ️ 还没有基线，用 --save-baseline 生成")
+        return
+
+    baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    # 按校准负载的耗时比例缩放基线延迟
+    factor = speed_factor(baseline, calibration_ms)
+    print(f"\n校准负载 {calibration_ms:.1f}ms，基线延迟按 x{factor:.2f} 比较")
+
+    failures = []
+    for case in cases:
+        result, expected = results[case.name], baseline.get(case.name)
+        if expected is None:
+            continue
+        expected = {**expected, "p50_ms": expected["p50_ms"] * factor}
+        # 延迟受机器负载影响很大，超出时先重测几次，排除偶然的抖动
+        for _ in range(args.retries):
+            if not too_slow(result, expected, args.tolerance):
+                break
+            retry = measure(case, args.iterations, args.warmup)
+            if retry["p50_ms"] < result["p50_ms"]:
+                result = retry
+        failures += regressions(case.name, result, expected, args.tolerance)
+
+    if failures:
+        print("\n❌ 性能回归:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\n✅ 没有超过基线的回归")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+端到端 HTTP 压测：用脚本化的 "用户旅程" 驱动真实的 FastAPI 应用
+
+每个虚拟用户循环执行按权重随机挑选的旅程：
+- browse:   浏览首页、翻页、看分类、看帖子详情
+- search:   按关键词 / 分类 / 排序搜索
+- favorite: 收藏、查看我的收藏、取消收藏
+- message:  给卖家发私信、查看会话和收件箱
+- trade:    卖家发帖 -> 买家私信 -> 卖家创建交易 -> 双方确认
+- register: 新用户注册、登录、发帖
+
+并发按阶段逐步增加 (--stages 1:15,5:15,20:30 表示 1 个用户跑 15 秒，再 5 个跑 15 秒 ...)，
+每个阶段报告吞吐量、延迟和错误率，最后按接口汇总。
+
+默认在进程内通过 ASGI 直接调用 backend.main.app (不需要网络，也不需要启动服务)，
+数据库用 benchmarks.dataset 生成的合成数据；也可以用 --url 压测一个已经启动的服务。
+登录用的是合成数据里的用户 (密码都是 dataset.DEFAULT_PASSWORD)，用户和帖子通过 API 发现。
+
+用法 (在项目根目录下运行):
+    python -m benchmarks.dataset                        # 先生成 synthetic.db
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --stages 10:60 --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# 进程内模式默认使用合成数据库
+os.environ.setdefault("DATABASE_URL", "sqlite:///./synthetic.db")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+# 进程内模式下所有虚拟用户的 IP 都一样，会被登录 / 发消息限流挡住
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+from backend.crud import YOUR_SCHOOL_EMAIL_SUFFIX
+from benchmarks.dataset import DEFAULT_PASSWORD, ITEMS
+
+# 旅程权重 (大部分用户只是浏览和搜索)
+JOURNEY_WEIGHTS = {
+    "browse": 40,
+    "search": 25,
+    "favorite": 15,
+    "message": 12,
+    "trade": 5,
+    "register": 3,
+}
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []  # 毫秒
+        self.errors = 0
+        self.statuses: Counter = Counter()
+
+
+class Recorder:
+    """按接口 (方法 + 路径模板) 记录延迟、状态码和错误"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = {}
+
+    def record(self, label: str, status: Optional[int], latency_ms: float):
+        stats = self.endpoints.setdefault(label, EndpointStats())
+        stats.latencies.append(latency_ms)
+        stats.statuses[status or "exception"] += 1
+        if status is None or status >= 400:
+            stats.errors += 1
+
+    def totals(self) -> Tuple[int, int, List[float]]:
+        latencies = [value for stats in self.endpoints.values() for value in stats.latencies]
+        errors = sum(stats.errors for stats in self.endpoints.values())
+        return len(latencies), errors, latencies
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))]
+
+
+class Catalog:
+    """压测开始前通过 API 发现的数据：帖子、卖家、分类"""
+
+    def __init__(self):
+        self.posts: List[dict] = []       # {"id", "owner_id", "owner_email"}
+        self.users: List[Tuple[int, str]] = []  # (user_id, email)，都是合成数据的用户
+        self.category_ids: List[int] = []
+
+    async def discover(self, client: httpx.AsyncClient, pages: int = 20):
+        response = await client.get("/api/categories")
+        response.raise_for_status()
+        self.category_ids = [category["id"] for category in response.json()]
+
+        users = {}
+        for page in range(pages):
+            response = await client.get("/api/posts", params={"skip": page * 50, "limit": 50})
+            response.raise_for_status()
+            for post in response.json()["posts"]:
+                owner = post["owner"]
+                if not owner["email"].startswith("synthetic"):
+                    continue
+                self.posts.append({"id": post["id"], "owner_id": owner["id"], "owner_email": owner["email"]})
+                users[owner["id"]] = owner["email"]
+        self.users = list(users.items())
+
+        if len(self.users) < 2 or not self.category_ids:
+            raise SystemExit("数据库里没有合成数据，请先运行 python -m benchmarks.dataset")
+
+
+class VirtualUser:
+    """一个虚拟用户：共享的 token 缓存模拟 "已经登录过的用户"，避免每次旅程都做 bcrypt"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        recorder: Recorder,
+        catalog: Catalog,
+        tokens: Dict[str, str],
+        rng: random.Random,
+        think_time: float,
+    ):
+        self.client = client
+        self.recorder = recorder
+        self.catalog = catalog
+        self.tokens = tokens
+        self.rng = rng
+        self.think_time = think_time
+
+    async def request(self, label: str, method: str, url: str, token: Optional[str] = None, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(label, None, (time.perf_counter() - started) * 1000)
+            return None
+        self.recorder.record(label, response.status_code, (time.perf_counter() - started) * 1000)
+        return response
+
+    async def think(self):
+        if self.think_time:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+
+    async def login(self, email: str, password: str = DEFAULT_PASSWORD) -> Optional[str]:
+        token = self.tokens.get(email)
+        if token is None:
+            response = await self.request(
+                "POST /api/token", "POST", "/api/token", data={"username": email, "password": password}
+            )
+            if response is None or response.status_code != 200:
+                return None
+            token = self.tokens[email] = response.json()["access_token"]
+        return token
+
+    def random_user(self, exclude: int = None) -> Tuple[int, str]:
+        while True:
+            user_id, email = self.rng.choice(self.catalog.users)
+            if user_id != exclude:
+                return user_id, email
+
+    # ------------------------------------------------------------------
+    # 旅程
+    # ------------------------------------------------------------------
+
+    async def browse(self):
+        await self.request("GET /api/posts", "GET", "/api/posts", params={"fields": "summary"})
+        await self.think()
+        await self.request("GET /api/categories", "GET", "/api/categories")
+        await self.request(
+            "GET /api/posts", "GET", "/api/posts",
+            params={"fields": "summary", "skip": 10 * self.rng.randint(1, 5)},
+        )
+        for _ in range(self.rng.randint(1, 3)):
+            await self.think()
+            post = self.rng.choice(self.catalog.posts)
+            await self.request("GET /api/posts/{post_id}", "GET", f"/api/posts/{post['id']}")
+
+    async def search(self):
+        params = {"fields": "summary", "keyword": self.rng.choice(ITEMS)}
+        if self.rng.random() < 0.5:
+            params["category_id"] = self.rng.choice(self.catalog.category_ids)
+        if self.rng.random() < 0.5:
+            params["sort_by"] = self.rng.choice(["price_asc", "price_desc", "popular"])
+        await self.request("GET /api/posts?keyword", "GET", "/api/posts", params=params)
+        await self.think()
+        post = self.rng.choice(self.catalog.posts)
+        await self.request("GET /api/posts/{post_id}", "GET", f"/api/posts/{post['id']}")
+
+    async def favorite(self):
+        user_id, email = self.random_user()
+        token = await self.login(email)
+        if token is None:
+            return
+        post = self.rng.choice(self.catalog.posts)
+        await self.request("POST /api/posts/{post_id}/favorite", "POST", f"/api/posts/{post['id']}/favorite", token)
+        await self.think()
+        await self.request("GET /api/users/me/favorites", "GET", "/api/users/me/favorites", token,
+                           params={"fields": "summary"})
+        if self.rng.random() < 0.3:
+            await self.request(
+                "DELETE /api/posts/{post_id}/favorite", "DELETE", f"/api/posts/{post['id']}/favorite", token
+            )
+
+    async def message(self):
+        post = self.rng.choice(self.catalog.posts)
+        user_id, email = self.random_user(exclude=post["owner_id"])
+        token = await self.login(email)
+        if token is None:
+            return
+        await self.request("POST /api/messages", "POST", "/api/messages", token, json={
+            "content": "你好，请问还在吗？", "post_id": post["id"], "receiver_id": post["owner_id"],
+        })
+        await self.think()
+        await self.request("GET /api/conversations", "GET", "/api/conversations", token,
+                           params={"post_id": post["id"], "other_user_id": post["owner_id"]})
+        await self.request("GET /api/users/me/inbox", "GET", "/api/users/me/inbox", token,
+                           params={"fields": "summary"})
+
+    async def create_post(self, token: str) -> Optional[int]:
+        response = await self.request("POST /api/posts", "POST", "/api/posts", token, json={
+            "title": f"{self.rng.choice(ITEMS)} (压测)",
+            "description": "压测生成的帖子",
+            "price": self.rng.randint(100, 5000),
+            "category_id": self.rng.choice(self.catalog.category_ids),
+            "post_type": "sell",
+            "condition": "good",
+        })
+        if response is None or response.status_code != 201:
+            return None
+        return response.json()["id"]
+
+    async def trade(self):
+        seller_id, seller_email = self.random_user()
+        buyer_id, buyer_email = self.random_user(exclude=seller_id)
+        seller_token = await self.login(seller_email)
+        buyer_token = await self.login(buyer_email)
+        if seller_token is None or buyer_token is None:
+            return
+
+        post_id = await self.create_post(seller_token)
+        if post_id is None:
+            return
+        await self.think()
+        await self.request("POST /api/messages", "POST", "/api/messages", buyer_token, json={
+            "content": "我想要这个", "post_id": post_id, "receiver_id": seller_id,
+        })
+        await self.request("GET /api/posts/{post_id}/contacted-users", "GET",
+                           f"/api/posts/{post_id}/contacted-users", seller_token)
+        response = await self.request("POST /api/transactions", "POST", "/api/transactions", seller_token,
+                                      json={"post_id": post_id, "buyer_id": buyer_id})
+        if response is None or response.status_code != 201:
+            return
+        transaction_id = response.json()["id"]
+        await self.think()
+        for token in (seller_token, buyer_token):
+            await self.request("PATCH /api/transactions/{transaction_id}/confirm", "PATCH",
+                               f"/api/transactions/{transaction_id}/confirm", token)
+
+    async def register(self):
+        email = f"load{uuid.uuid4().hex[:12]}{YOUR_SCHOOL_EMAIL_SUFFIX}"
+        response = await self.request("POST /api/users/register", "POST", "/api/users/register", json={
+            "email": email, "username": "压测用户", "password": DEFAULT_PASSWORD,
+        })
+        if response is None or response.status_code != 201:
+            return
+        token = await self.login(email)
+        if token is None:
+            return
+        await self.request("GET /api/users/me", "GET", "/api/users/me", token)
+        await self.create_post(token)
+
+    async def run_until(self, deadline: float):
+        journeys = list(JOURNEY_WEIGHTS)
+        weights = list(JOURNEY_WEIGHTS.values())
+        while time.perf_counter() < deadline:
+            journey = self.rng.choices(journeys, weights)[0]
+            await getattr(self, journey)()
+            await self.think()
+
+
+def parse_stages(value: str) -> List[Tuple[int, float]]:
+    """"1:15,5:15,20:30" -> [(1, 15.0), (5, 15.0), (20, 30.0)]"""
+    stages = []
+    for item in value.split(","):
+        concurrency, _, duration = item.partition(":")
+        stages.append((int(concurrency), float(duration)))
+    return stages
+
+
+def print_summary(title: str, recorder: Recorder, elapsed: float):
+    count, errors, latencies = recorder.totals()
+    print(
+        f"{title:<24}{count:>8}{count / elapsed:>9.1f}{errors / max(count, 1) * 100:>8.2f}%"
+        f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}"
+    )
+
+
+def print_endpoints(recorder: Recorder, elapsed: float):
+    print(f"\n{'接口':<54}{'请求数':>8}{'req/s':>9}{'错误率':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for label, stats in sorted(recorder.endpoints.items()):
+        count = len(stats.latencies)
+        print(
+            f"{label:<54}{count:>8}{count / elapsed:>9.1f}{stats.errors / count * 100:>8.2f}%"
+            f"{percentile(stats.latencies, 50):>9.1f}{percentile(stats.latencies, 95):>9.1f}"
+            f"{percentile(stats.latencies, 99):>9.1f}"
+        )
+        failed = {status: n for status, n in stats.statuses.items() if status == "exception" or status >= 400}
+        if failed:
+            print(f"{'':<4}失败: {failed}")
+
+
+async def run(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        from backend.main import app
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=args.timeout
+        )
+
+    async with client:
+        catalog = Catalog()
+        await catalog.discover(client)
+        print(f"发现 {len(catalog.posts)} 个帖子、{len(catalog.users)} 个用户、{len(catalog.category_ids)} 个分类")
+
+        rng = random.Random(args.seed)
+        tokens: Dict[str, str] = {}
+        overall = Recorder()
+        total_elapsed = 0.0
+
+        print(f"\n{'阶段':<24}{'请求数':>8}{'req/s':>9}{'错误率':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+        for concurrency, duration in parse_stages(args.stages):
+            recorder = Recorder()
+            users = [
+                VirtualUser(client, recorder, catalog, tokens, random.Random(rng.random()), args.think_time)
+                for _ in range(concurrency)
+            ]
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(*(user.run_until(deadline) for user in users))
+            elapsed = time.perf_counter() - started
+            total_elapsed += elapsed
+
+            print_summary(f"{concurrency} 并发 / {duration:g}s", recorder, elapsed)
+            for label, stats in recorder.endpoints.items():
+                merged = overall.endpoints.setdefault(label, EndpointStats())
+                merged.latencies += stats.latencies
+                merged.errors += stats.errors
+                merged.statuses.update(stats.statuses)
+
+        print_endpoints(overall, total_elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端 HTTP 压测")
+    parser.add_argument("--url", help="压测已经启动的服务 (不填则在进程内调用 backend.main.app)")
+    parser.add_argument("--stages", default="1:15,5:15,20:30", help="并发:秒数，逗号分隔，逐个阶段执行")
+    parser.add_argument("--think-time", type=float, default=0.05, help="两步之间的平均停顿 (秒)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+新帖提醒的匹配基准测试：一个新帖子和大量保存的搜索匹配要多久
+
+随机生成保存的搜索 (关键词 / 分类 / 类型 / 价格范围的组合) 和新帖子，
+用 backend/saved_searches.py 的倒排索引匹配，并抽查结果和逐个比较的结果一致。
+不访问数据库。
+
+用法 (在项目根目录下运行):
+    python -m benchmarks.saved_search_matching
+    python -m benchmarks.saved_search_matching --searches 100000 --posts 1000 --max-ms 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# 只用到内存里的索引，不需要真实的 .env
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from backend.saved_searches import SavedSearchIndex, SearchConditions
+
+WORDS = [
+    "教科书", "微积分", "线性代数", "英语", "日语", "词典", "笔记", "考研", "托福", "雅思",
+    "自行车", "电动车", "头盔", "台灯", "书桌", "椅子", "衣柜", "床垫", "被子", "窗帘",
+    "手机", "耳机", "平板", "笔记本电脑", "显示器", "键盘", "鼠标", "充电器", "相机", "音箱",
+    "iphone", "ipad", "macbook", "switch", "kindle", "airpods", "nike", "uniqlo", "muji", "ikea",
+    "电饭煲", "微波炉", "冰箱", "洗衣机", "吹风机", "水壶", "锅", "餐具", "收纳箱", "衣架",
+    "吉他", "篮球", "羽毛球拍", "瑜伽垫", "滑板", "帐篷", "行李箱", "背包", "雨伞", "外套",
+]
+N_CATEGORIES = 12
+POST_TYPES = ("sell", "buy", "free")
+
+
+def random_price(rng: random.Random) -> float:
+    return float(rng.choice((0, rng.randint(100, 100000))))
+
+
+def random_search(rng: random.Random, search_id: int, n_users: int) -> SearchConditions:
+    """大部分带关键词，其余只按分类 / 价格 / 类型筛选"""
+    keyword = rng.choice(WORDS) if rng.random() < 0.8 else None
+    category_id = rng.randint(1, N_CATEGORIES) if rng.random() < 0.5 else None
+    post_type = rng.choice(POST_TYPES) if rng.random() < 0.3 else None
+    max_price = float(rng.randint(500, 50000)) if rng.random() < 0.4 else None
+    min_price = float(rng.randint(0, 500)) if rng.random() < 0.1 else None
+    if not any((keyword, category_id, post_type, max_price, min_price)):
+        category_id = rng.randint(1, N_CATEGORIES)
+    return SearchConditions(
+        search_id, rng.randint(1, n_users), keyword, category_id, post_type, min_price, max_price
+    )
+
+
+def random_post(rng: random.Random, owner_id: int):
+    title = " ".join(rng.sample(WORDS, 2)) + f" {rng.randint(1, 99)}成新"
+    description = "，".join(rng.sample(WORDS, 4)) + "，欢迎私信。" * rng.randint(1, 5)
+    return owner_id, title, description, rng.randint(1, N_CATEGORIES), rng.choice(POST_TYPES), random_price(rng)
+
+
+def brute_force(searches, owner_id, title, description, category_id, post_type, price):
+    """逐个比较 (用来检查索引的结果)：每个用户只取 ID 最小的一个"""
+    text = f"{title}\n{description}".lower()
+    matched = {}
+    for search in searches:
+        if search.user_id != owner_id and search.matches(text, category_id, post_type, price):
+            matched.setdefault(search.user_id, search.id)
+    return set(matched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="新帖提醒匹配基准测试")
+    parser.add_argument("--searches", type=int, default=100000, help="保存的搜索数")
+    parser.add_argument("--users", type=int, default=20000, help="用户数")
+    parser.add_argument("--posts", type=int, default=1000, help="匹配的新帖子数")
+    parser.add_argument("--check", type=int, default=20, help="和逐个比较的结果核对的帖子数")
+    parser.add_argument("--max-ms", type=float, default=None, help="p99 超过这个值时以状态码 1 退出")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    searches = [random_search(rng, i + 1, args.users) for i in range(args.searches)]
+    index = SavedSearchIndex()
+    started = time.perf_counter()
+    for search in searches:
+        index.add(search)
+    print(f"建立索引: {len(index)} 个保存的搜索，用时 {time.perf_counter() - started:.2f}s")
+
+    posts = [random_post(rng, rng.randint(1, args.users)) for _ in range(args.posts)]
+    timings, matched = [], 0
+    for post in posts:
+        started = time.perf_counter()
+        result = index.match(*post)
+        timings.append((time.perf_counter() - started) * 1000)
+        matched += len(result)
+
+    by_id = {search.id: search for search in searches}
+    for post in posts[:args.check]:
+        users = {by_id[search_id].user_id for search_id in index.match(*post)}
+        if users != brute_force(searches, *post):
+            print("❌ 匹配结果和逐个比较的不一致")
+            sys.exit(1)
+
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"匹配 {args.posts} 个新帖子: 中位数 {statistics.median(timings):.2f}ms, "
+          f"p99 {p99:.2f}ms, 平均每个帖子提醒 {matched / args.posts:.1f} 个用户")
+    if args.max_ms is not None and p99 > args.max_ms:
+        print(f"❌ p99 超过 {args.max_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
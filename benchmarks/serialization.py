@@ -0,0 +1,120 @@
+"""
+序列化基准测试：Pydantic (schemas + json) vs 快速序列化 (serializers + orjson)
+
+只测量把已经加载好的 ORM 对象变成响应 body 的 CPU 时间，不包含数据库查询。
+
+用法 (在项目根目录下运行):
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --posts 50 --rounds 500
+"""
+import argparse
+import json
+import os
+import time
+from typing import List
+
+# 基准测试使用内存数据库，不需要真实的 .env
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from pydantic import TypeAdapter
+
+from backend import crud, models, schemas, serializers
+from backend.database import SessionLocal, get_engine
+
+
+def seed(db, n_posts: int):
+    """造一批帖子 (每个帖子 3 张图) 和一个有 n_posts 个会话的收件箱"""
+    category = models.Category(name="教科书")
+    me = models.User(email="me@example.com", username="me", hashed_password="x")
+    db.add_all([category, me])
+    db.flush()
+
+    for i in range(n_posts):
+        seller = models.User(
+            email=f"seller{i}@example.com", username=f"seller{i}", hashed_password="x"
+        )
+        db.add(seller)
+        db.flush()
+
+        post = models.Post(
+            title=f"二手教科书 {i}",
+            description="九成新，有少量笔记。" * 10,
+            post_type=models.Post.PostTypeEnum.sell,
+            price=1500 + i,
+            condition=models.Post.ConditionEnum.good,
+            owner_id=seller.id,
+            category_id=category.id,
+        )
+        db.add(post)
+        db.flush()
+
+        db.add_all([
+            models.PostImage(post_id=post.id, image_url=f"/static/images/{post.id}_{j}.jpg")
+            for j in range(3)
+        ])
+        db.add(models.Message(
+            content="你好，请问还在吗？", post_id=post.id, sender_id=me.id, receiver_id=seller.id
+        ))
+
+    db.commit()
+    return me.id
+
+
+def pydantic_body(response_type, content) -> bytes:
+    """模拟 FastAPI 的默认路径：response_model 校验 -> 转成 JSON 兼容对象 -> json.dumps"""
+    adapter = TypeAdapter(response_type)
+    validated = adapter.validate_python(content, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode("utf-8")
+
+
+def cpu_per_call_ms(func, rounds: int) -> float:
+    """单次调用平均消耗的 CPU 时间 (毫秒)"""
+    func()  # 预热
+    start = time.process_time()
+    for _ in range(rounds):
+        func()
+    return (time.process_time() - start) * 1000 / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应序列化基准测试")
+    parser.add_argument("--posts", type=int, default=20, help="每个响应包含的帖子/会话数")
+    parser.add_argument("--rounds", type=int, default=200, help="每种情况重复的次数")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=get_engine())
+    db = SessionLocal()
+    user_id = seed(db, args.posts)
+
+    # 预先把数据和关系都加载好，下面只测序列化
+    posts, total = crud.get_posts(db, limit=args.posts)
+    inbox = crud.get_user_inbox(db, user_id=user_id)
+    for post in posts:
+        _ = (post.owner, post.category, post.images)
+
+    cases = [
+        (
+            "GET /api/posts",
+            lambda: pydantic_body(schemas.PostsResponse, {"posts": posts, "total": total}),
+            lambda: serializers.posts_response(posts, total).body,
+        ),
+        (
+            "GET /api/users/me/inbox",
+            lambda: pydantic_body(List[schemas.InboxConversation], inbox),
+            lambda: serializers.inbox_response(inbox).body,
+        ),
+    ]
+
+    print(f"每个响应 {args.posts} 条，重复 {args.rounds} 次 (单位: CPU 毫秒/请求)")
+    print(f"{'接口':<28}{'Pydantic':>10}{'快速路径':>10}{'加速':>8}")
+    for name, slow, fast in cases:
+        slow_ms = cpu_per_call_ms(slow, args.rounds)
+        fast_ms = cpu_per_call_ms(fast, args.rounds)
+        print(f"{name:<28}{slow_ms:>10.3f}{fast_ms:>10.3f}{slow_ms / fast_ms:>7.1f}x")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
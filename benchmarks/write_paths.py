@@ -0,0 +1,166 @@
+"""
+写接口的数据库往返次数
+
+在临时 SQLite 数据库上，通过 TestClient 把每个写接口按真实的使用顺序调用一遍
+(注册 -> 改资料 -> 发帖 -> 传图 -> 收藏 -> 私信 -> 举报 -> 交易 -> 确认 -> 删帖)，
+统计每个请求执行的 SQL 语句数和 COMMIT 数，两者之和就是和数据库之间的往返次数
+(包括 get_current_user 查当前用户的那一次)。
+
+往返次数与机器无关；延迟受网络影响很大的生产数据库上，它基本决定了写接口的耗时。
+
+用法 (在项目根目录下运行):
+    python -m benchmarks.write_paths
+"""
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# 一定要在导入 backend 之前指向临时数据库，绝不能碰 .env 里配置的真实数据库
+_tmpdir = tempfile.TemporaryDirectory(prefix="write_paths_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir.name}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+# 启动时在后台线程里建相似帖子索引的那次查询会混进第一个请求的统计 (索引的增量更新不访问数据库)
+os.environ.setdefault("SIMILAR_POSTS_ENABLED", "false")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend import crud, models
+from backend.crud import YOUR_SCHOOL_EMAIL_SUFFIX
+from backend.database import SessionLocal, get_engine
+from backend.main import app
+
+PASSWORD = "password123"
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+class RoundTrips:
+    """按引擎事件统计 SQL 语句数和 COMMIT 数"""
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+    def install(self, engine):
+        event.listen(engine, "before_cursor_execute", self._on_statement)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_statement(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = self.commits = 0
+
+
+class Flow:
+    """按顺序调用写接口，记录每个请求的往返次数"""
+
+    def __init__(self, client: TestClient, counter: RoundTrips):
+        self.client = client
+        self.counter = counter
+        self.rows: List[Tuple[str, int, int]] = []
+
+    def call(self, label: str, method: str, url: str, token: str = None, **kwargs) -> dict:
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.counter.reset()
+        response = self.client.request(method, url, headers=headers, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{label} 失败: {response.status_code} {response.text}")
+        self.rows.append((label, self.counter.statements, self.counter.commits))
+        return response.json() if response.content else {}
+
+    def register(self, name: str) -> Tuple[dict, str]:
+        user = self.call("POST /api/users/register", "POST", "/api/users/register", json={
+            "email": f"{name}-{uuid.uuid4().hex[:8]}{YOUR_SCHOOL_EMAIL_SUFFIX}",
+            "username": name,
+            "password": PASSWORD,
+        })
+        response = self.client.post("/api/token", data={"username": user["email"], "password": PASSWORD})
+        return user, response.json()["access_token"]
+
+    def create_post(self, token: str, category_id: int) -> dict:
+        return self.call("POST /api/posts", "POST", "/api/posts", token, json={
+            "title": "线性代数教材", "description": "九成新，有少量笔记",
+            "price": 30, "category_id": category_id, "post_type": "sell", "condition": "good",
+        })
+
+
+def run(client: TestClient, counter: RoundTrips, category_id: int) -> List[Tuple[str, int, int]]:
+    flow = Flow(client, counter)
+    seller, seller_token = flow.register("seller")
+    buyer, buyer_token = flow.register("buyer")
+
+    flow.call("PATCH /api/users/me", "PATCH", "/api/users/me", seller_token, json={"username": "卖家"})
+    flow.call("POST /api/users/me/avatar", "POST", "/api/users/me/avatar", seller_token,
+              files={"file": ("avatar.png", PNG, "image/png")})
+
+    post = flow.create_post(seller_token, category_id)
+    post_id = post["id"]
+    flow.call("POST /api/posts/{id}/images", "POST", f"/api/posts/{post_id}/images", seller_token,
+              files={"file": ("photo.png", PNG, "image/png")})
+    flow.call("PATCH /api/posts/{id}", "PATCH", f"/api/posts/{post_id}", seller_token, json={"price": 25})
+
+    flow.call("POST /api/posts/{id}/favorite", "POST", f"/api/posts/{post_id}/favorite", buyer_token)
+    flow.call("DELETE /api/posts/{id}/favorite", "DELETE", f"/api/posts/{post_id}/favorite", buyer_token)
+
+    flow.call("POST /api/messages", "POST", "/api/messages", buyer_token, json={
+        "content": "请问还在吗？", "post_id": post_id, "receiver_id": seller["id"],
+    })
+    flow.call("PATCH /api/conversations/mark-read", "PATCH", "/api/conversations/mark-read", seller_token,
+              params={"post_id": post_id, "other_user_id": buyer["id"]})
+    flow.call("POST /api/reports", "POST", "/api/reports", seller_token, json={
+        "reported_user_id": buyer["id"], "reason": "测试举报",
+    })
+
+    transaction = flow.call("POST /api/transactions", "POST", "/api/transactions", seller_token, json={
+        "post_id": post_id, "buyer_id": buyer["id"],
+    })
+    confirm_url = f"/api/transactions/{transaction['id']}/confirm"
+    flow.call("PATCH /api/transactions/{id}/confirm", "PATCH", confirm_url, seller_token)
+    flow.call("PATCH /api/transactions/{id}/confirm (完成)", "PATCH", confirm_url, buyer_token)
+
+    other_post = flow.create_post(seller_token, category_id)
+    flow.rows.pop()  # 第二次发帖只是为了测删除
+    flow.call("DELETE /api/posts/{id}", "DELETE", f"/api/posts/{other_post['id']}", seller_token)
+    return flow.rows
+
+
+def main():
+    engine = get_engine()
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        category_id = crud.create_category(db, "教科书").id
+        db.commit()
+    finally:
+        db.close()
+
+    counter = RoundTrips()
+    counter.install(engine)
+
+    # 上传接口把文件写到 backend/static/ 下 (相对当前目录)，切到临时目录里，不弄脏仓库
+    static_dir = Path(_tmpdir.name) / "backend" / "static"
+    for sub in ("images", "avatars"):
+        (static_dir / sub).mkdir(parents=True)
+    os.chdir(_tmpdir.name)
+
+    with TestClient(app) as client:
+        rows = run(client, counter, category_id)
+
+    totals: Dict[str, int] = {"statements": 0, "commits": 0}
+    print(f"{'接口':<48}{'SQL':>6}{'COMMIT':>8}{'往返':>6}")
+    for label, statements, commits in rows:
+        totals["statements"] += statements
+        totals["commits"] += commits
+        print(f"{label:<48}{statements:>6}{commits:>8}{statements + commits:>6}")
+    print(f"{'合计':<48}{totals['statements']:>6}{totals['commits']:>8}"
+          f"{totals['statements'] + totals['commits']:>6}")
+
+
+if __name__ == "__main__":
+    main()
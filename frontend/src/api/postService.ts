@@ -5,7 +5,10 @@ import type {
   CreatePostData, 
   UpdatePostData, 
   GetPostsParams,
-  PostsResponse 
+  PostsResponse,
+  PostSummary,
+  PostSummariesResponse,
+  FavoritesResponse
 } from '../types/post.types';
 import { cache, CacheKeys } from '../utils/cache';
 
@@ -39,6 +42,51 @@ const postService = {
     return response.data;
   },
 
+  /**
+   * 获取精简帖子列表（带缓存，用于首页卡片）
+   * 请求时带 fields=summary，只返回卡片需要的字段，响应体更小
+   * @param params - 查询参数（同 getPosts）
+   * @returns Promise<PostSummariesResponse> - 返回精简帖子列表和总数
+   */
+  getPostSummaries: async (params?: GetPostsParams): Promise<PostSummariesResponse> => {
+    const cacheKey = `${CacheKeys.posts(params || {})}_summary`;
+    
+    const cachedData = cache.get<PostSummariesResponse>(cacheKey);
+    if (cachedData) {
+      console.log('📦 从缓存加载帖子列表:', cacheKey);
+      return cachedData;
+    }
+
+    console.log('🌐 从服务器加载帖子列表:', cacheKey);
+    const response = await apiService.get<PostSummariesResponse>('/api/posts', {
+      params: { ...params, fields: 'summary' },
+    });
+    
+    // 存入缓存（3 分钟过期）
+    cache.set(cacheKey, response.data, 3 * 60 * 1000);
+    
+    return response.data;
+  },
+
+  /**
+   * 获取当前用户的个性化首页（按收藏/私信过的分类和价格区间排序，需要登录）
+   * 结果已经在服务器端按用户缓存，这里不再缓存
+   * @param params - 查询参数（post_type, category_id, skip, limit；不支持关键词和排序）
+   * @returns Promise<PostSummariesResponse> - 返回精简帖子列表和总数
+   */
+  getFeed: async (params?: GetPostsParams): Promise<PostSummariesResponse> => {
+    const response = await apiService.get<PostSummariesResponse>('/api/users/me/feed', {
+      params: {
+        post_type: params?.post_type,
+        category_id: params?.category_id,
+        skip: params?.skip,
+        limit: params?.limit,
+        fields: 'summary',
+      },
+    });
+    return response.data;
+  },
+
   /**
    * 获取单个帖子详情（带缓存）
    * @param postId - 帖子 ID
@@ -64,6 +112,30 @@ const postService = {
     return response.data;
   },
 
+  /**
+   * 获取相似帖子（带缓存，用于详情页的“相似商品”）
+   * @param postId - 帖子 ID
+   * @param limit - 最多返回几个
+   * @returns Promise<PostSummary[]> - 按相似度从高到低的在售帖子
+   */
+  getSimilarPosts: async (postId: number, limit: number = 6): Promise<PostSummary[]> => {
+    const cacheKey = CacheKeys.similarPosts(postId);
+    
+    const cachedData = cache.get<PostSummary[]>(cacheKey);
+    if (cachedData) {
+      return cachedData;
+    }
+
+    const response = await apiService.get<PostSummary[]>(`/api/posts/${postId}/similar`, {
+      params: { limit },
+    });
+    
+    // 存入缓存（5 分钟过期）
+    cache.set(cacheKey, response.data, 5 * 60 * 1000);
+    
+    return response.data;
+  },
+
   /**
    * 创建新帖子（清除相关缓存）
    * @param data - 帖子数据
@@ -192,24 +264,31 @@ const postService = {
   },
 
   /**
-   * 获取我的收藏列表（带缓存）
-   * @returns Promise<Post[]>
+   * 获取我的收藏列表（第一页带缓存）
+   * @param cursor - 上一页返回的 next_cursor，不传表示第一页
+   * @returns Promise<FavoritesResponse> - 返回收藏帖子、总数和下一页游标
    */
-  getMyFavorites: async (): Promise<Post[]> => {
+  getMyFavorites: async (cursor?: string): Promise<FavoritesResponse> => {
     const cacheKey = CacheKeys.favorites();
     
-    // 尝试从缓存获取
-    const cachedData = cache.get<Post[]>(cacheKey);
-    if (cachedData) {
-      console.log('📦 从缓存加载收藏列表');
-      return cachedData;
+    // 只缓存第一页
+    if (!cursor) {
+      const cachedData = cache.get<FavoritesResponse>(cacheKey);
+      if (cachedData) {
+        console.log('📦 从缓存加载收藏列表');
+        return cachedData;
+      }
     }
 
     console.log('🌐 从服务器加载收藏列表');
-    const response = await apiService.get<Post[]>('/api/users/me/favorites');
+    const response = await apiService.get<FavoritesResponse>('/api/users/me/favorites', {
+      params: cursor ? { cursor } : undefined,
+    });
     
     // 存入缓存（2 分钟过期）
-    cache.set(cacheKey, response.data, 2 * 60 * 1000);
+    if (!cursor) {
+      cache.set(cacheKey, response.data, 2 * 60 * 1000);
+    }
     
     return response.data;
   },
@@ -0,0 +1,50 @@
+import apiService from './apiService';
+import type {
+  CreateSavedSearchData,
+  SavedSearch,
+  NotificationsResponse,
+} from '../types/savedSearch.types';
+
+const savedSearchService = {
+  /**
+   * 保存搜索（有符合条件的新帖子时提醒）
+   */
+  createSavedSearch: async (data: CreateSavedSearchData): Promise<SavedSearch> => {
+    const response = await apiService.post<SavedSearch>('/api/saved-searches', data);
+    return response.data;
+  },
+
+  /**
+   * 获取我保存的搜索
+   */
+  getSavedSearches: async (): Promise<SavedSearch[]> => {
+    const response = await apiService.get<SavedSearch[]>('/api/saved-searches');
+    return response.data;
+  },
+
+  /**
+   * 删除保存的搜索
+   */
+  deleteSavedSearch: async (savedSearchId: number): Promise<void> => {
+    await apiService.delete(`/api/saved-searches/${savedSearchId}`);
+  },
+
+  /**
+   * 获取新帖提醒
+   */
+  getNotifications: async (unreadOnly: boolean = false): Promise<NotificationsResponse> => {
+    const response = await apiService.get<NotificationsResponse>('/api/users/me/notifications', {
+      params: { unread_only: unreadOnly },
+    });
+    return response.data;
+  },
+
+  /**
+   * 把新帖提醒全部标记为已读
+   */
+  markNotificationsRead: async (): Promise<void> => {
+    await apiService.patch('/api/users/me/notifications/mark-read');
+  },
+};
+
+export default savedSearchService;
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Card, Tag, Avatar, Typography, Skeleton } from 'antd';
 import { UserOutlined } from '@ant-design/icons';
 import { useNavigate } from 'react-router-dom';
-import type { Post } from '../../types/post.types';
+import type { PostSummary } from '../../types/post.types';
 import { API_BASE_URL } from '../../api/apiService';
 import './PostCard.css';
 
@@ -10,7 +10,7 @@ const { Meta } = Card;
 const { Text } = Typography;
 
 interface PostCardProps {
-  post: Post;
+  post: PostSummary;  // 完整的 Post 也可以直接传入
 }
 
 /**
@@ -10,14 +10,19 @@ import './FavoritesPage.css';
 const FavoritesPage: React.FC = () => {
   const navigate = useNavigate();
   const [favorites, setFavorites] = useState<Post[]>([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  // 获取收藏列表
+  // 获取收藏列表（第一页）
   const fetchFavorites = async () => {
     setLoading(true);
     try {
       const data = await postService.getMyFavorites();
-      setFavorites(data);
+      setFavorites(data.posts);
+      setTotal(data.total);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       message.error('获取收藏列表失败');
       console.error('Failed to fetch favorites:', error);
@@ -26,6 +31,23 @@ const FavoritesPage: React.FC = () => {
     }
   };
 
+  // 加载下一页
+  const loadMoreFavorites = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await postService.getMyFavorites(nextCursor);
+      setFavorites((prev) => [...prev, ...data.posts]);
+      setTotal(data.total);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      message.error('加载更多收藏失败');
+      console.error('Failed to load more favorites:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchFavorites();
   }, []);
@@ -53,7 +75,7 @@ const FavoritesPage: React.FC = () => {
         <h1>
           <HeartOutlined /> 我的收藏
         </h1>
-        <p className="favorites-count">共 {favorites.length} 个收藏</p>
+        <p className="favorites-count">共 {total} 个收藏</p>
       </div>
 
       {favorites.length === 0 ? (
@@ -74,11 +96,20 @@ const FavoritesPage: React.FC = () => {
           </Empty>
         </div>
       ) : (
-        <div className="favorites-grid">
-          {favorites.map((post) => (
-            <PostCard key={post.id} post={post} />
-          ))}
-        </div>
+        <>
+          <div className="favorites-grid">
+            {favorites.map((post) => (
+              <PostCard key={post.id} post={post} />
+            ))}
+          </div>
+          {nextCursor && (
+            <div style={{ textAlign: 'center', marginTop: 24 }}>
+              <Button onClick={loadMoreFavorites} loading={loadingMore}>
+                加载更多
+              </Button>
+            </div>
+          )}
+        </>
       )}
     </div>
   );
@@ -1,17 +1,23 @@
 import React, { useState, useEffect } from 'react';
 import { Row, Col, Empty, App, Tabs, Pagination, Input, Select, Space } from 'antd';
-import { ShoppingOutlined, ShopOutlined, GiftOutlined, AppstoreOutlined, SearchOutlined } from '@ant-design/icons';
+import { ShoppingOutlined, ShopOutlined, GiftOutlined, AppstoreOutlined, SearchOutlined, BellOutlined } from '@ant-design/icons';
 import PostCard, { PostCardSkeleton } from '../components/PostCard';
 import postService from '../api/postService';
-import type { Post, PostType, Category } from '../types/post.types';
+import savedSearchService from '../api/savedSearchService';
+import { useAuth } from '../hooks/useAuth';
+import type { PostSummary, PostType, Category, GetPostsParams } from '../types/post.types';
 import './HomePage.css';
 
 const { Search } = Input;
 
+// recommended：登录用户的个性化首页（/api/users/me/feed）
+type SortBy = NonNullable<GetPostsParams['sort_by']> | 'recommended';
+
 const HomePage: React.FC = () => {
   const app = App.useApp();
+  const { user } = useAuth();
   
-  const [posts, setPosts] = useState<Post[]>([]);
+  const [posts, setPosts] = useState<PostSummary[]>([]);
   const [loading, setLoading] = useState<boolean>(true);
   const [activeTab, setActiveTab] = useState<string>('all');
   const [currentPage, setCurrentPage] = useState<number>(1);
@@ -21,22 +27,31 @@ const HomePage: React.FC = () => {
   // 搜索相关状态
   const [keyword, setKeyword] = useState<string>('');
   const [categoryId, setCategoryId] = useState<number | undefined>(undefined);
-  const [sortBy, setSortBy] = useState<'latest' | 'price_asc' | 'price_desc'>('latest');
+  const [sortBy, setSortBy] = useState<SortBy>('latest');
   const [categories, setCategories] = useState<Category[]>([]);
   const [isInitialLoad, setIsInitialLoad] = useState<boolean>(true); // 标记首次加载
 
+  // 个性化首页不支持关键词搜索，有关键词时按最新发布搜索
+  const loadPostSummaries = (params: GetPostsParams) => {
+    if (sortBy === 'recommended') {
+      return user && !params.keyword
+        ? postService.getFeed(params)
+        : postService.getPostSummaries(params);
+    }
+    return postService.getPostSummaries({ ...params, sort_by: sortBy });
+  };
+
   // 获取帖子列表
   const fetchPosts = async (postType?: PostType, page: number = 1) => {
     setLoading(true);
     try {
       const skip = (page - 1) * pageSize; // 计算跳过的数据量
-      const response = await postService.getPosts({
+      const response = await loadPostSummaries({
         post_type: postType,
         skip: skip,
         limit: pageSize,
         keyword: keyword || undefined,
         category_id: categoryId,
-        sort_by: sortBy,
       });
       
       // 使用后端返回的真实数据
@@ -59,13 +74,12 @@ const HomePage: React.FC = () => {
         const skip = (currentPage - 1) * pageSize;
         const [categoriesData, postsData] = await Promise.all([
           postService.getCategories(),
-          postService.getPosts({
+          loadPostSummaries({
             post_type: undefined,
             skip: skip,
             limit: pageSize,
             keyword: keyword || undefined,
             category_id: categoryId,
-            sort_by: sortBy,
           })
         ]);
         
@@ -105,7 +119,7 @@ const HomePage: React.FC = () => {
   };
 
   // 处理排序变化
-  const handleSortChange = (value: 'latest' | 'price_asc' | 'price_desc') => {
+  const handleSortChange = (value: SortBy) => {
     setSortBy(value);
     setCurrentPage(1);
   };
@@ -118,6 +132,20 @@ const HomePage: React.FC = () => {
     setCurrentPage(1);
   };
 
+  // 订阅当前的搜索条件：之后有符合条件的新帖子时收到提醒
+  const handleSaveSearch = async () => {
+    try {
+      await savedSearchService.createSavedSearch({
+        keyword: keyword || undefined,
+        category_id: categoryId,
+        post_type: activeTab === 'all' ? undefined : (activeTab as PostType),
+      });
+      app.message.success('已订阅，有符合条件的新帖子时会提醒你');
+    } catch (error: any) {
+      app.message.error(error.response?.data?.detail || '订阅失败，请稍后再试');
+    }
+  };
+
   // 处理标签页切换
   const handleTabChange = (key: string) => {
     setActiveTab(key);
@@ -265,11 +293,20 @@ const HomePage: React.FC = () => {
               value={sortBy}
               onChange={handleSortChange}
             >
+              {user && <Select.Option value="recommended">为你推荐</Select.Option>}
               <Select.Option value="latest">最新发布</Select.Option>
               <Select.Option value="price_asc">价格从低到高</Select.Option>
               <Select.Option value="price_desc">价格从高到低</Select.Option>
+              <Select.Option value="popular">最多收藏</Select.Option>
+              <Select.Option value="trending">近期热门</Select.Option>
             </Select>
 
+            {user && (keyword || categoryId) && (
+              <a onClick={handleSaveSearch} style={{ marginLeft: 8 }}>
+                <BellOutlined /> 订阅此搜索
+              </a>
+            )}
+
             {(keyword || categoryId || sortBy !== 'latest') && (
               <a onClick={handleClearFilters} style={{ marginLeft: 8 }}>
                 清空筛选
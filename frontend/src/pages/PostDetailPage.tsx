@@ -15,6 +15,8 @@ import {
   Select,
   Input,
   Skeleton,
+  Row,
+  Col,
 } from 'antd';
 import type { MenuProps } from 'antd';
 import { 
@@ -33,7 +35,8 @@ import { useAuth } from '../hooks/useAuth';
 import postService from '../api/postService';
 import reportService from '../api/reportService';
 import transactionService from '../api/transactionService';
-import type { Post } from '../types/post.types';
+import PostCard from '../components/PostCard';
+import type { Post, PostSummary } from '../types/post.types';
 import type { User } from '../types/user.types';
 import { API_BASE_URL } from '../api/apiService';
 import './PostDetailPage.css';
@@ -58,6 +61,9 @@ const PostDetailPage: React.FC = () => {
   const [selectedBuyer, setSelectedBuyer] = useState<number | null>(null);
   const [creatingTransaction, setCreatingTransaction] = useState<boolean>(false);
 
+  // 相似商品
+  const [similarPosts, setSimilarPosts] = useState<PostSummary[]>([]);
+
   // 获取帖子详情
   useEffect(() => {
     const fetchPostDetail = async () => {
@@ -92,6 +98,15 @@ const PostDetailPage: React.FC = () => {
     fetchPostDetail();
   }, [id, user]);
 
+  // 获取相似商品（失败时不显示这一栏，不影响详情页）
+  useEffect(() => {
+    if (!id) return;
+    setSimilarPosts([]);
+    postService.getSimilarPosts(Number(id))
+      .then(setSimilarPosts)
+      .catch((error) => console.error('获取相似商品失败:', error));
+  }, [id]);
+
   // 返回首页
   const handleBack = () => {
     navigate('/');
@@ -593,6 +608,20 @@ const PostDetailPage: React.FC = () => {
         </div>
       </div>
 
+      {/* 相似商品 */}
+      {similarPosts.length > 0 && (
+        <div className="similar-posts">
+          <h3 className="similar-posts-title">相似商品</h3>
+          <Row gutter={[16, 16]}>
+            {similarPosts.map((similarPost) => (
+              <Col key={similarPost.id} xs={12} sm={12} md={8} lg={6} xl={4}>
+                <PostCard post={similarPost} />
+              </Col>
+            ))}
+          </Row>
+        </div>
+      )}
+
       {/* 举报对话框 */}
       <Modal
         title="举报帖子"
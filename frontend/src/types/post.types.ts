@@ -1,4 +1,4 @@
-import type { User } from './user.types';
+import type { User, UserSummary } from './user.types';
 
 /**
  * 帖子类型枚举
@@ -53,6 +53,7 @@ export interface Post {
   post_type: PostType;
   condition: Condition | null;
   status: Status;
+  favorite_count: number;
   category_id: number;
   created_at: string;
   updated_at: string;
@@ -61,6 +62,26 @@ export interface Post {
   images: PostImage[];
 }
 
+/**
+ * 精简帖子接口（列表卡片用，请求时传 fields=summary）
+ * 不含 description，卖家不含邮箱，images 只包含第一张图
+ */
+export interface PostSummary {
+  id: number;
+  title: string;
+  price: number;
+  price_min: number | null;
+  post_type: PostType;
+  condition: Condition | null;
+  status: Status;
+  favorite_count: number;
+  category_id: number;
+  created_at: string;
+  owner: UserSummary;
+  category: Category;
+  images: PostImage[];
+}
+
 /**
  * 创建帖子的请求数据
  */
@@ -94,7 +115,7 @@ export interface GetPostsParams {
   limit?: number;
   keyword?: string;        // 搜索关键词
   category_id?: number;    // 分类筛选
-  sort_by?: 'latest' | 'price_asc' | 'price_desc';  // 排序方式
+  sort_by?: 'latest' | 'price_asc' | 'price_desc' | 'popular' | 'trending';  // 排序方式
 }
 
 /**
@@ -104,3 +125,20 @@ export interface PostsResponse {
   posts: Post[];
   total: number;
 }
+
+/**
+ * 获取精简帖子列表的响应数据（fields=summary）
+ */
+export interface PostSummariesResponse {
+  posts: PostSummary[];
+  total: number;
+}
+
+/**
+ * 获取收藏列表的响应数据（游标分页）
+ */
+export interface FavoritesResponse {
+  posts: Post[];
+  total: number;
+  next_cursor: string | null;  // 下一页游标，没有下一页时为 null
+}
@@ -0,0 +1,33 @@
+// 保存的搜索 / 新帖提醒相关类型定义
+import type { PostSummary, PostType } from './post.types';
+
+export interface CreateSavedSearchData {
+  keyword?: string;
+  category_id?: number;
+  post_type?: PostType;
+  min_price?: number;
+  max_price?: number;
+}
+
+export interface SavedSearch {
+  id: number;
+  keyword: string | null;
+  category_id: number | null;
+  post_type: PostType | null;
+  min_price: number | null;
+  max_price: number | null;
+  created_at: string;
+}
+
+export interface Notification {
+  id: number;
+  saved_search_id: number | null;
+  is_read: boolean;
+  created_at: string;
+  post: PostSummary;
+}
+
+export interface NotificationsResponse {
+  notifications: Notification[];
+  unread_count: number;
+}
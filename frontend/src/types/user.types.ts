@@ -7,6 +7,16 @@ export interface User {
   created_at: string;      
 }
 
+/**
+ * 帖子卡片上展示的卖家信息（不含邮箱）
+ */
+export interface UserSummary {
+  id: number;
+  username: string;
+  avatar_url: string | null;
+  success_trades: number;
+}
+
 /**
  * 更新用户信息的请求数据
  */
@@ -115,6 +115,9 @@ export const CacheKeys = {
   // 帖子详情缓存键
   postDetail: (postId: number) => `post_detail_${postId}`,
 
+  // 相似帖子缓存键 (以 posts 开头：发帖 / 改帖 / 删帖时和列表缓存一起清除)
+  similarPosts: (postId: number) => `posts_similar_${postId}`,
+
   // 分类列表缓存键
   categories: () => 'categories',
 
@@ -0,0 +1,96 @@
+"""
+测试用的临时数据库和 TestClient
+
+用法 (在项目根目录下运行):
+    python -m pytest tests
+"""
+import os
+import tempfile
+import uuid
+from typing import Tuple
+
+# 一定要在导入 backend 之前指向临时数据库，绝不能碰 .env 里配置的真实数据库
+_tmpdir = tempfile.TemporaryDirectory(prefix="campus_trade_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir.name}/test.db"
+os.environ.setdefault("SECRET_KEY", "test")
+# 启动时在后台线程里建相似帖子索引，测试用不到
+os.environ.setdefault("SIMILAR_POSTS_ENABLED", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import crud, models
+from backend.crud import YOUR_SCHOOL_EMAIL_SUFFIX
+from backend.database import SessionLocal, get_engine
+
+PASSWORD = "password123"
+
+models.Base.metadata.create_all(bind=get_engine())
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def category_id() -> int:
+    session = SessionLocal()
+    try:
+        category = crud.create_category(session, "教科书")
+        session.commit()
+        return category.id
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def make_user(db, name: str = "user") -> models.User:
+    """直接在数据库里建用户 (不经过注册接口，不需要 token 的测试用)"""
+    user = models.User(
+        email=f"{name}-{uuid.uuid4().hex[:8]}{YOUR_SCHOOL_EMAIL_SUFFIX}",
+        username=name,
+        hashed_password="x",
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def make_post(db, owner_id: int, category_id: int, title: str = "线性代数教材") -> models.Post:
+    post = models.Post(
+        title=title,
+        description="九成新，有少量笔记",
+        post_type=models.Post.PostTypeEnum.sell,
+        price=30,
+        condition=models.Post.ConditionEnum.good,
+        owner_id=owner_id,
+        category_id=category_id,
+    )
+    db.add(post)
+    db.commit()
+    return post
+
+
+def register(client: TestClient, name: str = "user") -> Tuple[dict, str]:
+    """通过接口注册并登录，返回 (用户, access token)"""
+    response = client.post("/api/users/register", json={
+        "email": f"{name}-{uuid.uuid4().hex[:8]}{YOUR_SCHOOL_EMAIL_SUFFIX}",
+        "username": name,
+        "password": PASSWORD,
+    })
+    assert response.status_code == 201, response.text
+    user = response.json()
+    response = client.post("/api/token", data={"username": user["email"], "password": PASSWORD})
+    return user, response.json()["access_token"]
@@ -0,0 +1,51 @@
+"""分类缓存：别的进程新增分类后不用重启 worker"""
+import uuid
+
+from backend import category_cache, crud
+from backend.config import settings
+
+from conftest import register
+
+
+def add_category(db, name: str) -> int:
+    """模拟 python -m backend.manage add-category (另一个进程直接写数据库)"""
+    category = crud.create_category(db, f"{name}-{uuid.uuid4().hex[:6]}")
+    db.commit()
+    return category.id
+
+
+def test_new_category_usable_for_posts_immediately(client, db):
+    client.get("/api/categories")  # 确保当前快照已经加载
+    category_id = add_category(db, "乐器")
+    assert category_id not in category_cache.get(db).names
+
+    _, token = register(client, "seller")
+    response = client.post("/api/posts", headers={"Authorization": f"Bearer {token}"}, json={
+        "title": "二手吉他", "description": "送琴包", "price": 300,
+        "category_id": category_id, "post_type": "sell",
+    })
+    assert response.status_code == 201, response.text
+    assert category_id in category_cache.get(db).names
+
+
+def test_unknown_category_still_rejected(client, db):
+    _, token = register(client, "seller")
+    response = client.post("/api/posts", headers={"Authorization": f"Bearer {token}"}, json={
+        "title": "二手吉他", "description": "送琴包", "price": 300,
+        "category_id": 999999, "post_type": "sell",
+    })
+    assert response.status_code == 400
+
+
+def test_categories_list_refreshes_after_check_interval(client, db, monkeypatch):
+    first = client.get("/api/categories")
+    category_id = add_category(db, "运动")
+
+    # 还没到核对时间：仍然是旧快照
+    monkeypatch.setattr(settings, "CATEGORY_CACHE_CHECK_SECONDS", 3600)
+    assert client.get("/api/categories").headers["ETag"] == first.headers["ETag"]
+
+    monkeypatch.setattr(settings, "CATEGORY_CACHE_CHECK_SECONDS", 0)
+    response = client.get("/api/categories")
+    assert response.headers["ETag"] != first.headers["ETag"]
+    assert category_id in {category["id"] for category in response.json()}
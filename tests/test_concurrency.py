@@ -0,0 +1,135 @@
+"""
+并发写：多个请求同时到达时，条件写入 / 原子计数只生效一次
+
+每个线程用自己的 Session (和一个请求一样)，用 Barrier 让它们尽量同时开始。
+SQLite 的写操作是串行的，这里验证的是语句本身的条件 (ON CONFLICT DO NOTHING、
+WHERE ... = 0、SET x = x + 1) 保证了结果，而不是靠 Python 里的先查再写。
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import crud, models
+from backend.database import SessionLocal
+
+from conftest import make_post, make_user
+
+N_THREADS = 8
+
+
+def run_concurrently(func, args_list):
+    """每组参数一个线程同时执行 func(db, *args)，各自 commit，返回结果列表"""
+    barrier = threading.Barrier(len(args_list))
+
+    def worker(args):
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            try:
+                result = func(db, *args)
+                db.commit()
+                return result
+            except ValueError as e:
+                db.rollback()
+                return e
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=len(args_list)) as pool:
+        return list(pool.map(worker, args_list))
+
+
+def favorite_count(db, post_id):
+    db.expire_all()
+    return db.get(models.Post, post_id).favorite_count
+
+
+def test_parallel_favorites_of_same_post_insert_one_row(db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    post = make_post(db, seller.id, category_id)
+
+    results = run_concurrently(
+        lambda session: crud.favorite_post(session, user_id=fan.id, post_id=post.id),
+        [()] * N_THREADS,
+    )
+
+    assert results.count(True) == 1
+    assert db.query(models.Favorite).filter_by(user_id=fan.id, post_id=post.id).count() == 1
+    assert favorite_count(db, post.id) == 1
+
+
+def test_parallel_favorites_by_different_users_all_counted(db, category_id):
+    seller = make_user(db, "seller")
+    post = make_post(db, seller.id, category_id)
+    fans = [make_user(db, f"fan{i}") for i in range(N_THREADS)]
+
+    results = run_concurrently(
+        lambda session, user_id: crud.favorite_post(session, user_id=user_id, post_id=post.id),
+        [(fan.id,) for fan in fans],
+    )
+
+    assert all(results)
+    assert favorite_count(db, post.id) == N_THREADS
+
+
+def test_parallel_unfavorites_decrement_once(db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    post = make_post(db, seller.id, category_id)
+    crud.favorite_post(db, user_id=fan.id, post_id=post.id)
+    db.commit()
+
+    results = run_concurrently(
+        lambda session: crud.unfavorite_post(session, user_id=fan.id, post_id=post.id),
+        [()] * N_THREADS,
+    )
+
+    assert results.count(True) == 1
+    assert favorite_count(db, post.id) == 0
+
+
+def confirm(db, transaction_id, user_id):
+    transaction = crud.get_transaction_by_id(db, transaction_id)
+    return crud.confirm_transaction(db, transaction, user_id=user_id).id
+
+
+def success_trades(db, user_id):
+    db.expire_all()
+    return db.get(models.User, user_id).success_trades
+
+
+def new_transaction(db, seller, buyer, category_id):
+    post = make_post(db, seller.id, category_id)
+    transaction = crud.create_transaction(db, post_id=post.id, seller_id=seller.id, buyer_id=buyer.id)
+    db.commit()
+    return transaction.id
+
+
+def test_simultaneous_buyer_and_seller_confirm_complete_once(db, category_id):
+    seller, buyer = make_user(db, "seller"), make_user(db, "buyer")
+    rounds = 10
+    for _ in range(rounds):
+        transaction_id = new_transaction(db, seller, buyer, category_id)
+        results = run_concurrently(confirm, [(transaction_id, seller.id), (transaction_id, buyer.id)])
+        assert results == [transaction_id, transaction_id]
+
+        db.expire_all()
+        transaction = db.get(models.Transaction, transaction_id)
+        assert transaction.completed
+        assert transaction.seller_confirmed and transaction.buyer_confirmed
+
+    assert success_trades(db, seller.id) == rounds
+    assert success_trades(db, buyer.id) == rounds
+
+
+def test_repeated_confirm_by_same_user_succeeds_once(db, category_id):
+    seller, buyer = make_user(db, "seller"), make_user(db, "buyer")
+    transaction_id = new_transaction(db, seller, buyer, category_id)
+
+    results = run_concurrently(confirm, [(transaction_id, seller.id)] * N_THREADS)
+    assert results.count(transaction_id) == 1
+    assert all(isinstance(result, ValueError) for result in results if result != transaction_id)
+
+    # 买家也连点几次：交易只完成一次，双方各 +1
+    results = run_concurrently(confirm, [(transaction_id, buyer.id)] * N_THREADS)
+    assert results.count(transaction_id) == 1
+    assert success_trades(db, seller.id) == 1
+    assert success_trades(db, buyer.id) == 1
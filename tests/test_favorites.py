@@ -0,0 +1,152 @@
+"""我的收藏：游标分页"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import crud, models
+
+from conftest import make_post, make_user
+
+
+def favorite_all(db, user_id, posts):
+    for post in posts:
+        assert crud.favorite_post(db, user_id=user_id, post_id=post.id)
+    db.commit()
+
+
+def test_pages_cover_all_favorites_in_order(db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    posts = [make_post(db, seller.id, category_id) for _ in range(5)]
+    favorite_all(db, fan.id, posts)  # 同一秒内收藏，按帖子 ID 倒序
+
+    seen, cursor = [], None
+    while True:
+        page, total, cursor = crud.get_user_favorites(db, user_id=fan.id, cursor=cursor, limit=2)
+        seen.extend(post.id for post in page)
+        assert total == 5
+        if cursor is None:
+            break
+    assert seen == [post.id for post in reversed(posts)]
+
+
+def test_pages_ordered_by_favorite_time(db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    posts = [make_post(db, seller.id, category_id) for _ in range(4)]
+    favorite_all(db, fan.id, posts)
+    # 收藏时间和帖子 ID 的顺序相反
+    start = datetime(2024, 4, 1, 12, 0, 0)
+    for i, post in enumerate(posts):
+        db.query(models.Favorite).filter(
+            models.Favorite.user_id == fan.id, models.Favorite.post_id == post.id
+        ).update({"created_at": start - timedelta(seconds=i)})
+    db.commit()
+
+    first, _, cursor = crud.get_user_favorites(db, user_id=fan.id, limit=3)
+    rest, _, cursor = crud.get_user_favorites(db, user_id=fan.id, cursor=cursor, limit=3)
+    assert [post.id for post in first + rest] == [post.id for post in posts]
+    assert cursor is None
+
+
+def test_cursor_survives_unfavorite_of_cursor_post(db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    posts = [make_post(db, seller.id, category_id) for _ in range(5)]
+    favorite_all(db, fan.id, posts)
+
+    page, total, cursor = crud.get_user_favorites(db, user_id=fan.id, limit=2)
+    assert [post.id for post in page] == [posts[4].id, posts[3].id]
+
+    # 翻下一页之前取消收藏游标指向的帖子
+    assert crud.unfavorite_post(db, user_id=fan.id, post_id=posts[3].id)
+    db.commit()
+
+    page, total, cursor = crud.get_user_favorites(db, user_id=fan.id, cursor=cursor, limit=2)
+    assert [post.id for post in page] == [posts[2].id, posts[1].id]
+    assert total == 4
+    page, _, cursor = crud.get_user_favorites(db, user_id=fan.id, cursor=cursor, limit=2)
+    assert [post.id for post in page] == [posts[0].id]
+    assert cursor is None
+
+
+def test_cursor_survives_deleted_post(db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    posts = [make_post(db, seller.id, category_id) for _ in range(3)]
+    favorite_all(db, fan.id, posts)
+
+    page, _, cursor = crud.get_user_favorites(db, user_id=fan.id, limit=1)
+    db.query(models.Favorite).filter(models.Favorite.post_id == page[0].id).delete()
+    db.query(models.Post).filter(models.Post.id == page[0].id).delete()
+    db.commit()
+
+    page, total, _ = crud.get_user_favorites(db, user_id=fan.id, cursor=cursor, limit=5)
+    assert [post.id for post in page] == [posts[1].id, posts[0].id]
+    assert total == 2
+
+
+@pytest.mark.parametrize("cursor", ["12", "not base64!", "WzEsIDJd", "WyJ4IiwgMV0="])
+def test_invalid_cursor(db, cursor):
+    with pytest.raises(ValueError):
+        crud.get_user_favorites(db, user_id=1, cursor=cursor)
+
+
+def test_favorite_count_changes_keep_updated_at(db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    post = make_post(db, seller.id, category_id)
+    # updated_at 是帖子的最后修改时间 (ETag、相似帖子增量同步都靠它)，收藏不算修改帖子
+    old = datetime(2024, 1, 1, 8, 0, 0)
+    db.query(models.Post).filter(models.Post.id == post.id).update({"updated_at": old})
+    db.commit()
+
+    def updated_at():
+        db.expire_all()
+        return db.query(models.Post.updated_at).filter(models.Post.id == post.id).scalar()
+
+    assert crud.favorite_post(db, user_id=fan.id, post_id=post.id)
+    db.commit()
+    assert updated_at() == old
+
+    db.query(models.Post).filter(models.Post.id == post.id).update(
+        {"favorite_count": 5, "updated_at": old}
+    )
+    db.commit()
+    assert crud.reconcile_favorite_counts(db) >= 1
+    db.commit()
+    assert updated_at() == old
+
+    assert crud.unfavorite_post(db, user_id=fan.id, post_id=post.id)
+    db.commit()
+    assert updated_at() == old
+    assert db.query(models.Post.favorite_count).filter(models.Post.id == post.id).scalar() == 0
+
+
+def test_favorite_changes_posts_list_etag(client, db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    posts = [make_post(db, seller.id, category_id, title="收藏排序测试") for _ in range(2)]
+    params = {"keyword": "收藏排序测试", "sort_by": "popular"}
+
+    def fetch(etag=None):
+        headers = {"If-None-Match": etag} if etag else {}
+        return client.get("/api/posts", params=params, headers=headers)
+
+    def ranking(response):
+        return [(post["id"], post["favorite_count"]) for post in response.json()["posts"]]
+
+    response = fetch()
+    etag = response.headers["ETag"]
+    assert sorted(ranking(response)) == [(posts[0].id, 0), (posts[1].id, 0)]
+    assert fetch(etag).status_code == 304
+
+    # 收藏不改 updated_at，但列表的排序和收藏数变了，ETag 必须跟着变
+    assert crud.favorite_post(db, user_id=fan.id, post_id=posts[0].id)
+    db.commit()
+    response = fetch(etag)
+    assert response.status_code == 200
+    assert ranking(response) == [(posts[0].id, 1), (posts[1].id, 0)]
+
+    # 一个帖子 +1、另一个 -1，收藏数之和不变，ETag 也要变
+    etag = response.headers["ETag"]
+    assert crud.unfavorite_post(db, user_id=fan.id, post_id=posts[0].id)
+    assert crud.favorite_post(db, user_id=fan.id, post_id=posts[1].id)
+    db.commit()
+    response = fetch(etag)
+    assert response.status_code == 200
+    assert ranking(response) == [(posts[1].id, 1), (posts[0].id, 0)]
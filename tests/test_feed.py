@@ -0,0 +1,49 @@
+"""个性化首页缓存：其它 worker 上的写操作 (本 worker 没有收到 invalidate) 也要反映出来"""
+from backend import crud, models
+from backend.feed import FeedCache
+
+from conftest import make_post, make_user
+
+
+def feed_ids(cache, db, user_id):
+    return [candidate.id for candidate in cache.get(db, user_id)]
+
+
+def test_sees_posts_changed_by_other_workers(db, category_id):
+    seller, viewer = make_user(db, "seller"), make_user(db, "viewer")
+    posts = [make_post(db, seller.id, category_id) for _ in range(3)]
+    cache = FeedCache()
+    assert set(posts[i].id for i in range(3)) <= set(feed_ids(cache, db, viewer.id))
+
+    # 另一个 worker 发帖、售出、删帖 (直接改数据库，这个 cache 没有收到通知)
+    new_post = make_post(db, seller.id, category_id)
+    assert new_post.id in feed_ids(cache, db, viewer.id)
+
+    # 售出时 updated_at 不变 (和其它帖子在同一秒内) 也要看得出来
+    db.query(models.Post).filter(models.Post.id == posts[0].id).update(
+        {"status": models.Post.StatusEnum.sold, "updated_at": models.Post.updated_at}
+    )
+    db.commit()
+    assert posts[0].id not in feed_ids(cache, db, viewer.id)
+
+    db.query(models.Post).filter(models.Post.id == posts[1].id).delete()
+    db.commit()
+    ids = feed_ids(cache, db, viewer.id)
+    assert posts[1].id not in ids
+    assert posts[2].id in ids
+
+
+def test_preference_expires_after_ttl(db, category_id):
+    seller, viewer = make_user(db, "seller"), make_user(db, "viewer")
+    other_category = crud.create_category(db, "电子产品")
+    db.commit()
+    liked = make_post(db, seller.id, other_category.id)
+    make_post(db, seller.id, category_id)
+
+    expiring = FeedCache(ttl=0)
+    feed_ids(expiring, db, viewer.id)
+
+    # 另一个 worker 上收藏了 (本 worker 没有 invalidate_user)
+    crud.favorite_post(db, user_id=viewer.id, post_id=liked.id)
+    db.commit()
+    assert expiring.get(db, viewer.id)[0].id == liked.id
@@ -0,0 +1,27 @@
+"""帖子列表的条件请求"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from backend import crud
+
+from conftest import make_post, make_user
+
+
+def test_posts_list_ignores_if_modified_since(client, db, category_id):
+    seller, fan = make_user(db, "seller"), make_user(db, "fan")
+    post = make_post(db, seller.id, category_id, title="条件请求测试")
+    params = {"keyword": "条件请求测试", "sort_by": "popular"}
+
+    response = client.get("/api/posts", params=params)
+    assert "Last-Modified" not in response.headers
+
+    # 收藏数变化没有修改时间，If-Modified-Since 不能用来返回 304
+    assert crud.favorite_post(db, user_id=fan.id, post_id=post.id)
+    db.commit()
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+    response = client.get("/api/posts", params=params, headers={"If-Modified-Since": future})
+    assert response.status_code == 200
+    assert response.json()["posts"][0]["favorite_count"] == 1
+
+    etag = response.headers["ETag"]
+    assert client.get("/api/posts", params=params, headers={"If-None-Match": etag}).status_code == 304
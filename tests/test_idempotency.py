@@ -0,0 +1,118 @@
+"""Idempotency-Key：哪些响应会被保存并在重试时重放"""
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from backend.idempotency import IdempotencyMiddleware, RedisIdempotencyStore
+
+
+def make_client(statuses, store=None):
+    """依次返回 statuses 里的状态码的接口 (记录实际执行的次数)"""
+    calls = []
+
+    async def endpoint(request):
+        calls.append(await request.body())
+        return JSONResponse({"call": len(calls)}, status_code=statuses[len(calls) - 1])
+
+    app = IdempotencyMiddleware(Starlette(routes=[Route("/items", endpoint, methods=["POST"])]))
+    if store is not None:
+        app.store = store
+    return TestClient(app), calls
+
+
+def post(client, key="key-1", body=b"{}"):
+    return client.post("/items", content=body, headers={"Idempotency-Key": key})
+
+
+def test_success_is_replayed():
+    client, calls = make_client([201])
+    first, retry = post(client), post(client)
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(calls) == 1
+
+
+def test_retry_after_rate_limit_runs_again():
+    client, calls = make_client([429, 201])
+    assert post(client).status_code == 429
+
+    retry = post(client)
+    assert retry.status_code == 201
+    assert "Idempotent-Replayed" not in retry.headers
+    assert len(calls) == 2
+
+    # 成功的响应照常保存
+    assert post(client).headers["Idempotent-Replayed"] == "true"
+    assert len(calls) == 2
+
+
+def test_transient_statuses_are_not_stored():
+    for status in (408, 409, 429, 500, 503):
+        client, calls = make_client([status, 201])
+        post(client)
+        assert post(client).status_code == 201, status
+        assert len(calls) == 2
+
+
+def test_deterministic_client_errors_are_replayed():
+    for status in (400, 403, 404, 422):
+        client, calls = make_client([status, 201])
+        post(client)
+        retry = post(client)
+        assert retry.status_code == status
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert len(calls) == 1
+
+
+def test_key_reused_for_different_body():
+    client, calls = make_client([201])
+    post(client, body=b'{"a": 1}')
+    assert post(client, body=b'{"a": 2}').status_code == 422
+    assert len(calls) == 1
+
+
+class FakeRedis:
+    """redis.asyncio.Redis 里用到的 set / get / delete (不模拟过期)"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, xx=False, ex=None):
+        if (nx and key in self.data) or (xx and key not in self.data):
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+
+def test_shared_store_replays_across_workers():
+    """两个 worker 共用一个 Redis：重试落到另一个 worker 上也只执行一次"""
+    shared = FakeRedis()
+    first_worker, first_calls = make_client([201], store=RedisIdempotencyStore(shared))
+    second_worker, second_calls = make_client([201], store=RedisIdempotencyStore(shared))
+
+    first = post(first_worker)
+    retry = post(second_worker)
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(first_calls) + len(second_calls) == 1
+
+    assert post(second_worker, body=b'{"other": 1}').status_code == 422
+
+
+def test_shared_store_releases_transient_failures():
+    shared = FakeRedis()
+    client, calls = make_client([429, 201], store=RedisIdempotencyStore(shared))
+
+    assert post(client).status_code == 429
+    assert not shared.data
+    assert post(client).status_code == 201
+    assert len(calls) == 2
@@ -0,0 +1,70 @@
+"""请求计时：BackgroundTasks 不算进请求耗时"""
+import logging
+import time
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from backend import instrumentation
+from backend.instrumentation import RequestTimingMiddleware
+
+BACKGROUND_SECONDS = 0.3
+
+
+def slow_background_task():
+    # 后台任务里执行的 SQL 也不算进请求
+    stats = instrumentation.current_stats()
+    if stats is not None:
+        stats.record("SELECT 1", 0.001)
+    time.sleep(BACKGROUND_SECONDS)
+
+
+async def with_background(request):
+    return PlainTextResponse("ok", background=BackgroundTask(slow_background_task))
+
+
+async def streaming(request):
+    async def chunks():
+        yield b"a"
+        time.sleep(BACKGROUND_SECONDS)  # 响应体还没发完，要算进耗时
+        yield b"b"
+
+    return StreamingResponse(chunks())
+
+
+def make_client():
+    app = Starlette(routes=[Route("/background", with_background), Route("/streaming", streaming)])
+    return TestClient(RequestTimingMiddleware(app, slow_request_ms=BACKGROUND_SECONDS * 1000 / 2))
+
+
+def slow_logs(caplog):
+    return [record.getMessage() for record in caplog.records if record.name == instrumentation.__name__]
+
+
+def test_background_tasks_not_counted(caplog):
+    with caplog.at_level(logging.WARNING, logger=instrumentation.__name__):
+        response = make_client().get("/background")
+    assert response.text == "ok"
+    assert slow_logs(caplog) == []
+
+
+def test_streaming_body_counted(caplog):
+    with caplog.at_level(logging.WARNING, logger=instrumentation.__name__):
+        response = make_client().get("/streaming")
+    assert response.content == b"ab"
+    logs = slow_logs(caplog)
+    assert len(logs) == 1 and "慢请求 GET /streaming" in logs[0]
+
+
+def test_finish_freezes_stats():
+    stats = instrumentation.RequestStats()
+    stats.record("SELECT 1", 0.01)
+    stats.finish()
+    elapsed = stats.elapsed
+    stats.record("SELECT 2", 0.01)
+    time.sleep(0.01)
+    assert stats.elapsed == elapsed
+    assert stats.query_count == 1
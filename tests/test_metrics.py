@@ -0,0 +1,29 @@
+"""Prometheus 指标：请求耗时不包括 BackgroundTasks"""
+import time
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from backend import metrics
+
+BACKGROUND_SECONDS = 0.3
+
+
+async def with_background(request):
+    return PlainTextResponse("ok", background=BackgroundTask(time.sleep, BACKGROUND_SECONDS))
+
+
+def test_latency_excludes_background_tasks():
+    app = Starlette(routes=[Route("/background", with_background)])
+    client = TestClient(metrics.MetricsMiddleware(app))
+
+    key = ("GET", "/background")
+    before = metrics.registry.snapshot()["latency"].get(key, (None, 0, 0.0))
+    assert client.get("/background").text == "ok"
+
+    _, count, total = metrics.registry.snapshot()["latency"][key]
+    assert count == before[1] + 1
+    assert total - before[2] < BACKGROUND_SECONDS / 2
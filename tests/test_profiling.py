@@ -0,0 +1,56 @@
+"""采样分析：结果文件的数量 / 保留时间上限"""
+import os
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from backend.profiling import ProfilingMiddleware
+
+
+async def hello(request):
+    return PlainTextResponse("hello")
+
+
+def make_client(tmp_path, **kwargs):
+    app = Starlette(routes=[Route("/hello", hello), Route("/other", hello)])
+    return TestClient(ProfilingMiddleware(app, output_dir=str(tmp_path), token="secret", **kwargs))
+
+
+def saved_files(tmp_path):
+    return sorted(path.relative_to(tmp_path).as_posix() for path in tmp_path.glob("*/*.folded"))
+
+
+def test_keeps_newest_files_across_routes(tmp_path):
+    client = make_client(tmp_path, max_files=3, max_age_hours=0)
+    names = []
+    for i in range(5):
+        response = client.get("/hello" if i % 2 else "/other", headers={"X-Profile": "secret"})
+        names.append(response.headers["X-Profile-File"])
+        # 按修改时间清理，让每个文件的时间明显不同
+        os.utime(tmp_path / names[-1], (time.time() - 100 + i, time.time() - 100 + i))
+    client.get("/hello", headers={"X-Profile": "secret"})
+
+    files = saved_files(tmp_path)
+    assert len(files) == 3
+    assert not set(names[:3]) & set(files)
+    assert set(names[3:]) <= set(files)
+
+
+def test_removes_expired_files(tmp_path):
+    client = make_client(tmp_path, max_files=0, max_age_hours=1)
+    old = client.get("/hello", headers={"X-Profile": "secret"}).headers["X-Profile-File"]
+    two_hours_ago = time.time() - 7200
+    os.utime(tmp_path / old, (two_hours_ago, two_hours_ago))
+
+    new = client.get("/hello", headers={"X-Profile": "secret"}).headers["X-Profile-File"]
+    assert saved_files(tmp_path) == [new]
+
+
+def test_unlimited(tmp_path):
+    client = make_client(tmp_path, max_files=0, max_age_hours=0)
+    for _ in range(4):
+        client.get("/hello", headers={"X-Profile": "secret"})
+    assert len(saved_files(tmp_path)) == 4
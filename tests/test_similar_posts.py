@@ -0,0 +1,50 @@
+"""相似帖子索引：和数据库同步其它 worker 上的帖子变化"""
+from backend import models, similar_posts
+
+from conftest import make_post, make_user
+
+
+def similar_to(post):
+    return similar_posts.index.compute_neighbors(post.id, post.title, post.description)
+
+
+def test_sync_picks_up_changes_from_other_workers(db, category_id):
+    seller = make_user(db, "seller")
+    base = make_post(db, seller.id, category_id, title="佳能 EOS 相机 套机")
+    similar_posts.rebuild(db)
+    assert base.id in similar_posts.index.post_ids()
+
+    # 另一个 worker 发帖 (这个 worker 的索引没有收到 add)
+    other = make_post(db, seller.id, category_id, title="佳能 EOS 相机 机身")
+    assert other.id not in similar_posts.index.post_ids()
+    assert similar_posts.sync(db) >= 1
+    assert other.id in similar_to(base)
+
+    # 修改标题：旧的文本不再参与相似度
+    other.title = "宜家 书桌"
+    db.commit()
+    similar_posts.sync(db)
+    assert other.id not in similar_to(base)
+
+    # 售出
+    other.title = "佳能 EOS 相机 机身"
+    db.commit()
+    similar_posts.sync(db)
+    assert other.id in similar_to(base)
+    other.status = models.Post.StatusEnum.sold
+    db.commit()
+    similar_posts.sync(db)
+    assert other.id not in similar_posts.index.post_ids()
+
+    # 删除 (没有 updated_at 可查，靠在售帖子数发现)
+    db.delete(base)
+    db.commit()
+    similar_posts.sync(db)
+    assert base.id not in similar_posts.index.post_ids()
+
+
+def test_sync_skips_unchanged_posts(db, category_id):
+    seller = make_user(db, "seller")
+    make_post(db, seller.id, category_id, title="switch 游戏机")
+    similar_posts.rebuild(db)
+    assert similar_posts.sync(db) == 0